@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 import dj_database_url
@@ -30,6 +31,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'reader.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -53,6 +55,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'reader.context_processors.coins',
             ],
         },
     },
@@ -62,11 +65,16 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 
 DATABASE_URL = os.getenv('DATABASE_URL')
 
+# What gunicorn.conf.py serves, 'wsgi' or 'asgi'; it imports this, so the
+# default lives here only. Async views run their queries on whichever
+# thread asgiref picks, so persistent connections would pile up under ASGI.
+SERVER_INTERFACE = os.getenv('SERVER_INTERFACE', 'wsgi')
+
 if DATABASE_URL:
     DATABASES = {
         'default': dj_database_url.config(
             default=DATABASE_URL,
-            conn_max_age=600,
+            conn_max_age=0 if SERVER_INTERFACE == 'asgi' else 600,
             conn_health_checks=True,
         )
     }
@@ -78,6 +86,85 @@ else:
         }
     }
 
+# Redis (or any Redis-compatible server) is needed as soon as more than one
+# worker process runs: cache versions, entitlements and coin balances are
+# invalidated through the cache. Local memory is fine for a single process.
+REDIS_URL = os.getenv('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'reader',
+        },
+        'buffers': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'reader-buffers',
+        },
+        'pages': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'reader-pages',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'reader',
+            'OPTIONS': {'MAX_ENTRIES': int(os.getenv('LOCMEM_CACHE_MAX_ENTRIES', 5000))},
+        },
+        'buffers': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'reader-buffers',
+            'OPTIONS': {'MAX_ENTRIES': sys.maxsize},
+        },
+        'pages': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'reader-pages',
+            'OPTIONS': {'MAX_ENTRIES': int(os.getenv('PAGE_CACHE_MAX_ENTRIES', 1000))},
+        },
+    }
+
+# Anonymous pages are cached in 'pages', apart from the cache versions that
+# invalidate them, so however many pages get cached they only evict each
+# other. Pending chapter views and reading progress exist nowhere else
+# until they are flushed, so they live in 'buffers', which never culls;
+# so do the request metrics totals.
+# Under Redis all three share one server: cached pages carry a TTL, cache
+# versions and buffers do not, so run it with maxmemory-policy volatile-lru
+# (or noeviction).
+
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', 300))
+
+# Salts ETags so a deploy never answers 304 for a page whose template changed.
+RELEASE_VERSION = os.getenv('RELEASE_VERSION') or os.getenv('RAILWAY_GIT_COMMIT_SHA', '')
+CONDITIONAL_PUBLIC_MAX_AGE = int(os.getenv('CONDITIONAL_PUBLIC_MAX_AGE', 0))
+
+# One JSON line per request from reader.metrics.RequestMetricsMiddleware;
+# per-view percentiles are at /admin/metrics/.
+REQUEST_METRICS_ENABLED = os.getenv('REQUEST_METRICS_ENABLED', 'true').lower() == 'true'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'requests': {'class': 'logging.StreamHandler', 'formatter': 'message'},
+    },
+    'loggers': {
+        'reader.requests': {
+            'handlers': ['requests'],
+            'level': os.getenv('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -131,3 +218,11 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
+
+CHAPTER_VIEWS_FLUSH_INTERVAL = int(os.getenv('CHAPTER_VIEWS_FLUSH_INTERVAL', 30))
+CHAPTER_VIEWS_FLUSH_THRESHOLD = int(os.getenv('CHAPTER_VIEWS_FLUSH_THRESHOLD', 500))
+
+READING_PROGRESS_FLUSH_INTERVAL = int(os.getenv('READING_PROGRESS_FLUSH_INTERVAL', 30))
+READING_PROGRESS_FLUSH_THRESHOLD = int(os.getenv('READING_PROGRESS_FLUSH_THRESHOLD', 500))
+
+FEED_FANOUT_BATCH_SIZE = int(os.getenv('FEED_FANOUT_BATCH_SIZE', 1000))
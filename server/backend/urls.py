@@ -16,12 +16,13 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.contrib.auth import views as auth_views
-from reader.views import SignUpView
+from reader.views import RequestMetricsView, SignUpView
 from django.urls import path,include
 from django.conf import settings
 from django.conf.urls.static import static
 
 urlpatterns = [
+    path('admin/metrics/', admin.site.admin_view(RequestMetricsView.as_view()), name='request_metrics'),
     path('admin/', admin.site.urls),
     path('', include('reader.urls')),  
     path('api/', include('reader.urls')),
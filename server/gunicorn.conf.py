@@ -0,0 +1,27 @@
+"""
+Gunicorn settings for every deployment: ``gunicorn -c gunicorn.conf.py``.
+
+SERVER_INTERFACE (read by backend.settings, which also picks the database
+connection lifetime from it) chooses what gets served. ``wsgi``, the
+default, serves backend.wsgi with classic sync workers. ``asgi`` serves
+backend.asgi through uvicorn workers, so the async JSON endpoints don't
+hold a worker while they wait on the database; but Django then adapts
+the sync-only WhiteNoise middleware on every request and opens a
+database connection per request. ``manage.py loadtest`` compares the two.
+"""
+import os
+
+from backend.settings import SERVER_INTERFACE as interface
+
+if interface == 'asgi':
+    wsgi_app = 'backend.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'backend.wsgi:application'
+    worker_class = 'sync'
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+timeout = 120
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
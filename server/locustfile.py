@@ -0,0 +1,99 @@
+"""
+Reading sessions against a running server: the front page, a comic, then
+a run of chapters in order, as a reader paging through with "Next Chapter".
+
+Seed a catalog whose users can sign in, then start locust:
+
+    python manage.py seed_catalog --scale 0.01 --password load
+    pip install locust
+    LOAD_PASSWORD=load locust -f locustfile.py --host http://127.0.0.1:8000
+
+Signed-in readers log in as ``<LOAD_PREFIX>-user-<n>`` for n below
+LOAD_USERS; LOAD_PREFIX and LOAD_USERS default to seed_catalog's prefix and
+the user count at --scale 0.01.
+"""
+import os
+import random
+import re
+
+from locust import HttpUser, between, task
+
+PREFIX = os.getenv('LOAD_PREFIX', 'seed')
+PASSWORD = os.getenv('LOAD_PASSWORD', 'load')
+USERS = int(os.getenv('LOAD_USERS', '1000'))
+
+COMIC_LINK = re.compile(r'href="(/comic/[\w-]+/)"')
+CHAPTER_LINK = re.compile(r'href="(/comic/[\w-]+/chapter/[\w-]+/)"')
+CHAPTER_ID = re.compile(r'/api/chapter/(\d+)/view/')
+CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+class Reader(HttpUser):
+    abstract = True
+    wait_time = between(1, 4)
+    # How many chapters one session reads, at most, after opening a comic.
+    session_chapters = (3, 15)
+
+    def browse(self):
+        response = self.client.get('/', name='comic_list')
+        comics = COMIC_LINK.findall(response.text)
+        if not comics:
+            return None
+        response = self.client.get(random.choice(comics), name='comic_detail')
+        chapters = CHAPTER_LINK.findall(response.text)
+        return chapters[0] if chapters else None
+
+    def read(self, chapter_url):
+        """Read chapters from ``chapter_url`` on, following the next chapter the prefetch API reports."""
+        for _ in range(random.randint(*self.session_chapters)):
+            response = self.client.get(chapter_url, name='chapter_detail')
+            match = CHAPTER_ID.search(response.text)
+            if match is None:
+                return
+            self.viewed(match.group(1))
+            response = self.client.get(f'/api/chapter/{match.group(1)}/prefetch/', name='chapter_prefetch')
+            upcoming = response.json().get('next') if response.ok else None
+            if not upcoming:
+                return
+            chapter_url = upcoming['url']
+
+    def viewed(self, chapter_id):
+        pass
+
+    @task
+    def reading_session(self):
+        chapter_url = self.browse()
+        if chapter_url:
+            self.read(chapter_url)
+
+
+class AnonymousReader(Reader):
+    weight = 3
+
+
+class SignedInReader(Reader):
+    weight = 1
+
+    def on_start(self):
+        response = self.client.get('/accounts/login/', name='login')
+        token = CSRF_INPUT.search(response.text)
+        self.client.post(
+            '/accounts/login/',
+            data={
+                'username': f'{PREFIX}-user-{random.randrange(USERS)}',
+                'password': PASSWORD,
+                'csrfmiddlewaretoken': token.group(1) if token else '',
+            },
+            name='login',
+        )
+
+    def viewed(self, chapter_id):
+        self.client.post(
+            f'/api/chapter/{chapter_id}/view/',
+            headers={'X-CSRFToken': self.client.cookies.get('csrftoken', '')},
+            name='chapter_view_update',
+        )
+
+    @task
+    def bookmarks(self):
+        self.client.get('/bookmarks/', name='bookmarks')
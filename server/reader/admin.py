@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Comic, Chapter, ChapterImage, Comment, Rating, Bookmark, Product, Category
+from django.db import transaction
+from .derivatives import process_comic_derivatives
+from .models import Comic, Chapter, ChapterEntitlement, ChapterImage, CoinTransaction, CoinWallet, Comment, Rating, Bookmark, Product, Category, ReadingProgress, UploadJob
+from .uploads import run_in_background
 
 # Inline admin for ChapterImage
 class ChapterImageInline(admin.TabularInline):
@@ -17,10 +20,16 @@ class ChapterAdmin(admin.ModelAdmin):
     inlines = [ChapterImageInline]
     readonly_fields = ('slug',)
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        form.instance.refresh_page_manifest()
+
 # Comic Admin
 @admin.register(Comic)
 class ComicAdmin(admin.ModelAdmin):
-    list_display = ('title', 'author', 'status', 'active', 'created_at')
+    list_display = (
+        'title', 'author', 'status', 'active', 'chapter_count', 'bookmark_count', 'comment_count', 'total_views', 'created_at'
+    )
     list_filter = ('status', 'active', 'categories', 'created_at')
     search_fields = ('title', 'author', 'description')
     prepopulated_fields = {'slug': ('title',)}
@@ -37,6 +46,15 @@ class ComicAdmin(admin.ModelAdmin):
         }),
     )
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if {'cover_image', 'thumbnail'} & set(form.changed_data):
+            # Drop the old image's renditions now, so a rebuild lost to a
+            # restart leaves a comic that recover_background_work picks up.
+            obj.image_derivatives.all().delete()
+            obj.refresh_image_renditions()
+            transaction.on_commit(lambda: run_in_background(process_comic_derivatives, obj.pk))
+
 # Register other models
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -45,7 +63,7 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
-    list_display = ('content', 'comic', 'creator', 'created_date')
+    list_display = ('content', 'comic', 'creator', 'reply_count', 'created_date')
     list_filter = ('created_date', 'comic')
     search_fields = ('content', 'creator__username', 'comic__title')
 
@@ -61,8 +79,50 @@ class BookmarkAdmin(admin.ModelAdmin):
     list_filter = ('created_date',)
     search_fields = ('comic__title', 'creator__username')
 
+@admin.register(ReadingProgress)
+class ReadingProgressAdmin(admin.ModelAdmin):
+    list_display = ('user', 'comic', 'chapter', 'page', 'updated_at')
+    list_filter = ('updated_at',)
+    search_fields = ('user__username', 'comic__title')
+    raw_id_fields = ('user', 'comic', 'chapter')
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'category', 'price', 'active', 'created_at')
     list_filter = ('category', 'active', 'created_at')
     search_fields = ('name',)
+
+@admin.register(UploadJob)
+class UploadJobAdmin(admin.ModelAdmin):
+    list_display = ('chapter', 'user', 'status', 'processed_pages', 'total_pages', 'created_at')
+    list_filter = ('status', 'created_at')
+    readonly_fields = ('chapter', 'user', 'status', 'total_pages', 'processed_pages', 'error')
+
+@admin.register(ChapterEntitlement)
+class ChapterEntitlementAdmin(admin.ModelAdmin):
+    list_display = ('user', 'chapter', 'comic', 'source', 'price', 'created_at')
+    list_filter = ('source', 'created_at')
+    search_fields = ('user__username', 'comic__title')
+    raw_id_fields = ('user', 'chapter')
+    readonly_fields = ('comic',)
+
+@admin.register(CoinWallet)
+class CoinWalletAdmin(admin.ModelAdmin):
+    list_display = ('user', 'balance', 'updated_at')
+    search_fields = ('user__username',)
+    readonly_fields = ('user', 'balance')
+
+@admin.register(CoinTransaction)
+class CoinTransactionAdmin(admin.ModelAdmin):
+    list_display = ('user', 'kind', 'amount', 'balance_after', 'chapter', 'created_at')
+    list_filter = ('kind', 'created_at')
+    search_fields = ('user__username', 'idempotency_key')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
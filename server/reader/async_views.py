@@ -0,0 +1,25 @@
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import Http404
+
+
+async def aget_object_or_404(klass, *args, **kwargs):
+    """``get_object_or_404`` on the async ORM; ``klass`` is a model or a queryset."""
+    queryset = klass._default_manager.all() if hasattr(klass, '_default_manager') else klass
+    try:
+        return await queryset.aget(*args, **kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+
+
+class AsyncLoginRequiredMixin(LoginRequiredMixin):
+    """
+    LoginRequiredMixin for views whose handlers are coroutines. The user is
+    loaded with ``request.auser()`` and then set as ``request.user``, so
+    code reading ``request.user`` afterwards never touches the database
+    from the event loop.
+    """
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        return await super(LoginRequiredMixin, self).dispatch(request, *args, **kwargs)
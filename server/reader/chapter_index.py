@@ -0,0 +1,80 @@
+from bisect import bisect_left
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+ChapterEntry = namedtuple('ChapterEntry', ['id', 'chapter_num', 'slug', 'price', 'title'])
+
+CACHE_TIMEOUT = getattr(settings, 'CHAPTER_INDEX_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+class ChapterIndex:
+    """
+    Ordered manifest of a comic's active chapters. Lookups by id are O(1)
+    and by chapter number O(log n), so navigation never hits the database.
+    """
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.numbers = [entry.chapter_num for entry in entries]
+        self.positions = {entry.id: position for position, entry in enumerate(entries)}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def get(self, chapter_id):
+        position = self.positions.get(chapter_id)
+        return None if position is None else self.entries[position]
+
+    def previous(self, chapter_id):
+        position = self.positions.get(chapter_id)
+        if not position:
+            return None
+        return self.entries[position - 1]
+
+    def next(self, chapter_id):
+        position = self.positions.get(chapter_id)
+        if position is None or position + 1 >= len(self.entries):
+            return None
+        return self.entries[position + 1]
+
+    def find(self, chapter_num):
+        position = bisect_left(self.numbers, chapter_num)
+        if position < len(self.numbers) and self.numbers[position] == chapter_num:
+            return self.entries[position]
+        return None
+
+    def first(self):
+        return self.entries[0] if self.entries else None
+
+    def last(self):
+        return self.entries[-1] if self.entries else None
+
+
+def cache_key(comic):
+    # Chapter changes bump Comic.updated_at (see signals), so the key moves
+    # on by itself and no process can keep serving a stale index.
+    return f'chapter_index:{comic.pk}:{comic.updated_at.timestamp()}'
+
+
+def build_chapter_index(comic_id):
+    from .models import Chapter
+
+    rows = Chapter.objects.filter(comic_id=comic_id, active=True).order_by('chapter_num').values_list(
+        'id', 'chapter_num', 'slug', 'price', 'title'
+    )
+    return ChapterIndex([ChapterEntry(*row) for row in rows])
+
+
+def get_chapter_index(comic):
+    key = cache_key(comic)
+    entries = cache.get(key)
+    if entries is None:
+        index = build_chapter_index(comic.pk)
+        cache.set(key, index.entries, CACHE_TIMEOUT)
+        return index
+    return ChapterIndex(entries)
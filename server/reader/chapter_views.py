@@ -0,0 +1,192 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+from django.utils.connection import ConnectionProxy
+
+from .models import Chapter, ChapterView, Comic, ComicViewDay
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'chapter_views:pending'
+
+# Not the default cache: an evicted counter would be views lost for good.
+buffer_cache = ConnectionProxy(caches, 'buffers')
+
+
+def pending_key(chapter_id):
+    return f'{KEY_PREFIX}:{chapter_id}'
+
+
+def increment(key, count):
+    try:
+        buffer_cache.incr(key, count)
+    except ValueError:
+        buffer_cache.add(key, 0, timeout=None)
+        buffer_cache.incr(key, count)
+
+
+class ChapterViewBuffer:
+    """
+    Buffers chapter view increments in the cache and writes them to
+    ChapterView in batches.
+
+    Pending counts live under one key per chapter in the 'buffers' cache,
+    so with a shared backend (Redis, database cache) any process can flush
+    them; the backend must allow counters to go negative (memcached does
+    not).
+    Each process remembers which chapters it touched and flushes them once
+    CHAPTER_VIEWS_FLUSH_THRESHOLD views were recorded or
+    CHAPTER_VIEWS_FLUSH_INTERVAL seconds passed. Flushed views are also
+    added to each comic's ComicViewDay of the day, for popularity's decay.
+    """
+
+    def __init__(self, flush_interval=None, flush_threshold=None):
+        self.flush_interval = flush_interval if flush_interval is not None else getattr(
+            settings, 'CHAPTER_VIEWS_FLUSH_INTERVAL', 30
+        )
+        self.flush_threshold = flush_threshold if flush_threshold is not None else getattr(
+            settings, 'CHAPTER_VIEWS_FLUSH_THRESHOLD', 500
+        )
+        self._lock = threading.Lock()
+        self._dirty = set()
+        self._recorded = 0
+        self._last_flush = time.monotonic()
+
+    def record(self, chapter_id, count=1):
+        increment(pending_key(chapter_id), count)
+
+        with self._lock:
+            self._dirty.add(chapter_id)
+            self._recorded += count
+            due = (
+                self._recorded >= self.flush_threshold
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def pending(self, chapter_id):
+        return buffer_cache.get(pending_key(chapter_id)) or 0
+
+    def get_views(self, chapter_id):
+        stored = ChapterView.objects.filter(chapter_id=chapter_id).values_list('views', flat=True).first()
+        return (stored or 0) + self.pending(chapter_id)
+
+    def flush(self, chapter_ids=None):
+        """
+        Move pending counts for ``chapter_ids`` (default: the chapters this
+        process recorded) into the database. Returns the number of views
+        written.
+        """
+        with self._lock:
+            if chapter_ids is None:
+                chapter_ids, self._dirty = self._dirty, set()
+            else:
+                chapter_ids = set(chapter_ids)
+                self._dirty -= chapter_ids
+            self._recorded = 0
+            self._last_flush = time.monotonic()
+
+        claimed = self._claim(chapter_ids)
+        if not claimed:
+            return 0
+
+        try:
+            self._write(claimed)
+        except Exception:
+            logger.exception('Flushing %d chapter view counters failed', len(claimed))
+            for chapter_id, count in claimed.items():
+                increment(pending_key(chapter_id), count)
+            with self._lock:
+                self._dirty.update(claimed)
+            return 0
+        return sum(claimed.values())
+
+    def _claim(self, chapter_ids):
+        keys = {pending_key(chapter_id): chapter_id for chapter_id in chapter_ids}
+        claimed = {}
+        for key, seen in buffer_cache.get_many(list(keys)).items():
+            if not seen or seen <= 0:
+                continue
+            # Subtract what we saw, then hand back anything another flusher
+            # took in the meantime, so each view is claimed exactly once.
+            try:
+                before = buffer_cache.decr(key, seen) + seen
+            except ValueError:
+                # The key expired or was cleared since get_many().
+                continue
+            count = max(0, min(seen, before))
+            if count < seen:
+                increment(key, seen - count)
+            if count:
+                claimed[keys[key]] = count
+        return claimed
+
+    def _write(self, claimed):
+        comic_ids = dict(Chapter.objects.filter(id__in=claimed).values_list('id', 'comic_id'))
+        claimed = {chapter_id: count for chapter_id, count in claimed.items() if chapter_id in comic_ids}
+        if not claimed:
+            return
+        comic_views = {}
+        for chapter_id, count in claimed.items():
+            if comic_ids[chapter_id]:
+                comic_views[comic_ids[chapter_id]] = comic_views.get(comic_ids[chapter_id], 0) + count
+
+        with transaction.atomic():
+            ChapterView.objects.bulk_create(
+                [ChapterView(chapter_id=chapter_id) for chapter_id in claimed],
+                ignore_conflicts=True,
+            )
+            ChapterView.objects.filter(chapter_id__in=claimed).update(
+                views=F('views') + Case(
+                    *[When(chapter_id=chapter_id, then=Value(count)) for chapter_id, count in claimed.items()],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                ),
+                # Not auto_now under update(): popularity finds the comics to rescore by it.
+                updated_date=timezone.now(),
+            )
+            Comic.objects.filter(pk__in=comic_views).update(
+                total_views=F('total_views') + Case(
+                    *[When(pk=comic_id, then=Value(count)) for comic_id, count in comic_views.items()],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+            )
+            today = timezone.localdate()
+            ComicViewDay.objects.bulk_create(
+                [ComicViewDay(comic_id=comic_id, day=today) for comic_id in comic_views],
+                ignore_conflicts=True,
+            )
+            ComicViewDay.objects.filter(comic_id__in=comic_views, day=today).update(
+                views=F('views') + Case(
+                    *[When(comic_id=comic_id, then=Value(count)) for comic_id, count in comic_views.items()],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+            )
+
+    def flush_all(self, batch_size=1000):
+        """Flush pending counts for every chapter, not just this process's."""
+        total = 0
+        chapter_ids = Chapter.objects.order_by('id').values_list('id', flat=True)
+        batch = []
+        for chapter_id in chapter_ids.iterator(chunk_size=batch_size):
+            batch.append(chapter_id)
+            if len(batch) >= batch_size:
+                total += self.flush(batch)
+                batch = []
+        if batch:
+            total += self.flush(batch)
+        return total
+
+
+chapter_views = ChapterViewBuffer()
+atexit.register(chapter_views.flush)
@@ -0,0 +1,138 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .entitlements import grant_chapter
+from .models import ChapterEntitlement, CoinTransaction, CoinWallet
+
+BALANCE_CACHE_TIMEOUT = getattr(settings, 'COIN_BALANCE_CACHE_TIMEOUT', 60 * 10)
+
+
+class InsufficientCoins(Exception):
+    pass
+
+
+class AlreadyOwned(Exception):
+    pass
+
+
+class IdempotencyKeyReused(Exception):
+    """An idempotency key was sent again with a different kind, amount, chapter or product."""
+
+
+def balance_cache_key(user_id):
+    return f'coins:balance:{user_id}'
+
+
+def get_balance(user):
+    if not user.is_authenticated:
+        return 0
+    key = balance_cache_key(user.pk)
+    balance = cache.get(key)
+    if balance is None:
+        balance = CoinWallet.objects.filter(user=user).values_list('balance', flat=True).first() or 0
+        cache.set(key, balance, BALANCE_CACHE_TIMEOUT)
+    return balance
+
+
+def invalidate_balance(user_id):
+    key = balance_cache_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def lock_wallet(user):
+    """Fetch the user's wallet row FOR UPDATE, creating it on first use."""
+    CoinWallet.objects.get_or_create(user=user)
+    return CoinWallet.objects.select_for_update().get(user=user)
+
+
+def replayed(user, amount, kind, idempotency_key, **fields):
+    """
+    The entry an earlier request with ``idempotency_key`` recorded, or None.
+    Raises IdempotencyKeyReused unless it recorded the same change.
+    """
+    existing = CoinTransaction.objects.filter(user=user, idempotency_key=idempotency_key).first()
+    if existing is None:
+        return None
+    same = existing.kind == kind and existing.amount == amount and all(
+        getattr(existing, CoinTransaction._meta.get_field(name).attname) == getattr(value, 'pk', value)
+        for name, value in fields.items()
+    )
+    if not same:
+        raise IdempotencyKeyReused(idempotency_key)
+    return existing
+
+
+def record(user, amount, kind, idempotency_key=None, **fields):
+    """
+    Add ``amount`` (negative to spend) to the user's balance and append the
+    ledger entry, inside the caller's transaction. The wallet row is locked
+    first, so concurrent requests for one user apply one at a time; the
+    balance is changed with a conditional F() update, so it can never go
+    negative or lose an update even where row locks are a no-op (SQLite).
+    Returns ``(transaction, created)``; a repeated idempotency key returns
+    the original entry instead of applying it again (see ``replayed``).
+    """
+    lock_wallet(user)
+    if idempotency_key:
+        existing = replayed(user, amount, kind, idempotency_key, **fields)
+        if existing:
+            return existing, False
+    updated = CoinWallet.objects.filter(user=user, balance__gte=-amount).update(balance=F('balance') + amount)
+    if not updated:
+        raise InsufficientCoins(f'Not enough coins for {-amount}')
+    balance = CoinWallet.objects.values_list('balance', flat=True).get(user=user)
+    entry = CoinTransaction.objects.create(
+        user=user, kind=kind, amount=amount, balance_after=balance, idempotency_key=idempotency_key, **fields
+    )
+    invalidate_balance(user.pk)
+    return entry, True
+
+
+def apply(user, amount, kind, idempotency_key=None, **fields):
+    """``record`` in its own transaction, settling idempotency-key races."""
+    try:
+        with transaction.atomic():
+            return record(user, amount, kind, idempotency_key=idempotency_key, **fields)
+    except IntegrityError:
+        existing = idempotency_key and replayed(user, amount, kind, idempotency_key, **fields)
+        if not existing:
+            raise
+        return existing, False
+
+
+def credit(user, amount, kind=CoinTransaction.KIND.GRANT, idempotency_key=None, **fields):
+    return apply(user, amount, kind, idempotency_key=idempotency_key, **fields)
+
+
+def purchase_chapter(user, chapter, idempotency_key=None):
+    """
+    Charge ``chapter.price`` and grant the chapter in one transaction.
+    Raises AlreadyOwned (nothing charged) if the user already has it and
+    InsufficientCoins if the balance is too low. A retry with the
+    idempotency key of a purchase that went through returns its entry.
+    """
+    try:
+        with transaction.atomic():
+            lock_wallet(user)
+            if idempotency_key:
+                existing = replayed(
+                    user, -chapter.price, CoinTransaction.KIND.CHAPTER_PURCHASE, idempotency_key, chapter=chapter,
+                )
+                if existing:
+                    return existing
+            if ChapterEntitlement.objects.filter(user=user, chapter=chapter).exists():
+                raise AlreadyOwned(chapter.pk)
+            entry, created = record(
+                user, -chapter.price, CoinTransaction.KIND.CHAPTER_PURCHASE,
+                idempotency_key=idempotency_key, chapter=chapter,
+            )
+            if not created:
+                return entry
+            if not grant_chapter(user, chapter, price=chapter.price)[1]:
+                raise AlreadyOwned(chapter.pk)
+            return entry
+    except IntegrityError:
+        raise AlreadyOwned(chapter.pk)
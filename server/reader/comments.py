@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .models import Comment
+
+# How much of each thread the comic page renders; the rest is fetched on demand.
+INLINE_DEPTH = getattr(settings, 'COMMENT_INLINE_DEPTH', 3)
+INLINE_REPLIES = getattr(settings, 'COMMENT_INLINE_REPLIES', 50)
+EXPAND_PAGE_SIZE = getattr(settings, 'COMMENT_EXPAND_PAGE_SIZE', 100)
+
+
+def thread_replies(root_ids, max_depth=INLINE_DEPTH, per_thread=INLINE_REPLIES):
+    """
+    Replies of the threads rooted at ``root_ids``, in one query and in path
+    (depth-first) order, cut to the first ``per_thread`` of each thread down
+    to ``max_depth``. A cut keeps a prefix of the thread, so every reply
+    returned has its parent returned (or among the roots) too.
+    """
+    return Comment.objects.filter(
+        thread_id__in=root_ids, depth__gt=0, depth__lte=max_depth,
+    ).annotate(
+        position=Window(RowNumber(), partition_by=[F('thread_id')], order_by=F('path').asc()),
+    ).filter(position__lte=per_thread).select_related('creator').order_by('path')
+
+
+def build_tree(roots, replies):
+    """
+    Nest ``replies`` under ``roots`` in a single pass. ``replies`` must be in
+    path order so a parent is always seen before its replies; replies whose
+    parent is missing are skipped. Every comment gets a ``children`` list and
+    ``hidden_replies``, the number of direct replies left for lazy loading.
+    """
+    roots = list(roots)
+    nodes = {}
+    for root in roots:
+        root.children = []
+        nodes[root.id] = root
+    for reply in replies:
+        parent = nodes.get(reply.reply_to_id)
+        if parent is not None:
+            reply.children = []
+            nodes[reply.id] = reply
+            parent.children.append(reply)
+    for node in nodes.values():
+        node.hidden_replies = max(node.reply_count - len(node.children), 0)
+    return roots
+
+
+def load_threads(roots):
+    """A page of top-level comments with the inline part of their threads."""
+    roots = list(roots)
+    if not roots:
+        return roots
+    return build_tree(roots, thread_replies([root.id for root in roots]))
+
+
+def subtree_page(comment, after=None, limit=EXPAND_PAGE_SIZE):
+    """
+    Up to ``limit`` descendants of ``comment`` in path order, continuing after
+    the path ``after``. Returns ``(replies, next_after)``.
+    """
+    replies = Comment.objects.filter(
+        thread_id=comment.thread_id, path__startswith=comment.path, depth__gt=comment.depth,
+    ).select_related('creator').order_by('path')
+    if after:
+        replies = replies.filter(path__gt=after)
+    replies = list(replies[:limit + 1])
+    if len(replies) > limit:
+        replies = replies[:limit]
+        return replies, replies[-1].path
+    return replies, None
+
+
+def serialize(comment):
+    return {
+        'id': comment.id,
+        'parent': comment.reply_to_id,
+        'depth': comment.depth,
+        'author': comment.creator.username,
+        'content': comment.content,
+        'created': comment.created_date.isoformat(),
+        'reply_count': comment.reply_count,
+    }
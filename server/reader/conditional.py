@@ -0,0 +1,86 @@
+import hashlib
+from calendar import timegm
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .coins import get_balance
+
+# Changes every ETag on deploy, so template changes are never answered with 304.
+ETAG_SALT = getattr(settings, 'RELEASE_VERSION', '')
+PUBLIC_MAX_AGE = getattr(settings, 'CONDITIONAL_PUBLIC_MAX_AGE', 0)
+
+
+def make_etag(*parts):
+    digest = hashlib.md5('|'.join(str(part) for part in (ETAG_SALT,) + parts).encode()).hexdigest()
+    # Weak: pages carry a per-visitor CSRF token, so equal tags mean equivalent, not identical, bodies.
+    return f'W/"{digest}"'
+
+
+def latest(*timestamps):
+    timestamps = [timestamp for timestamp in timestamps if timestamp]
+    return max(timestamps) if timestamps else None
+
+
+def user_fingerprint(user):
+    """What every page renders for a signed-in user: who they are and their coin balance."""
+    return (user.pk, get_balance(user))
+
+
+class ConditionalGetMixin:
+    """
+    Answers GET and HEAD with 304 Not Modified, before anything is rendered,
+    when the client's copy is current. ``get_validators()`` returns
+    ``(last_modified, etag_parts)`` from cheap timestamp queries, or None
+    to skip validation (e.g. the object does not exist).
+
+    Public responses get both validators and ``Cache-Control: public``.
+    Per-user responses (signed-in users by default) get only an ETag that
+    also covers the user's own state, and ``Cache-Control: private``.
+    """
+    public_max_age = PUBLIC_MAX_AGE
+
+    def get_validators(self):
+        return None
+
+    def is_public(self):
+        return not self.request.user.is_authenticated
+
+    def not_modified(self):
+        """Side effects a 304 would otherwise skip."""
+
+    def dispatch(self, request, *args, **kwargs):
+        # A pending flash message has to be rendered, so never answer 304 then.
+        validators = None
+        if request.method in ('GET', 'HEAD') and 'messages' not in request.COOKIES:
+            validators = self.get_validators()
+        if validators is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        last_modified, parts = validators
+        public = self.is_public()
+        if not public:
+            parts = list(parts) + list(user_fingerprint(request.user))
+        etag = make_etag(request.get_full_path(), last_modified and last_modified.isoformat(), *parts)
+        # Per-user state has no timestamp, so If-Modified-Since alone cannot validate it.
+        timestamp = timegm(last_modified.utctimetuple()) if last_modified and public else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is not None:
+            if response.status_code == 304:
+                self.not_modified()
+        else:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+        response['ETag'] = etag
+        if timestamp:
+            response['Last-Modified'] = http_date(timestamp)
+        if public:
+            patch_cache_control(response, public=True, max_age=self.public_max_age, must_revalidate=True)
+        else:
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ('Cookie',))
+        return response
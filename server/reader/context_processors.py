@@ -0,0 +1,11 @@
+import functools
+
+from .coins import get_balance
+
+
+def coins(request):
+    """``coin_balance`` for templates, read (from the cache) only if a template uses it."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {'coin_balance': 0}
+    return {'coin_balance': functools.cache(lambda: get_balance(user))}
@@ -0,0 +1,91 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Bookmark, Chapter, ChapterView, Comic, Comment, Rating
+from .page_cache import LISTING, bump, comic_scope
+
+COUNTERS = ('bookmark_count', 'rating_count', 'rating_sum', 'comment_count', 'chapter_count', 'total_views')
+# Not counters, but derived from chapters the same way and repaired with them.
+POINTERS = ('latest_chapter', 'latest_chapter_at')
+
+
+def adjust(comic_id, **changes):
+    """
+    Apply counter deltas, and any plain field values, to one comic in a
+    single UPDATE. Counters are clamped at zero instead of failing the
+    write; reconcile() repairs whatever drift that hides.
+    """
+    values = {
+        field: Greatest(F(field) + value, Value(0)) if field in COUNTERS else value
+        for field, value in changes.items()
+    }
+    return Comic.objects.filter(pk=comic_id).update(**values)
+
+
+def total_of(queryset, aggregate, comic_field='comic'):
+    """Subquery for ``aggregate`` over the rows of ``queryset`` belonging to the outer comic."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{comic_field: OuterRef('pk')}).order_by().values(comic_field)
+            .annotate(total=aggregate).values('total'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def chapter_count():
+    return total_of(Chapter.objects.filter(active=True), Count('pk'))
+
+
+def latest_chapter():
+    """The outer comic's newest active chapter and when it was added."""
+    newest = Chapter.objects.filter(comic=OuterRef('pk'), active=True).order_by('-chapter_num')
+    return {
+        'latest_chapter': Subquery(newest.values('pk')[:1]),
+        'latest_chapter_at': Subquery(newest.values('created_at')[:1]),
+    }
+
+
+def expected_counters():
+    """Expressions recomputing every counter from its source rows."""
+    return {
+        'bookmark_count': total_of(Bookmark.objects.all(), Count('pk')),
+        'rating_count': total_of(Rating.objects.all(), Count('pk')),
+        'rating_sum': total_of(Rating.objects.all(), Sum('rate')),
+        'comment_count': total_of(Comment.objects.all(), Count('pk')),
+        'chapter_count': chapter_count(),
+        'total_views': total_of(ChapterView.objects.all(), Sum('views'), comic_field='chapter__comic'),
+        **latest_chapter(),
+    }
+
+
+def find_drift(comic_ids):
+    """``{comic_id: {counter: (stored, actual)}}`` for the comics whose counters are off."""
+    expected = {f'expected_{name}': expression for name, expression in expected_counters().items()}
+    rows = Comic.objects.filter(pk__in=comic_ids).annotate(**expected).values('pk', *COUNTERS, *POINTERS, *expected)
+    drift = {}
+    for row in rows:
+        off = {
+            name: (row[name], row[f'expected_{name}'])
+            for name in COUNTERS + POINTERS if row[name] != row[f'expected_{name}']
+        }
+        if off:
+            drift[row['pk']] = off
+    return drift
+
+
+def reconcile(comic_ids, fix=True):
+    """
+    Report (and with ``fix``, repair) counter drift for ``comic_ids``. The
+    repair recomputes the counters inside the UPDATE itself, so increments
+    racing with the report are not overwritten.
+    """
+    drift = find_drift(comic_ids)
+    if fix and drift:
+        Comic.objects.filter(pk__in=drift).update(updated_at=timezone.now(), **expected_counters())
+        for slug in Comic.objects.filter(pk__in=drift).values_list('slug', flat=True):
+            bump(comic_scope(slug))
+        bump(LISTING)
+    return drift
@@ -0,0 +1,146 @@
+import logging
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from PIL import Image as PILImage, ImageOps, features
+
+from .models import Comic, ImageDerivative
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_WIDTHS = tuple(getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', (480, 720, 1080)))
+DERIVATIVE_FORMATS = tuple(
+    fmt for fmt in getattr(settings, 'IMAGE_DERIVATIVE_FORMATS', ('avif', 'webp')) if features.check(fmt)
+)
+# Pages taller than this (in source pixels) are cut into tiles of this height.
+TILE_HEIGHT = getattr(settings, 'IMAGE_DERIVATIVE_TILE_HEIGHT', 2400)
+SAVE_OPTIONS = {
+    'avif': {'quality': 55, 'speed': 8},
+    'webp': {'quality': 80, 'method': 4},
+    'jpeg': {'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+
+def derivatives_enabled():
+    return getattr(settings, 'IMAGE_DERIVATIVES_ENABLED', True) and bool(DERIVATIVE_FORMATS)
+
+
+def target_widths(width):
+    return sorted({min(target, width) for target in DERIVATIVE_WIDTHS})
+
+
+def tile_boxes(width, height, tile_height=None):
+    tile_height = tile_height or TILE_HEIGHT
+    if height <= tile_height:
+        return [(0, 0, width, height)]
+    return [(0, top, width, min(top + tile_height, height)) for top in range(0, height, tile_height)]
+
+
+def render_derivatives(path, out_dir, prefix, tile=True):
+    """
+    Write every width/format rendition of the image at ``path`` to
+    ``out_dir``. Tiles are cut at the same source rows for every width, so
+    each tile's srcset candidates line up. Only one tile is decoded and
+    resized at a time. Returns dicts describing the files written.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rendered = []
+    with PILImage.open(path) as source:
+        source = ImageOps.exif_transpose(source)
+        mode = 'RGBA' if 'A' in source.getbands() or 'transparency' in source.info else 'RGB'
+        source = source.convert(mode)
+        boxes = tile_boxes(*source.size) if tile else [(0, 0) + source.size]
+        for position, box in enumerate(boxes):
+            crop = source.crop(box)
+            for width in target_widths(source.width):
+                height = max(1, round(crop.height * width / source.width))
+                resized = crop if width == crop.width else crop.resize((width, height), PILImage.LANCZOS)
+                for fmt in DERIVATIVE_FORMATS:
+                    target = os.path.join(out_dir, f'{prefix}-t{position}-w{width}.{fmt}')
+                    resized.save(target, format=fmt.upper(), **SAVE_OPTIONS.get(fmt, {}))
+                    rendered.append({
+                        'path': target, 'format': fmt, 'width': width, 'height': height, 'tile': position,
+                    })
+    return rendered
+
+
+def store_derivatives(storage, rendered, **fields):
+    """Push rendered files to ``storage``; returns unsaved ImageDerivative rows."""
+    from .uploads import DERIVATIVES_FOLDER, store_with_retry
+
+    derivatives = []
+    for item in rendered:
+        value = store_with_retry(storage, item['path'], os.path.basename(item['path']), folder=DERIVATIVES_FOLDER)
+        derivatives.append(ImageDerivative(
+            format=item['format'], width=item['width'], height=item['height'], tile=item['tile'],
+            file=value, url=storage.url(value), byte_size=os.path.getsize(item['path']), **fields
+        ))
+    return derivatives
+
+
+def build_derivatives(storage, path, prefix, **fields):
+    """
+    Render and store the derivatives of one image. Failures are logged and
+    yield no derivatives, since the original is still servable.
+    """
+    if not derivatives_enabled():
+        return []
+    out_dir = tempfile.mkdtemp(prefix='derivatives-')
+    try:
+        tile = fields.get('role', ImageDerivative.ROLE.PAGE) == ImageDerivative.ROLE.PAGE
+        return store_derivatives(storage, render_derivatives(path, out_dir, prefix, tile=tile), **fields)
+    except Exception:
+        logger.warning('Could not build derivatives for %s', prefix, exc_info=True)
+        return []
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def fetch_original(storage, resource, directory):
+    path = os.path.join(directory, os.path.basename(f'{resource.public_id}.{resource.format or "img"}'))
+    with storage.open(resource) as source, open(path, 'wb') as target:
+        shutil.copyfileobj(source, target)
+    return path
+
+
+def rebuild_page_derivatives(storage, chapter_image):
+    """Regenerate one existing page's derivatives from its stored original."""
+    directory = tempfile.mkdtemp(prefix='derivative-source-')
+    try:
+        path = fetch_original(storage, chapter_image.image, directory)
+        derivatives = build_derivatives(
+            storage, path, f'{chapter_image.chapter_id}-{chapter_image.page_number:04d}', chapter_image=chapter_image
+        )
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    chapter_image.derivatives.all().delete()
+    ImageDerivative.objects.bulk_create(derivatives)
+    return derivatives
+
+
+def rebuild_comic_derivatives(storage, comic):
+    """Regenerate cover and thumbnail derivatives and the comic's stored renditions."""
+    directory = tempfile.mkdtemp(prefix='derivative-source-')
+    derivatives = []
+    try:
+        for role, resource in ((ImageDerivative.ROLE.COVER, comic.cover_image), (ImageDerivative.ROLE.THUMBNAIL, comic.thumbnail)):
+            if resource:
+                path = fetch_original(storage, resource, directory)
+                derivatives += build_derivatives(storage, path, f'{comic.slug}-{role}', comic=comic, role=role)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    comic.image_derivatives.all().delete()
+    ImageDerivative.objects.bulk_create(derivatives)
+    comic.refresh_image_renditions()
+    return derivatives
+
+
+def process_comic_derivatives(comic_id):
+    from .uploads import get_page_storage
+
+    try:
+        rebuild_comic_derivatives(get_page_storage(), Comic.objects.get(pk=comic_id))
+    except Exception:
+        logger.exception('Could not rebuild cover derivatives of comic %s', comic_id)
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from .models import ChapterEntitlement
+
+CACHE_TIMEOUT = getattr(settings, 'ENTITLEMENT_CACHE_TIMEOUT', 60 * 60)
+
+
+def cache_key(user_id, comic_id):
+    return f'entitlements:{user_id}:{comic_id}'
+
+
+def entitled_chapter_ids(user, comic_id):
+    """
+    Ids of the chapters of one comic the user has unlocked, as a frozenset.
+    Held in the cache per (user, comic), so resolving access for every
+    chapter of a comic costs one lookup.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    key = cache_key(user.pk, comic_id)
+    chapter_ids = cache.get(key)
+    if chapter_ids is None:
+        chapter_ids = frozenset(
+            ChapterEntitlement.objects.filter(user=user, comic_id=comic_id).values_list('chapter_id', flat=True)
+        )
+        cache.set(key, chapter_ids, CACHE_TIMEOUT)
+    return chapter_ids
+
+
+def invalidate(user_id, comic_id):
+    key = cache_key(user_id, comic_id)
+    cache.delete(key)
+    # Someone may re-cache the old set before the transaction commits.
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def user_has_access(user, chapter):
+    if chapter.price == 0:
+        return True
+    return chapter.id in entitled_chapter_ids(user, chapter.comic_id)
+
+
+def unlocked_chapter_ids(user, comic_id, chapters):
+    """
+    Ids among ``chapters`` (Chapter or ChapterEntry objects) the user can
+    read. Free chapters are always included, and the entitlement set is
+    only looked up when some chapter is paid.
+    """
+    free = {chapter.id for chapter in chapters if chapter.price == 0}
+    if len(free) == len(chapters):
+        return free
+    return free | entitled_chapter_ids(user, comic_id)
+
+
+def grant_chapter(user, chapter, source=ChapterEntitlement.SOURCE.PURCHASE, price=0):
+    """Create the entitlement; returns ``(entitlement, created)``."""
+    try:
+        with transaction.atomic():
+            entitlement = ChapterEntitlement.objects.create(
+                user=user, chapter=chapter, comic_id=chapter.comic_id, source=source, price=price
+            )
+    except IntegrityError:
+        return ChapterEntitlement.objects.get(user=user, chapter=chapter), False
+    return entitlement, True
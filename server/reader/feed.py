@@ -0,0 +1,106 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Bookmark, Chapter, FeedCounter, FeedItem
+from .uploads import run_in_background
+
+logger = logging.getLogger(__name__)
+
+FANOUT_BATCH_SIZE = getattr(settings, 'FEED_FANOUT_BATCH_SIZE', 1000)
+FEED_PAGE_SIZE = getattr(settings, 'FEED_PAGE_SIZE', 30)
+
+
+def start_fan_out(chapter):
+    """Fan ``chapter`` out once the current transaction commits, off the request thread."""
+    transaction.on_commit(lambda: run_in_background(fan_out_safely, chapter.pk))
+
+
+def fan_out_safely(chapter_id):
+    try:
+        fan_out(chapter_id)
+    except Exception:
+        logger.exception('Fanning out chapter %s failed', chapter_id)
+
+
+def fan_out(chapter_id, batch_size=FANOUT_BATCH_SIZE):
+    """
+    Put an active chapter in the feed of everyone who bookmarked its comic
+    and bump their unread counters. Bookmarkers are walked in ``creator``
+    order on the (comic, creator) unique index, ``batch_size`` per short
+    transaction, so a comic with 100k bookmarkers never holds long locks.
+    Users who already have the item are skipped, which makes a rerun (e.g.
+    after a crash) safe. The chapter is marked announced once every feed
+    has it. Returns the number of feeds written to.
+    """
+    chapter = Chapter.objects.filter(pk=chapter_id, active=True).only('id', 'comic_id', 'created_at').first()
+    if chapter is None or chapter.comic_id is None:
+        return 0
+    bookmarkers = Bookmark.objects.filter(comic_id=chapter.comic_id).order_by('creator_id')
+    written = 0
+    last = 0
+    while True:
+        user_ids = list(bookmarkers.filter(creator_id__gt=last).values_list('creator_id', flat=True)[:batch_size])
+        if not user_ids:
+            Chapter.objects.filter(pk=chapter.pk).update(announced_at=timezone.now())
+            return written
+        last = user_ids[-1]
+        with transaction.atomic():
+            seen = set(
+                FeedItem.objects.filter(chapter_id=chapter.pk, user_id__in=user_ids).values_list('user_id', flat=True)
+            )
+            new = [user_id for user_id in user_ids if user_id not in seen]
+            # A concurrent fan-out of the same chapter (an upload finishing as
+            # the chapter is activated) may insert some rows first; those users'
+            # counters can then be one too high until they open the feed.
+            FeedItem.objects.bulk_create(
+                [
+                    FeedItem(
+                        user_id=user_id, comic_id=chapter.comic_id, chapter_id=chapter.pk, created_at=chapter.created_at,
+                    )
+                    for user_id in new
+                ],
+                ignore_conflicts=True,
+            )
+            FeedCounter.objects.bulk_create([FeedCounter(user_id=user_id) for user_id in new], ignore_conflicts=True)
+            FeedCounter.objects.filter(user_id__in=new).update(unread=F('unread') + 1)
+        written += len(new)
+
+
+def unread_count(user):
+    return FeedCounter.objects.filter(user=user).values_list('unread', flat=True).first() or 0
+
+
+def feed_items(user):
+    return (
+        FeedItem.objects.filter(user=user)
+        .select_related('comic', 'chapter')
+        .only(
+            'created_at', 'comic__title', 'comic__slug', 'comic__thumbnail',
+            'chapter__slug', 'chapter__chapter_num', 'chapter__title', 'chapter__price',
+        )
+    )
+
+
+def serialize(item):
+    return {
+        'id': item.id,
+        'comic': {
+            'id': item.comic_id,
+            'title': item.comic.title,
+            'url': reverse('reader:comic_detail', args=[item.comic.slug]),
+            'thumbnail': item.comic.thumbnail_url,
+        },
+        'chapter': {
+            'id': item.chapter_id,
+            'chapter_num': item.chapter.chapter_num,
+            'title': item.chapter.title,
+            'url': reverse('reader:chapter_detail', args=[item.comic.slug, item.chapter.slug]),
+            'price': item.chapter.price,
+        },
+        'created': item.created_at.isoformat(),
+    }
@@ -0,0 +1,183 @@
+import os
+import re
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import UploadJob
+from .uploads import run_in_background, run_upload_job, spool_dir
+
+INGEST_WORKERS = getattr(settings, 'INGEST_WORKERS', os.cpu_count() or 2)
+INGEST_PDF_DPI = getattr(settings, 'INGEST_PDF_DPI', 150)
+INGEST_MAX_PAGES = getattr(settings, 'INGEST_MAX_PAGES', 1000)
+INGEST_MAX_PAGE_BYTES = getattr(settings, 'INGEST_MAX_PAGE_BYTES', 50 * 1024 * 1024)
+INGEST_MAX_ARCHIVE_BYTES = getattr(settings, 'INGEST_MAX_ARCHIVE_BYTES', 2 * 1024 * 1024 * 1024)
+COPY_CHUNK_BYTES = 1024 * 1024
+
+ARCHIVE_EXTENSIONS = ('.zip', '.cbz')
+PDF_EXTENSIONS = ('.pdf',)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+
+DIGITS_RE = re.compile(r'(\d+)')
+
+
+class IngestError(Exception):
+    pass
+
+
+def natural_key(name):
+    """Sort key that puts "page2.jpg" before "page10.jpg"."""
+    return [int(part) if part.isdigit() else part.lower() for part in DIGITS_RE.split(name)]
+
+
+def is_supported(name):
+    return os.path.splitext(name)[1].lower() in ARCHIVE_EXTENSIONS + PDF_EXTENSIONS
+
+
+def archive_entries(archive):
+    entries = [
+        info for info in archive.infolist()
+        if not info.is_dir()
+        and os.path.splitext(info.filename)[1].lower() in IMAGE_EXTENSIONS
+        and not os.path.basename(info.filename).startswith('.')
+        and not info.filename.startswith('__MACOSX/')
+    ]
+    return sorted(entries, key=lambda info: natural_key(info.filename))
+
+
+def copy_entry(source, target, name, archive_left):
+    """
+    Copy one archive entry to ``target`` in chunks and return the number of
+    bytes copied. The bytes actually inflated are counted, not the size the
+    header declares, and copying stops as soon as the page or the archive
+    as a whole (``archive_left`` bytes to go) is over its limit.
+    """
+    copied = 0
+    while chunk := source.read(COPY_CHUNK_BYTES):
+        copied += len(chunk)
+        if copied > INGEST_MAX_PAGE_BYTES:
+            raise IngestError(f'{name} is larger than {INGEST_MAX_PAGE_BYTES} bytes')
+        if copied > archive_left:
+            raise IngestError(f'The archive unpacks to more than {INGEST_MAX_ARCHIVE_BYTES} bytes')
+        target.write(chunk)
+    return copied
+
+
+def extract_archive_pages(path, out_dir):
+    """
+    Copy the images of a ZIP/CBZ into ``out_dir`` as 0001.ext, 0002.ext...
+    in natural filename order. Entries are streamed to disk one at a time
+    and never decoded; entry names are not used as paths. Each page may
+    inflate to INGEST_MAX_PAGE_BYTES, the whole archive to
+    INGEST_MAX_ARCHIVE_BYTES.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile as e:
+        raise IngestError('Not a valid ZIP/CBZ archive') from e
+    with archive:
+        entries = archive_entries(archive)
+        check_page_count(len(entries))
+        if sum(info.file_size for info in entries) > INGEST_MAX_ARCHIVE_BYTES:
+            raise IngestError(f'The archive unpacks to more than {INGEST_MAX_ARCHIVE_BYTES} bytes')
+        paths = []
+        remaining = INGEST_MAX_ARCHIVE_BYTES
+        for page_number, info in enumerate(entries, start=1):
+            if info.file_size > INGEST_MAX_PAGE_BYTES:
+                raise IngestError(f'{info.filename} is larger than {INGEST_MAX_PAGE_BYTES} bytes')
+            extension = os.path.splitext(info.filename)[1].lower()
+            target_path = os.path.join(out_dir, f'{page_number:04d}{extension}')
+            try:
+                with archive.open(info) as source, open(target_path, 'wb') as target:
+                    remaining -= copy_entry(source, target, info.filename, remaining)
+            except (zipfile.BadZipFile, zlib.error, EOFError) as e:
+                raise IngestError(f'{info.filename} is corrupt') from e
+            paths.append(target_path)
+    return paths
+
+
+def pdf_page_count(path):
+    from pdf2image import pdfinfo_from_path
+    from pdf2image.exceptions import PDFInfoNotInstalledError, PDFPageCountError, PDFSyntaxError
+
+    try:
+        return int(pdfinfo_from_path(path)['Pages'])
+    except PDFInfoNotInstalledError as e:
+        raise IngestError('PDF support needs poppler (pdfinfo/pdftoppm) installed') from e
+    except (PDFPageCountError, PDFSyntaxError, KeyError) as e:
+        raise IngestError('Not a readable PDF') from e
+
+
+def rasterize_pdf_page(path, out_dir, page_number, dpi):
+    from pdf2image import convert_from_path
+
+    convert_from_path(
+        path, dpi=dpi, first_page=page_number, last_page=page_number, fmt='jpeg',
+        output_folder=out_dir, output_file=f'{page_number:04d}', single_file=True, paths_only=True,
+    )
+    return os.path.join(out_dir, f'{page_number:04d}.jpg')
+
+
+def rasterize_pdf(path, out_dir, dpi=None, workers=None):
+    """
+    Render every page of a PDF to ``out_dir`` as 0001.jpg, 0002.jpg...
+    Each page is a separate pdftoppm process writing straight to disk, so
+    pages render in parallel on all cores and no decoded page is ever held
+    in this process.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    pages = pdf_page_count(path)
+    check_page_count(pages)
+    dpi = dpi or INGEST_PDF_DPI
+    with ThreadPoolExecutor(max_workers=workers or INGEST_WORKERS) as pool:
+        return list(pool.map(
+            lambda page_number: rasterize_pdf_page(path, out_dir, page_number, dpi), range(1, pages + 1)
+        ))
+
+
+def check_page_count(pages):
+    if not pages:
+        raise IngestError('No pages found')
+    if pages > INGEST_MAX_PAGES:
+        raise IngestError(f'{pages} pages is more than the limit of {INGEST_MAX_PAGES}')
+
+
+def extract_pages(path, out_dir, workers=None):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in PDF_EXTENSIONS:
+        return rasterize_pdf(path, out_dir, workers=workers)
+    if extension in ARCHIVE_EXTENSIONS:
+        return extract_archive_pages(path, out_dir)
+    raise IngestError(f'Unsupported file type {extension!r}')
+
+
+def pages_dir(job):
+    return os.path.join(spool_dir(job), 'pages')
+
+
+def process_ingest_job(job_id, source_path):
+    run_upload_job(job_id, lambda job: extract_pages(source_path, pages_dir(job)))
+
+
+def spool_source(job, upload):
+    directory = spool_dir(job)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, 'source' + os.path.splitext(upload.name)[1].lower())
+    with open(path, 'wb') as target:
+        for chunk in upload.chunks():
+            target.write(chunk)
+    return path
+
+
+def start_ingest(chapter, user, upload):
+    """Spool a PDF/ZIP/CBZ and split it into pages in the background."""
+    if not is_supported(upload.name):
+        raise IngestError('Upload a PDF, ZIP or CBZ file')
+    job = UploadJob.objects.create(chapter=chapter, user=user, source=os.path.basename(upload.name))
+    path = spool_source(job, upload)
+    transaction.on_commit(lambda: run_in_background(process_ingest_job, job.pk, path))
+    return job
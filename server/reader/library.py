@@ -0,0 +1,88 @@
+from django.db.models import Count, Exists, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.urls import reverse
+
+from .models import Bookmark, Chapter, ChapterEntitlement, ReadingProgress
+
+SORTS = {
+    'updated': (F('comic__latest_chapter_at').desc(nulls_last=True), '-id'),
+    'read': (F('last_read_at').desc(nulls_last=True), F('comic__latest_chapter_at').desc(nulls_last=True), '-id'),
+    'title': ('comic__title', 'id'),
+}
+DEFAULT_SORT = 'updated'
+
+
+def sort_or_default(sort):
+    return sort if sort in SORTS else DEFAULT_SORT
+
+
+def library(user, sort=DEFAULT_SORT):
+    """
+    Every comic ``user`` bookmarked, in one query: the comic's latest
+    chapter (Comic.latest_chapter), where the user stopped reading, how many
+    chapters came after that, and whether the latest chapter is unlocked.
+    Each subquery is an index lookup on one bookmark's comic.
+    """
+    progress = ReadingProgress.objects.filter(user=user, comic=OuterRef('comic'))
+    unread = (
+        Chapter.objects.filter(
+            comic=OuterRef('comic'), active=True, chapter_num__gt=Coalesce(OuterRef('last_read_num'), Value(0)),
+        )
+        .order_by().values('comic').annotate(total=Count('pk')).values('total')
+    )
+    return (
+        Bookmark.objects.filter(creator=user, comic__active=True)
+        .select_related('comic', 'comic__latest_chapter')
+        .only(
+            'created_date', 'comic__title', 'comic__slug', 'comic__thumbnail', 'comic__status',
+            'comic__chapter_count', 'comic__latest_chapter_at', 'comic__latest_chapter__slug',
+            'comic__latest_chapter__chapter_num', 'comic__latest_chapter__title', 'comic__latest_chapter__price',
+        )
+        .annotate(
+            last_read_at=Subquery(progress.values('updated_at')[:1]),
+            last_read_num=Subquery(progress.values('chapter__chapter_num')[:1]),
+            last_read_slug=Subquery(progress.values('chapter__slug')[:1]),
+            last_read_page=Subquery(progress.values('page')[:1]),
+            latest_entitled=Exists(
+                ChapterEntitlement.objects.filter(user=user, chapter=OuterRef('comic__latest_chapter'))
+            ),
+        )
+        .annotate(unread=Coalesce(Subquery(unread, output_field=IntegerField()), Value(0)))
+        .order_by(*SORTS[sort_or_default(sort)])
+    )
+
+
+def latest_locked(entry):
+    chapter = entry.comic.latest_chapter
+    return chapter is not None and chapter.price > 0 and not entry.latest_entitled
+
+
+def serialize(entry):
+    comic = entry.comic
+    chapter = comic.latest_chapter
+    return {
+        'comic': {
+            'id': comic.id,
+            'title': comic.title,
+            'url': reverse('reader:comic_detail', args=[comic.slug]),
+            'thumbnail': comic.thumbnail_url,
+            'status': comic.status,
+            'chapter_count': comic.chapter_count,
+        },
+        'bookmarked': entry.created_date.isoformat(),
+        'latest_chapter': chapter and {
+            'id': chapter.id,
+            'chapter_num': chapter.chapter_num,
+            'title': chapter.title,
+            'url': reverse('reader:chapter_detail', args=[comic.slug, chapter.slug]),
+            'added': comic.latest_chapter_at and comic.latest_chapter_at.isoformat(),
+            'locked': latest_locked(entry),
+        },
+        'last_read': entry.last_read_at and {
+            'chapter_num': entry.last_read_num,
+            'page': entry.last_read_page,
+            'url': reverse('reader:chapter_detail', args=[comic.slug, entry.last_read_slug]),
+            'read': entry.last_read_at.isoformat(),
+        },
+        'unread': entry.unread,
+    }
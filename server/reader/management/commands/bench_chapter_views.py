@@ -0,0 +1,86 @@
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+
+from reader.chapter_views import ChapterViewBuffer
+from reader.models import Chapter, ChapterView, Comic
+
+
+class Command(BaseCommand):
+    help = 'Record chapter views from many threads and check that none are lost.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--views', type=int, default=2000, help='Views recorded per thread.')
+        parser.add_argument('--chapters', type=int, default=5)
+        parser.add_argument('--threshold', type=int, default=100)
+
+    def handle(self, *args, **options):
+        comic = Comic.objects.create(title=f'bench-views-{int(time.time())}')
+        chapters = [
+            Chapter.objects.create(comic=comic, chapter_num=num)
+            for num in range(1, options['chapters'] + 1)
+        ]
+        chapter_ids = [chapter.id for chapter in chapters]
+        buffer = ChapterViewBuffer(flush_interval=0.5, flush_threshold=options['threshold'])
+        expected = {chapter_id: 0 for chapter_id in chapter_ids}
+        expected_lock = threading.Lock()
+        errors = []
+
+        def worker():
+            local = {chapter_id: 0 for chapter_id in chapter_ids}
+            try:
+                for _ in range(options['views']):
+                    chapter_id = random.choice(chapter_ids)
+                    buffer.record(chapter_id)
+                    local[chapter_id] += 1
+            except Exception as e:
+                errors.append(e)
+            finally:
+                with expected_lock:
+                    for chapter_id, count in local.items():
+                        expected[chapter_id] += count
+                connection.close()
+
+        try:
+            threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            buffer.flush(chapter_ids)
+            elapsed = time.perf_counter() - started
+
+            stored = dict(
+                ChapterView.objects.filter(chapter_id__in=chapter_ids).values_list('chapter_id', 'views')
+            )
+            total_expected = sum(expected.values())
+            total_stored = ChapterView.objects.filter(chapter_id__in=chapter_ids).aggregate(
+                total=Sum('views')
+            )['total'] or 0
+
+            self.stdout.write(
+                f'{total_expected} views from {options["threads"]} threads in {elapsed:.2f}s '
+                f'({total_expected / elapsed:.0f} views/s)'
+            )
+            for error in errors:
+                self.stderr.write(f'worker error: {error!r}')
+            lost = {
+                chapter_id: expected[chapter_id] - stored.get(chapter_id, 0)
+                for chapter_id in chapter_ids
+                if expected[chapter_id] != stored.get(chapter_id, 0)
+            }
+            if lost or total_stored != total_expected:
+                raise CommandError(
+                    f'{total_expected - total_stored} views lost; mismatch (expected - stored): {lost}'
+                )
+            if errors:
+                raise CommandError(f'{len(errors)} workers failed.')
+            self.stdout.write(self.style.SUCCESS(f'No lost increments ({total_stored} stored).'))
+        finally:
+            comic.delete()
@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from PIL import Image as PILImage
+
+from reader.ingest import IngestError, extract_pages
+
+
+def synthetic_page(number, size):
+    image = PILImage.new('RGB', size, ((number * 37) % 256, (number * 91) % 256, 200))
+    # A little detail so JPEG/PDF compression has something to chew on.
+    for y in range(0, size[1], 40):
+        image.paste((number % 256, y % 256, 0), (0, y, size[0], y + 4))
+    return image
+
+
+class Command(BaseCommand):
+    help = 'Measure PDF rasterization and ZIP/CBZ extraction throughput on synthetic chapters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=100)
+        parser.add_argument('--width', type=int, default=800)
+        parser.add_argument('--height', type=int, default=2400)
+        parser.add_argument('--workers', default='1,2,4', help='Comma separated worker counts to try for PDFs.')
+
+    def handle(self, *args, **options):
+        size = (options['width'], options['height'])
+        workdir = tempfile.mkdtemp(prefix='bench-ingest-')
+        try:
+            cbz = os.path.join(workdir, 'chapter.cbz')
+            with zipfile.ZipFile(cbz, 'w') as archive:
+                for number in range(1, options['pages'] + 1):
+                    buffer = BytesIO()
+                    synthetic_page(number, size).save(buffer, format='JPEG', quality=85)
+                    archive.writestr(f'page{number}.jpg', buffer.getvalue())
+
+            pdf = os.path.join(workdir, 'chapter.pdf')
+            pages = (synthetic_page(number, size) for number in range(2, options['pages'] + 1))
+            synthetic_page(1, size).save(pdf, save_all=True, append_images=pages, resolution=150)
+
+            self.run(f'cbz ({os.path.getsize(cbz) // 1024} KiB)', cbz, workdir, None)
+            for workers in [int(value) for value in options['workers'].split(',')]:
+                if not self.run(f'pdf, {workers} workers', pdf, workdir, workers):
+                    break
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def run(self, label, path, workdir, workers):
+        out_dir = os.path.join(workdir, 'out')
+        started = time.perf_counter()
+        try:
+            paths = extract_pages(path, out_dir, workers=workers)
+        except IngestError as e:
+            self.stderr.write(f'{label}: skipped ({e})')
+            return False
+        elapsed = time.perf_counter() - started
+        shutil.rmtree(out_dir)
+        self.stdout.write(f'{label}: {len(paths)} pages in {elapsed:.2f}s ({len(paths) / elapsed:.1f} pages/s)')
+        return True
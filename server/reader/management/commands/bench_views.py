@@ -0,0 +1,171 @@
+import json
+import logging
+import math
+import statistics
+import time
+import tracemalloc
+
+import cloudinary
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from reader.coins import credit
+from reader.models import Bookmark, Category, Comic, Comment
+from reader.seeding import scaled, seed_catalog
+
+# Not benchmarked: ProductListView, BuyChapterView.get and the payment pages
+# render templates this app does not ship, and uploads are covered by bench_ingest.
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure queries, wall time and peak memory of every view under the Django test '
+        'client, against the current catalog or one seeded with --seed-scale. Everything, '
+        'including the POSTs, runs in a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--seed-scale', type=float, help='Seed a catalog of this scale (see seed_catalog) first.')
+        parser.add_argument('--page-cache', action='store_true', help='Leave the anonymous page cache on.')
+        parser.add_argument('--only', help='Comma separated view labels to run.')
+        parser.add_argument('--json', dest='json_path', help='Write the results to this file.')
+        parser.add_argument('--baseline', help='Results file of an earlier run to compare against.')
+
+    def handle(self, *args, **options):
+        logging.getLogger('reader.requests').setLevel(logging.WARNING)
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        # Page URLs are built locally, but cloudinary needs a cloud name to build them.
+        if not cloudinary.config().cloud_name:
+            cloudinary.config(cloud_name='bench')
+        setup_test_environment(debug=False)
+        try:
+            with override_settings(PAGE_CACHE_ENABLED=options['page_cache']), transaction.atomic():
+                if options['seed_scale']:
+                    seed_catalog(**scaled(options['seed_scale']), prefix='bench', log=self.stdout.write)
+                results = self.run_scenarios(options)
+                transaction.set_rollback(True)
+        finally:
+            teardown_test_environment()
+
+        self.report(results, baseline)
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+    def scenarios(self):
+        """``(label, client, method, url, data)`` for every view worth measuring."""
+        comic = Comic.objects.filter(active=True, chapter_count__gt=1).order_by('-popularity_score', 'id').first()
+        if comic is None:
+            raise CommandError('No comics with chapters; run seed_catalog or pass --seed-scale.')
+        chapters = list(comic.chapters.filter(active=True).order_by('chapter_num'))
+        chapter = next((chapter for chapter in chapters[len(chapters) // 2:] if chapter.price == 0), chapters[0])
+        paid = next((chapter for chapter in chapters if chapter.price > 0), chapter)
+        category = Category.objects.filter(comics=comic).first() or Category.objects.create(name='Bench')
+        comment = Comment.objects.filter(comic=comic, reply_to=None).first() or Comment.objects.create(
+            comic=comic, creator=get_user_model().objects.create_user('bench-commenter'), content='bench',
+        )
+
+        User = get_user_model()
+        reader = User.objects.create_user('bench-reader')
+        Bookmark.objects.bulk_create([
+            Bookmark(comic=bookmarked, creator=reader)
+            for bookmarked in Comic.objects.filter(active=True).order_by('-popularity_score')[:30]
+        ])
+        credit(reader, 10000)
+        staff = User.objects.create_user('bench-staff', is_staff=True)
+        anonymous, signed_in, admin = Client(), Client(), Client()
+        signed_in.force_login(reader)
+        admin.force_login(staff)
+
+        word = comic.title.split()[0]
+        detail = reverse('reader:comic_detail', args=[comic.slug])
+        reading = reverse('reader:chapter_detail', args=[comic.slug, chapter.slug])
+        return [
+            ('comic_list', anonymous, 'get', reverse('reader:comic_list'), {}),
+            ('latest_comics', anonymous, 'get', reverse('reader:latest_comics'), {}),
+            ('popular_comics', anonymous, 'get', reverse('reader:popular_comics'), {}),
+            ('category_list', anonymous, 'get', reverse('reader:category_list'), {}),
+            ('category_detail', anonymous, 'get', reverse('reader:category_detail', args=[category.pk]), {}),
+            ('comic_detail', anonymous, 'get', detail, {}),
+            ('comic_detail:user', signed_in, 'get', detail, {}),
+            ('chapter_detail', anonymous, 'get', reading, {}),
+            ('chapter_detail:user', signed_in, 'get', reading, {}),
+            ('jump_to_chapter', anonymous, 'get', reverse('reader:jump_to_chapter', args=[comic.slug]), {'num': chapter.chapter_num}),
+            ('chapter_manifest', anonymous, 'get', reverse('reader:chapter_manifest', args=[chapter.pk]), {}),
+            ('chapter_prefetch', anonymous, 'get', reverse('reader:chapter_prefetch', args=[chapter.pk]), {}),
+            ('comment_replies', anonymous, 'get', reverse('reader:comment_replies', args=[comment.pk]), {}),
+            ('comic_search', anonymous, 'get', reverse('reader:comic_search'), {'q': word}),
+            ('comic_autocomplete', anonymous, 'get', reverse('reader:comic_autocomplete'), {'q': word[:3]}),
+            ('signup', anonymous, 'get', reverse('signup'), {}),
+            ('profile', signed_in, 'get', reverse('reader:profile'), {}),
+            ('bookmarks', signed_in, 'get', reverse('reader:bookmarks'), {}),
+            ('library', signed_in, 'get', reverse('reader:library'), {'sort': 'read'}),
+            ('feed', signed_in, 'get', reverse('reader:feed'), {}),
+            ('feed_seen', signed_in, 'post', reverse('reader:feed_seen'), {}),
+            ('buy_coins', signed_in, 'get', reverse('reader:buy_coins'), {}),
+            ('upload_chapter_images', signed_in, 'get', reverse('reader:upload_chapter_images', args=[comic.slug]), {}),
+            ('bookmark_toggle', signed_in, 'post', reverse('reader:bookmark_toggle', args=[comic.slug]), {}),
+            ('rate_comic', signed_in, 'post', reverse('reader:rate_comic', args=[comic.slug]), {'rating': 4}),
+            ('add_comment', signed_in, 'post', reverse('reader:add_comment', args=[comic.slug]), {'content': 'bench'}),
+            ('reply_comment', signed_in, 'post', reverse('reader:reply_comment', args=[comment.pk]), {'content': 'bench'}),
+            ('chapter_view_update', signed_in, 'post', reverse('reader:chapter_view_update', args=[chapter.pk]), {}),
+            ('reading_progress', signed_in, 'post', reverse('reader:reading_progress', args=[chapter.pk]), {'page': 3}),
+            ('buy_chapter', signed_in, 'post', reverse('reader:buy_chapter', args=[paid.pk]), {}),
+            ('request_metrics', admin, 'get', reverse('request_metrics'), {}),
+        ]
+
+    def run_scenarios(self, options):
+        only = set(options['only'].split(',')) if options['only'] else None
+        results = {}
+        for label, client, method, url, data in self.scenarios():
+            if only and label not in only:
+                continue
+            request = getattr(client, method)
+            response = request(url, data)  # warm caches, as in steady state
+            with CaptureQueriesContext(connection) as queries:
+                request(url, data)
+            query_count = len(queries)  # the log is cleared by the next request
+            timings = []
+            for _ in range(options['iterations']):
+                started = time.perf_counter()
+                request(url, data)
+                timings.append((time.perf_counter() - started) * 1000)
+            tracemalloc.start()
+            request(url, data)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            timings.sort()
+            results[label] = {
+                'status': response.status_code,
+                'queries': query_count,
+                'p50_ms': round(statistics.median(timings), 2),
+                'p95_ms': round(timings[math.ceil(len(timings) * 0.95) - 1], 2),
+                'peak_kib': round(peak / 1024),
+            }
+        return results
+
+    def report(self, results, baseline):
+        self.stdout.write(
+            f'{"view":<24} {"status":>6} {"queries":>7} {"p50 ms":>8} {"p95 ms":>8} {"peak KiB":>9}'
+            + ('  vs baseline' if baseline else '')
+        )
+        for label, result in results.items():
+            line = (
+                f'{label:<24} {result["status"]:>6} {result["queries"]:>7} {result["p50_ms"]:>8.1f} '
+                f'{result["p95_ms"]:>8.1f} {result["peak_kib"]:>9}'
+            )
+            before = baseline.get(label)
+            if before:
+                change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+                line += f'  p50 {change:+.0f}%, queries {result["queries"] - before["queries"]:+d}'
+            style = self.style.WARNING if result['status'] >= 400 else (lambda text: text)
+            self.stdout.write(style(line))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from reader.derivatives import rebuild_comic_derivatives, rebuild_page_derivatives
+from reader.models import Chapter, ChapterImage, Comic
+from reader.uploads import get_page_storage
+
+
+class Command(BaseCommand):
+    help = 'Generate responsive WebP/AVIF derivatives for pages, covers and thumbnails.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--comic', help='Only this comic (slug).')
+        parser.add_argument('--all', action='store_true', help='Rebuild pages that already have derivatives too.')
+        parser.add_argument('--skip-covers', action='store_true')
+
+    def handle(self, *args, **options):
+        storage = get_page_storage()
+        comics = Comic.objects.all()
+        pages = ChapterImage.objects.select_related('chapter').order_by('chapter_id', 'page_number')
+        if options['comic']:
+            comics = comics.filter(slug=options['comic'])
+            pages = pages.filter(chapter__comic__slug=options['comic'])
+        if not options['all']:
+            pages = pages.filter(derivatives__isnull=True)
+
+        chapter_ids = set()
+        count = 0
+        for page in pages.iterator():
+            try:
+                rebuild_page_derivatives(storage, page)
+            except Exception as e:
+                self.stderr.write(f'{page}: {e}')
+                continue
+            chapter_ids.add(page.chapter_id)
+            count += 1
+        for chapter in Chapter.objects.filter(id__in=chapter_ids):
+            chapter.refresh_page_manifest()
+        self.stdout.write(f'Built derivatives for {count} pages in {len(chapter_ids)} chapters.')
+
+        if not options['skip_covers']:
+            covers = 0
+            for comic in comics.iterator():
+                if comic.cover_image or comic.thumbnail:
+                    try:
+                        rebuild_comic_derivatives(storage, comic)
+                    except Exception as e:
+                        self.stderr.write(f'{comic}: {e}')
+                        continue
+                    covers += 1
+            self.stdout.write(f'Built cover derivatives for {covers} comics.')
+        self.stdout.write(self.style.SUCCESS('Done.'))
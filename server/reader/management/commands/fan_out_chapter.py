@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from reader.feed import FANOUT_BATCH_SIZE, fan_out
+
+
+class Command(BaseCommand):
+    help = (
+        "Put chapters in their bookmarkers' feeds. New chapters are fanned out in the "
+        'background when created; this reruns that, e.g. after a crash. Feeds that '
+        'already have a chapter are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('chapter_ids', nargs='+', type=int)
+        parser.add_argument('--batch-size', type=int, default=FANOUT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        for chapter_id in options['chapter_ids']:
+            written = fan_out(chapter_id, batch_size=options['batch_size'])
+            self.stdout.write(f'Chapter {chapter_id}: added to {written} feeds.')
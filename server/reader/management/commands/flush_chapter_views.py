@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from reader.chapter_views import chapter_views
+
+
+class Command(BaseCommand):
+    help = 'Write buffered chapter view counts to the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        flushed = chapter_views.flush_all(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Flushed {flushed} chapter views.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from reader.reading_progress import reading_progress
+
+
+class Command(BaseCommand):
+    help = 'Write buffered reading progress to the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        flushed = reading_progress.flush_all(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Flushed reading progress for {flushed} comics.'))
@@ -0,0 +1,48 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reader.ingest import extract_pages, is_supported, pages_dir
+from reader.models import Chapter, Comic, UploadJob
+from reader.uploads import run_upload_job
+
+
+class Command(BaseCommand):
+    help = 'Create or replace a chapter\'s pages from a PDF, ZIP or CBZ file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('comic', help='Slug of the comic.')
+        parser.add_argument('path', help='PDF, ZIP or CBZ file.')
+        parser.add_argument('--chapter-num', type=int, help='Defaults to the next chapter number.')
+        parser.add_argument('--title', default='')
+        parser.add_argument('--workers', type=int, help='Parallel PDF page renders.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path) or not is_supported(path):
+            raise CommandError(f'{path} is not a PDF, ZIP or CBZ file')
+        try:
+            comic = Comic.objects.get(slug=options['comic'])
+        except Comic.DoesNotExist:
+            raise CommandError(f'No comic with slug {options["comic"]!r}')
+
+        if options['chapter_num'] is None:
+            chapter = Chapter.objects.create(comic=comic, title=options['title'])
+        else:
+            chapter, _ = Chapter.objects.get_or_create(
+                comic=comic, chapter_num=options['chapter_num'], defaults={'title': options['title']}
+            )
+        job = UploadJob.objects.create(chapter=chapter, source=os.path.basename(path))
+
+        started = time.perf_counter()
+        run_upload_job(job.pk, lambda job: extract_pages(path, pages_dir(job), workers=options['workers']))
+        elapsed = time.perf_counter() - started
+
+        job.refresh_from_db()
+        if job.status != UploadJob.STATUS.COMPLETED:
+            raise CommandError(f'Ingest failed: {job.error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Chapter {chapter.chapter_num}: {job.processed_pages} pages in {elapsed:.1f}s '
+            f'({job.processed_pages / elapsed:.1f} pages/s)'
+        ))
@@ -0,0 +1,124 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.crypto import get_random_string
+
+from reader.models import Chapter, Comic
+
+ENDPOINTS = {
+    'view': lambda comic, chapter: (f'/api/chapter/{chapter.pk}/view/', {}),
+    'bookmark': lambda comic, chapter: (f'/comic/{comic.slug}/bookmark/', {}),
+    'rate': lambda comic, chapter: (f'/comic/{comic.slug}/rate/', {'rating': 4}),
+}
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Start the app under gunicorn once per interface (sync WSGI workers, uvicorn ASGI '
+        'workers) on this machine, drive one JSON endpoint with concurrent signed-in '
+        'clients and compare requests/s and latency. Point DATABASE_URL at Postgres: '
+        'SQLite serializes the writes these endpoints make.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='view')
+        parser.add_argument('--interfaces', nargs='+', choices=('wsgi', 'asgi'), default=['wsgi', 'asgi'])
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--port', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        user, _ = get_user_model().objects.get_or_create(username='loadtest')
+        comic = Comic.objects.create(title=f'loadtest-{int(time.time())}')
+        chapter = Chapter.objects.create(comic=comic, chapter_num=1)
+        session = SessionStore()
+        session.update({
+            SESSION_KEY: str(user.pk),
+            BACKEND_SESSION_KEY: 'django.contrib.auth.backends.ModelBackend',
+            HASH_SESSION_KEY: user.get_session_auth_hash(),
+        })
+        session.create()
+        path, data = ENDPOINTS[options['endpoint']](comic, chapter)
+        try:
+            results = [
+                (interface, self.run_interface(interface, path, data, session.session_key, options))
+                for interface in options['interfaces']
+            ]
+        finally:
+            session.delete()
+            comic.delete()
+
+        self.stdout.write(f'\nPOST {path}: {options["requests"]} requests, {options["concurrency"]} clients, '
+                          f'{options["workers"]} workers')
+        self.stdout.write(f'{"interface":<10} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8} {"errors":>7}')
+        for interface, (rate, p50, p99, errors) in results:
+            self.stdout.write(f'{interface:<10} {rate:>8.0f} {p50:>8.1f} {p99:>8.1f} {errors:>7}')
+
+    def run_interface(self, interface, path, data, session_key, options):
+        url = f'http://127.0.0.1:{options["port"]}{path}'
+        env = dict(
+            os.environ, SERVER_INTERFACE=interface, PORT=str(options['port']),
+            WEB_CONCURRENCY=str(options['workers']), GUNICORN_ACCESS_LOG='',
+        )
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        )
+        try:
+            self.wait_until_up(url, server)
+            self.stdout.write(f'{interface}: serving on port {options["port"]}')
+            self.drive(url, data, session_key, min(options['requests'], 100), options['concurrency'])
+            return self.drive(url, data, session_key, options['requests'], options['concurrency'])
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    def wait_until_up(self, url, server):
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'gunicorn exited:\n{server.stderr.read().decode()}')
+            try:
+                requests.get(url, timeout=1)
+                return
+            except requests.ConnectionError:
+                time.sleep(0.2)
+        raise CommandError(f'gunicorn did not answer on {url}')
+
+    def drive(self, url, data, session_key, count, concurrency):
+        """POST ``count`` times from ``concurrency`` threads; returns (req/s, p50 ms, p99 ms, errors)."""
+        csrf_token = get_random_string(32)
+        local = threading.local()
+
+        def post(_):
+            if not hasattr(local, 'client'):
+                local.client = requests.Session()
+                local.client.cookies.update({settings.SESSION_COOKIE_NAME: session_key, settings.CSRF_COOKIE_NAME: csrf_token})
+            started = time.perf_counter()
+            try:
+                ok = local.client.post(url, data=data, headers={'X-CSRFToken': csrf_token}, timeout=30).status_code == 200
+            except requests.RequestException:
+                ok = False
+            return time.perf_counter() - started, ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(post, range(count)))
+        elapsed = time.perf_counter() - started
+        latencies = sorted(latency * 1000 for latency, _ in results)
+        errors = sum(1 for _, ok in results if not ok)
+        return count / elapsed, percentile(latencies, 0.5), percentile(latencies, 0.99), errors
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from reader.models import Chapter
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the stored page manifest of chapters (all, or those of one comic).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--comic', help='Only chapters of the comic with this slug.')
+
+    def handle(self, *args, **options):
+        chapters = Chapter.objects.all()
+        if options['comic']:
+            chapters = chapters.filter(comic__slug=options['comic'])
+        count = 0
+        for chapter in chapters.iterator():
+            chapter.refresh_page_manifest()
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt page manifests for {count} chapters.'))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from reader.counters import reconcile
+from reader.models import Comic
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the denormalized comic counters (bookmarks, ratings, comments, chapters, views) '
+        'from their source rows, report drift and repair it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report drift.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        checked = drifted = 0
+        batch = []
+        comic_ids = Comic.objects.order_by('id').values_list('id', flat=True)
+        for comic_id in comic_ids.iterator(chunk_size=options['batch_size']):
+            batch.append(comic_id)
+            if len(batch) >= options['batch_size']:
+                drifted += self.reconcile(batch, options['dry_run'])
+                checked += len(batch)
+                batch = []
+        if batch:
+            drifted += self.reconcile(batch, options['dry_run'])
+            checked += len(batch)
+
+        action = 'found' if options['dry_run'] else 'repaired'
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} comics, {action} drift in {drifted}.'))
+
+    def reconcile(self, comic_ids, dry_run):
+        drift = reconcile(comic_ids, fix=not dry_run)
+        for comic_id, counters in sorted(drift.items()):
+            changes = ', '.join(f'{name} {stored} -> {actual}' for name, (stored, actual) in counters.items())
+            self.stdout.write(f'Comic {comic_id}: {changes}')
+        return len(drift)
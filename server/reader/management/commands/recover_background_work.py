@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from reader.derivatives import derivatives_enabled, rebuild_comic_derivatives
+from reader.feed import fan_out
+from reader.models import Chapter, Comic
+from reader.uploads import UPLOAD_JOB_TIMEOUT, fail_stale_jobs, get_page_storage
+
+
+class Command(BaseCommand):
+    help = (
+        'Clean up after background work lost to a restart: fail upload and ingest jobs '
+        'that stopped reporting, fan out readable chapters that were never announced and '
+        'rebuild cover derivatives that were dropped but never rebuilt. Run it periodically.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--timeout', type=int, default=UPLOAD_JOB_TIMEOUT,
+            help='Seconds of silence after which work counts as lost.',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options['timeout'])
+
+        failed = fail_stale_jobs(options['timeout'])
+        self.stdout.write(f'Failed {failed} stale upload jobs.')
+
+        chapters = (
+            Chapter.objects.filter(
+                active=True, comic__isnull=False, announced_at__isnull=True,
+                chapter_images__isnull=False, updated_at__lt=cutoff,
+            )
+            .values_list('id', flat=True)
+            .distinct()
+        )
+        announced = 0
+        for chapter_id in chapters:
+            fan_out(chapter_id)
+            announced += 1
+        self.stdout.write(f'Fanned out {announced} chapters.')
+
+        rebuilt = 0
+        if derivatives_enabled():
+            storage = get_page_storage()
+            comics = (
+                Comic.objects.filter(image_derivatives__isnull=True, updated_at__lt=cutoff)
+                .exclude(Q(cover_image__isnull=True) | Q(cover_image=''), Q(thumbnail__isnull=True) | Q(thumbnail=''))
+            )
+            for comic in comics.iterator():
+                try:
+                    rebuild_comic_derivatives(storage, comic)
+                except Exception as e:
+                    self.stderr.write(f'{comic}: {e}')
+                    continue
+                rebuilt += 1
+        self.stdout.write(f'Rebuilt cover derivatives for {rebuilt} comics.')
+        self.stdout.write(self.style.SUCCESS('Done.'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from reader.popularity import refresh_popularity
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute comic popularity scores. Run often (e.g. every few minutes) '
+        'for incremental updates and with --full once a day so view decay applies everywhere.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rescore every comic.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        refreshed = refresh_popularity(full=options['full'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Refreshed popularity for {refreshed} comics.'))
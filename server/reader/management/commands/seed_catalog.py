@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from reader.models import Comic
+from reader.seeding import FULL_SIZE, clear_catalog, scaled, seed_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a synthetic catalog with bulk inserts for benchmarks and load tests. '
+        '--scale 1 is 50k comics, 2M chapters, 50M pages and 100k users; every '
+        'size can also be set on its own.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=0.01)
+        for name in FULL_SIZE:
+            parser.add_argument(f'--{name.replace("_", "-")}', type=int, dest=name)
+        parser.add_argument('--prefix', default='seed', help='Slug and username prefix of the seeded rows.')
+        parser.add_argument('--password', help='Password of the seeded users (default: unusable).')
+        parser.add_argument('--paid-after', type=int, default=30, help='Chapters after this number cost coins.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--clear', action='store_true', help='Delete a previous catalog with this prefix first.')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        existing = Comic.objects.filter(slug__startswith=f'{prefix}-')
+        if options['clear']:
+            with transaction.atomic():
+                self.stdout.write(f'Deleted {clear_catalog(prefix)} rows of the previous catalog.')
+        elif existing.exists():
+            raise CommandError(f'A catalog with prefix "{prefix}" exists; pass --clear or another --prefix.')
+
+        sizes = scaled(options['scale'], **{name: options[name] for name in FULL_SIZE})
+        self.stdout.write(', '.join(f'{name}={value}' for name, value in sizes.items()))
+        with transaction.atomic():
+            created = seed_catalog(
+                **sizes, prefix=prefix, password=options['password'], paid_after=options['paid_after'],
+                seed=options['seed'], batch_size=options['batch_size'], log=self.stdout.write,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Seeded ' + ', '.join(f'{count} {label}' for label, count in created.items())
+        ))
@@ -0,0 +1,281 @@
+import atexit
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.urls import URLPattern, get_resolver
+
+from .chapter_views import buffer_cache
+
+logger = logging.getLogger('reader.requests')
+
+ENABLED = getattr(settings, 'REQUEST_METRICS_ENABLED', True)
+SERVER_TIMING = getattr(settings, 'REQUEST_METRICS_SERVER_TIMING', True)
+FLUSH_INTERVAL = getattr(settings, 'REQUEST_METRICS_FLUSH_INTERVAL', 10)
+# A statement run this often in one request is reported as a likely N+1.
+REPEAT_THRESHOLD = getattr(settings, 'REQUEST_METRICS_REPEAT_THRESHOLD', 5)
+
+# Upper bounds (ms) of the latency histogram buckets; the last one is open.
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+TOTALS = ('requests', 'duration_ms', 'db_ms', 'queries', 'duplicate_queries', 'template_ms', 'cache_hits')
+KEY_PREFIX = 'reqmetrics'
+
+# Same statement, different number of IN (...) parameters.
+IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+
+current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """What one request spent, filled in by the query wrapper and the middleware."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = Counter()
+        self.render_started = None
+        self.template_time = 0.0
+
+    def add_query(self, sql, duration):
+        self.queries += 1
+        self.db_time += duration
+        self.statements[IN_LIST.sub('(%s...)', sql)] += 1
+
+    @property
+    def duplicate_queries(self):
+        return self.queries - len(self.statements)
+
+    def repeated(self):
+        return {sql: count for sql, count in self.statements.most_common(3) if count >= REPEAT_THRESHOLD}
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, time.perf_counter() - started)
+
+
+@receiver(connection_created)
+def install_query_wrapper(sender, connection, **kwargs):
+    # Every connection, on every thread, so queries from sync_to_async
+    # threads count towards the request that started them.
+    if ENABLED and record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def bucket_of(duration_ms):
+    for index, bound in enumerate(BUCKETS):
+        if duration_ms <= bound:
+            return index
+    return len(BUCKETS)
+
+
+def metric_key(view_name, name):
+    return f'{KEY_PREFIX}:{view_name}:{name}'
+
+
+def metric_names():
+    return list(TOTALS) + [f'b{index}' for index in range(len(BUCKETS) + 1)]
+
+
+class MetricsBuffer:
+    """
+    Per-view request totals and latency histograms, summed in process and
+    added to the shared cache every REQUEST_METRICS_FLUSH_INTERVAL seconds,
+    so the histogram covers every worker without a cache write per request.
+    The totals go to 'buffers', where cached pages can't evict them.
+    """
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = time.monotonic()
+
+    def record(self, view_name, duration_ms, metrics, cache_hit):
+        with self._lock:
+            totals = self._pending.setdefault(view_name, Counter())
+            totals.update({
+                'requests': 1,
+                'duration_ms': round(duration_ms),
+                'db_ms': round(metrics.db_time * 1000),
+                'queries': metrics.queries,
+                'duplicate_queries': metrics.duplicate_queries,
+                'template_ms': round(metrics.template_time * 1000),
+                'cache_hits': int(cache_hit),
+                f'b{bucket_of(duration_ms)}': 1,
+            })
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        for view_name, totals in pending.items():
+            for name, value in totals.items():
+                if not value:
+                    continue
+                key = metric_key(view_name, name)
+                try:
+                    buffer_cache.incr(key, value)
+                except ValueError:
+                    if not buffer_cache.add(key, value, None):
+                        buffer_cache.incr(key, value)
+
+
+request_metrics = MetricsBuffer()
+atexit.register(request_metrics.flush)
+
+
+def percentile(buckets, fraction):
+    """Upper bound (ms) of the bucket holding the ``fraction`` quantile; None past the last bound."""
+    total = sum(buckets)
+    seen = 0
+    for index, count in enumerate(buckets):
+        seen += count
+        if total and seen >= total * fraction:
+            return BUCKETS[index] if index < len(BUCKETS) else None
+    return None
+
+
+def summary(names):
+    """Aggregated metrics of the views in ``names``, as stored in the cache by every process."""
+    keys = {metric_key(view_name, name): (view_name, name) for view_name in names for name in metric_names()}
+    stored = buffer_cache.get_many(list(keys))
+    views = {}
+    for key, value in stored.items():
+        view_name, name = keys[key]
+        views.setdefault(view_name, Counter())[name] = value
+    result = {}
+    for view_name, values in sorted(views.items()):
+        requests = values['requests']
+        if not requests:
+            continue
+        buckets = [values[f'b{index}'] for index in range(len(BUCKETS) + 1)]
+        result[view_name] = {
+            'requests': requests,
+            'p50_ms': percentile(buckets, 0.5),
+            'p95_ms': percentile(buckets, 0.95),
+            'p99_ms': percentile(buckets, 0.99),
+            'mean_ms': round(values['duration_ms'] / requests, 1),
+            'mean_db_ms': round(values['db_ms'] / requests, 1),
+            'mean_queries': round(values['queries'] / requests, 1),
+            'mean_duplicate_queries': round(values['duplicate_queries'] / requests, 1),
+            'mean_template_ms': round(values['template_ms'] / requests, 1),
+            'cache_hit_ratio': round(values['cache_hits'] / requests, 3),
+            'histogram': dict(zip([f'<={bound}' for bound in BUCKETS] + [f'>{BUCKETS[-1]}'], buckets)),
+        }
+    return result
+
+
+def view_names(patterns=None, namespaces=()):
+    """Every name ``resolver_match.view_name`` can take in this URLconf."""
+    names = set()
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        if isinstance(pattern, URLPattern):
+            names.add(':'.join(namespaces + (pattern.name,)) if pattern.name else pattern.lookup_str)
+        else:
+            names |= view_names(pattern.url_patterns, namespaces + ((pattern.namespace,) if pattern.namespace else ()))
+    return names
+
+
+def reset(names):
+    buffer_cache.delete_many([metric_key(view_name, name) for view_name in names for name in metric_names()])
+
+
+class RequestMetricsMiddleware:
+    """
+    Times every request that resolved to a view: queries (count, total time
+    and repeated statements), template rendering and whether it was served
+    from the page cache or as a 304. Adds a Server-Timing header, logs one
+    JSON line to the ``reader.requests`` logger and feeds the per-view
+    histogram behind RequestMetricsView. Goes first in MIDDLEWARE so the
+    totals include the other middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not ENABLED:
+            return self.get_response(request)
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        if not ENABLED:
+            return await self.get_response(request)
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def process_template_response(self, request, response):
+        metrics = current.get()
+        if metrics is not None:
+            metrics.render_started = time.perf_counter()
+
+            def rendered(response):
+                metrics.template_time = time.perf_counter() - metrics.render_started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, metrics):
+        duration_ms = (time.perf_counter() - metrics.started) * 1000
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return response
+        cache_hit = response.get('X-Page-Cache') == 'hit' or response.status_code == 304
+        if SERVER_TIMING:
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"',
+                f'tpl;dur={metrics.template_time * 1000:.1f}',
+                f'app;dur={duration_ms:.1f}',
+            ])
+        repeated = metrics.repeated()
+        logger.info(json.dumps({
+            'view': match.view_name,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 1),
+            'db_ms': round(metrics.db_time * 1000, 1),
+            'queries': metrics.queries,
+            'duplicate_queries': metrics.duplicate_queries,
+            'template_ms': round(metrics.template_time * 1000, 1),
+            'cache': response.get('X-Page-Cache') or ('not_modified' if response.status_code == 304 else None),
+            **({'repeated_queries': repeated} if repeated else {}),
+        }))
+        request_metrics.record(match.view_name, duration_ms, metrics, cache_hit)
+        return response
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:11
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_totals(apps, schema_editor):
+    Comic = apps.get_model('reader', 'Comic')
+    Rating = apps.get_model('reader', 'Rating')
+    totals = Rating.objects.values('comic_id').annotate(count=Count('id'), total=Sum('rate'))
+    for row in totals:
+        Comic.objects.filter(pk=row['comic_id']).update(rating_count=row['count'], rating_sum=row['total'] or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comic',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comic',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_rating_totals, migrations.RunPython.noop),
+    ]
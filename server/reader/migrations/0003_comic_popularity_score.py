@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0002_comic_rating_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comic',
+            name='popularity_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comic',
+            name='popularity_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='comic',
+            index=models.Index(condition=models.Q(('active', True)), fields=['-popularity_score', '-id'], name='comic_popularity_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+from django.db import migrations
+
+POSTGRES_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    """
+    ALTER TABLE reader_comic ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(author, '')), 'B')
+        || setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    'CREATE INDEX reader_comic_search_vector_idx ON reader_comic USING gin (search_vector)',
+    'CREATE INDEX reader_comic_title_trgm_idx ON reader_comic USING gin (title gin_trgm_ops)',
+]
+
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS reader_comic_title_trgm_idx',
+    'DROP INDEX IF EXISTS reader_comic_search_vector_idx',
+    'ALTER TABLE reader_comic DROP COLUMN IF EXISTS search_vector',
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE reader_comic_fts USING fts5(
+        title, author, description,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    "INSERT INTO reader_comic_fts (reader_comic_fts, rank) VALUES ('rank', 'bm25(10.0, 5.0, 1.0)')",
+    """
+    INSERT INTO reader_comic_fts (rowid, title, author, description)
+    SELECT id, title, COALESCE(author, ''), description FROM reader_comic
+    """,
+]
+
+SQLITE_BACKWARD = [
+    'DROP TABLE IF EXISTS reader_comic_fts',
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for sql in statements.get(vendor, []):
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0003_comic_popularity_score'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            run({'postgresql': POSTGRES_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
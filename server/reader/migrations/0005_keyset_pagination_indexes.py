@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0004_comic_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chapter',
+            index=models.Index(fields=['comic', 'active', 'chapter_num'], name='chapter_comic_num_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comic',
+            index=models.Index(condition=models.Q(('active', True)), fields=['-created_at', '-id'], name='comic_latest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['comic', 'reply_to', '-created_date', '-id'], name='comment_thread_page_idx'),
+        ),
+    ]
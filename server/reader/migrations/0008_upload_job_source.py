@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0007_upload_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadjob',
+            name='source',
+            field=models.CharField(blank=True, help_text='Uploaded PDF/ZIP/CBZ, if any', max_length=255),
+        ),
+    ]
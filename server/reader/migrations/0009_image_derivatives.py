@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0008_upload_job_source'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comic',
+            name='image_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.CreateModel(
+            name='ImageDerivative',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('page', 'Page'), ('cover', 'Cover'), ('thumbnail', 'Thumbnail')], default='page', max_length=20)),
+                ('format', models.CharField(max_length=10)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('tile', models.PositiveSmallIntegerField(default=0)),
+                ('file', models.CharField(max_length=255)),
+                ('url', models.CharField(max_length=500)),
+                ('byte_size', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('chapter_image', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='derivatives', to='reader.chapterimage')),
+                ('comic', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='image_derivatives', to='reader.comic')),
+            ],
+            options={
+                'ordering': ['tile', 'format', 'width'],
+            },
+        ),
+    ]
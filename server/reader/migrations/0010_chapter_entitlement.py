@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0009_image_derivatives'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChapterEntitlement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('purchase', 'Purchase'), ('grant', 'Grant')], default='purchase', max_length=20)),
+                ('price', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('chapter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entitlements', to='reader.chapter')),
+                ('comic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='reader.comic')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chapter_entitlements', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'comic'], name='entitlement_user_comic_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'chapter'), name='entitlement_user_chapter_uniq')],
+            },
+        ),
+    ]
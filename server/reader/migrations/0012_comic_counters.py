@@ -0,0 +1,49 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:55
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_counters(apps, schema_editor):
+    Comic = apps.get_model('reader', 'Comic')
+    totals = {
+        'bookmark_count': apps.get_model('reader', 'Bookmark').objects.values('comic_id').annotate(value=Count('id')),
+        'comment_count': apps.get_model('reader', 'Comment').objects.values('comic_id').annotate(value=Count('id')),
+        'chapter_count': apps.get_model('reader', 'Chapter').objects.filter(active=True).values('comic_id').annotate(value=Count('id')),
+        'total_views': apps.get_model('reader', 'ChapterView').objects.values(comic_id=models.F('chapter__comic_id')).annotate(value=Sum('views')),
+    }
+    for field, rows in totals.items():
+        for row in rows:
+            if row['comic_id'] is not None:
+                Comic.objects.filter(pk=row['comic_id']).update(**{field: row['value'] or 0})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0011_coin_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comic',
+            name='bookmark_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comic',
+            name='chapter_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comic',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comic',
+            name='total_views',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:02
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def duplicate_groups(Model):
+    return (
+        Model.objects.values('comic_id', 'creator_id').annotate(rows=Count('id')).filter(rows__gt=1)
+        .values_list('comic_id', 'creator_id')
+    )
+
+
+def dedupe_ratings_and_bookmarks(apps, schema_editor):
+    """
+    Keep one rating (the latest vote) and one bookmark (the first) per
+    user and comic, then recount the affected comics.
+    """
+    Comic = apps.get_model('reader', 'Comic')
+    Rating = apps.get_model('reader', 'Rating')
+    Bookmark = apps.get_model('reader', 'Bookmark')
+
+    comic_ids = set()
+    for Model, keep_order in ((Rating, ('-updated_date', '-id')), (Bookmark, ('created_date', 'id'))):
+        for comic_id, creator_id in list(duplicate_groups(Model)):
+            rows = Model.objects.filter(comic_id=comic_id, creator_id=creator_id).order_by(*keep_order)
+            Model.objects.filter(pk__in=list(rows.values_list('pk', flat=True)[1:])).delete()
+            comic_ids.add(comic_id)
+
+    for comic_id in comic_ids:
+        ratings = Rating.objects.filter(comic_id=comic_id).aggregate(count=Count('id'), total=Sum('rate'))
+        Comic.objects.filter(pk=comic_id).update(
+            rating_count=ratings['count'], rating_sum=ratings['total'] or 0,
+            bookmark_count=Bookmark.objects.filter(comic_id=comic_id).count(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0012_comic_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_ratings_and_bookmarks, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='bookmark',
+            index=models.Index(fields=['creator', '-created_date'], name='bookmark_creator_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chapter',
+            index=models.Index(fields=['comic', 'slug'], name='chapter_comic_slug_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comic',
+            index=models.Index(fields=['-updated_at'], name='comic_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comic',
+            index=models.Index(fields=['-popularity_updated_at'], name='comic_scored_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['comic', '-updated_date'], name='comment_comic_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['comic', '-updated_date'], name='rating_comic_updated_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='bookmark',
+            constraint=models.UniqueConstraint(fields=('comic', 'creator'), name='bookmark_comic_creator_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='rating',
+            constraint=models.UniqueConstraint(fields=('comic', 'creator'), name='rating_comic_creator_uniq'),
+        ),
+    ]
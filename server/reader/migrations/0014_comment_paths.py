@@ -0,0 +1,75 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:09
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# reader.models.COMMENT_MAX_DEPTH: a 255 character path holds 25 ids of 10 digits.
+MAX_DEPTH = 24
+
+
+def backfill_paths(apps, schema_editor):
+    """
+    Number every thread depth-first. Replies nested deeper than MAX_DEPTH
+    are moved up to answer the deepest comment allowed to have replies, as
+    Comment.save() does for new ones, so no path outgrows its column.
+    """
+    Comment = apps.get_model('reader', 'Comment')
+    for comic_id in Comment.objects.values_list('comic_id', flat=True).distinct().order_by():
+        comments = list(Comment.objects.filter(comic_id=comic_id).only('id', 'reply_to_id'))
+        replies = defaultdict(list)
+        for comment in comments:
+            replies[comment.reply_to_id].append(comment)
+            comment.reply_count = 0
+        stack = [(root, None) for root in replies[None]]
+        while stack:
+            comment, parent = stack.pop()
+            segment = f'{comment.id:010d}'
+            if parent is None:
+                comment.thread_id, comment.path, comment.depth = comment.id, segment, 0
+            else:
+                comment.reply_to_id = parent.id
+                comment.thread_id, comment.path, comment.depth = parent.thread_id, parent.path + segment, parent.depth + 1
+                parent.reply_count += 1
+            answered = comment if comment.depth < MAX_DEPTH else parent
+            stack.extend((reply, answered) for reply in replies[comment.id])
+        Comment.objects.bulk_update(comments, ['reply_to', 'thread', 'path', 'depth', 'reply_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0013_lookup_indexes_and_constraints'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='thread',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='reader.comment'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['thread', 'path'], name='comment_thread_path_idx'),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
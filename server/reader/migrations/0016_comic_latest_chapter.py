@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_latest_chapters(apps, schema_editor):
+    Chapter = apps.get_model('reader', 'Chapter')
+    newest = Chapter.objects.filter(comic=OuterRef('pk'), active=True).order_by('-chapter_num')
+    apps.get_model('reader', 'Comic').objects.update(
+        latest_chapter=Subquery(newest.values('pk')[:1]),
+        latest_chapter_at=Subquery(newest.values('created_at')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0015_reading_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comic',
+            name='latest_chapter',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='reader.chapter'),
+        ),
+        migrations.AddField(
+            model_name='comic',
+            name='latest_chapter_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_latest_chapters, migrations.RunPython.noop),
+    ]
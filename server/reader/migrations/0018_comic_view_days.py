@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_view_days(apps, schema_editor):
+    # Views were never timestamped, so existing ones count as seen on the day
+    # their chapter came out: the same age the old decay gave them.
+    rows = (
+        apps.get_model('reader', 'ChapterView').objects
+        .filter(views__gt=0, chapter__comic__isnull=False)
+        .values('chapter__comic_id', day=TruncDate('chapter__created_at'))
+        .annotate(total=Sum('views'))
+        .order_by()
+    )
+    ComicViewDay = apps.get_model('reader', 'ComicViewDay')
+    ComicViewDay.objects.bulk_create(
+        (ComicViewDay(comic_id=row['chapter__comic_id'], day=row['day'], views=row['total']) for row in rows.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0017_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComicViewDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('comic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='reader.comic')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('comic', 'day'), name='comic_view_day_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_view_days, migrations.RunPython.noop),
+    ]
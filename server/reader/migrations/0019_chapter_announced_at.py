@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:20
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_announced_at(apps, schema_editor):
+    # Chapters that already have pages went out when they got them.
+    apps.get_model('reader', 'Chapter').objects.filter(chapter_images__isnull=False).update(announced_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0018_comic_view_days'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapter',
+            name='announced_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_announced_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reader', '0019_chapter_announced_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comic',
+            name='engaged_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -1,8 +1,17 @@
-from django.db import models
+import uuid
+
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Substr
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.functional import cached_property
 from django.utils.text import slugify
 from django.conf import settings
 from cloudinary.models import CloudinaryField
+from PIL import Image as PILImage
+
+from .chapter_index import get_chapter_index
+from .page_cache import LISTING, bump, chapters_scope, comic_scope
 
 
 User = get_user_model()
@@ -15,6 +24,16 @@ class MyModelBase(models.Model):
     class Meta:
         abstract = True
 
+class ComicQuerySet(models.QuerySet):
+    def for_listing(self):
+        return (
+            self.filter(active=True)
+            .defer('description', 'cover_image', 'artist')
+            .annotate(summary=Substr('description', 1, 300))
+            .prefetch_related(models.Prefetch('categories', queryset=Category.objects.only('id', 'name')))
+        )
+
+
 class Comic(MyModelBase):
     title = models.CharField(max_length=255)
     slug = models.SlugField(unique=True, blank=True)
@@ -31,6 +50,36 @@ class Comic(MyModelBase):
     thumbnail = CloudinaryField('image', blank=True, null=True, folder='manhwa/thumbnails/')
     
     categories = models.ManyToManyField('Category', related_name='comics', blank=True)
+
+    # Denormalized counters, kept by reader.counters; reconcile_comic_counters repairs drift.
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    bookmark_count = models.PositiveIntegerField(default=0, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    chapter_count = models.PositiveIntegerField(default=0, editable=False)
+    total_views = models.PositiveBigIntegerField(default=0, editable=False)
+    # Last bookmark, comment or rating count change. Kept out of updated_at,
+    # which keys the chapter index, so only pages showing the counters see it.
+    engaged_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Newest active chapter (by number) and when it was added, kept with chapter_count.
+    latest_chapter = models.ForeignKey(
+        'Chapter', related_name='+', on_delete=models.SET_NULL, null=True, blank=True, editable=False
+    )
+    latest_chapter_at = models.DateTimeField(null=True, blank=True, editable=False)
+    popularity_score = models.FloatField(default=0, editable=False)
+    popularity_updated_at = models.DateTimeField(null=True, blank=True, editable=False)
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
+
+    objects = ComicQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Partial, so SQLite matches them for the bare boolean Django emits for active=True.
+            models.Index(fields=['-popularity_score', '-id'], name='comic_popularity_idx', condition=models.Q(active=True)),
+            models.Index(fields=['-created_at', '-id'], name='comic_latest_idx', condition=models.Q(active=True)),
+            models.Index(fields=['-updated_at'], name='comic_updated_idx'),
+            models.Index(fields=['-popularity_updated_at'], name='comic_scored_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -40,49 +89,134 @@ class Comic(MyModelBase):
     def __str__(self):
         return self.title
 
+    @property
+    def average_rating(self):
+        if not self.rating_count:
+            return None
+        return self.rating_sum / self.rating_count
+
+    @cached_property
+    def thumbnail_url(self):
+        return self.thumbnail.url if self.thumbnail else ''
+
+    @property
+    def thumbnail_rendition(self):
+        tiles = self.image_renditions.get(ImageDerivative.ROLE.THUMBNAIL) or self.image_renditions.get(ImageDerivative.ROLE.COVER)
+        return tiles[0] if tiles else None
+
+    @property
+    def cover_rendition(self):
+        tiles = self.image_renditions.get(ImageDerivative.ROLE.COVER) or self.image_renditions.get(ImageDerivative.ROLE.THUMBNAIL)
+        return tiles[0] if tiles else None
+
+    def refresh_image_renditions(self):
+        derivatives = {}
+        for derivative in self.image_derivatives.all():
+            derivatives.setdefault(derivative.role, []).append(derivative)
+        self.image_renditions = {
+            role: ImageDerivative.renditions(items) for role, items in derivatives.items()
+        }
+        Comic.objects.filter(pk=self.pk).update(image_renditions=self.image_renditions)
+        bump(comic_scope(self.slug), LISTING)
+        return self.image_renditions
+
 class Chapter(MyModelBase):
     class Meta:
         unique_together = ('chapter_num', 'comic')
         ordering = ["-id"]
+        indexes = [
+            models.Index(fields=['comic', 'active', 'chapter_num'], name='chapter_comic_num_idx'),
+            models.Index(fields=['comic', 'slug'], name='chapter_comic_slug_idx'),
+        ]
 
     title = models.TextField(null=True, blank=True, default="None")
     chapter_num = models.PositiveIntegerField(null=False)
     slug = models.SlugField(blank=True, null=True)
     price = models.IntegerField(default=0)
     comic = models.ForeignKey(Comic, related_name="chapters", on_delete=models.CASCADE, null=True)
+    # [{"page", "url", "width", "height", "bytes"}, ...] in page order; None until first built.
+    page_manifest = models.JSONField(null=True, blank=True, editable=False)
+    # Set once the chapter is in its bookmarkers' feeds; a readable chapter
+    # left without it lost its fan-out to a restart.
+    announced_at = models.DateTimeField(null=True, blank=True, editable=False)
 
-    def save(self, *args, **kwargs):
-        if not self.chapter_num:
-            last_chapter = Chapter.objects.filter(comic=self.comic).order_by('chapter_num').last()
-            self.chapter_num = 1 if not last_chapter else last_chapter.chapter_num + 1
+    NUMBERING_ATTEMPTS = 3
 
-        if not self.slug:
+    def save(self, *args, **kwargs):
+        if not self.slug and self.chapter_num:
             self.slug = f"chapter-{self.chapter_num}"
 
-        super().save(*args, **kwargs)
+        if self.chapter_num:
+            super().save(*args, **kwargs)
+            return
+
+        auto_slug = not self.slug
+        for attempt in range(self.NUMBERING_ATTEMPTS):
+            try:
+                with transaction.atomic():
+                    self.chapter_num = self.next_chapter_num(self.comic_id)
+                    if auto_slug:
+                        self.slug = f"chapter-{self.chapter_num}"
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError:
+                # Another upload took the number between our read and insert.
+                self.chapter_num = None
+                if auto_slug:
+                    self.slug = None
+                if attempt + 1 == self.NUMBERING_ATTEMPTS:
+                    raise
+
+    @staticmethod
+    def next_chapter_num(comic_id):
+        """Next free number for ``comic_id``; call inside a transaction."""
+        if comic_id is not None:
+            # Serializes numbering per comic on databases with row locks.
+            list(Comic.objects.select_for_update().filter(pk=comic_id).values_list('pk'))
+        last = Chapter.objects.filter(comic_id=comic_id).aggregate(last=models.Max('chapter_num'))['last']
+        return (last or 0) + 1
 
     def __str__(self):
         return f"Ch.{self.chapter_num} of {self.comic.title}"
 
+    @cached_property
+    def chapter_index(self):
+        return get_chapter_index(self.comic)
+
     def get_previous_chapter(self):
-        return Chapter.objects.filter(
-            comic=self.comic,
-            chapter_num__lt=self.chapter_num,
-            active=True
-        ).order_by('-chapter_num').first()
+        return self.chapter_index.previous(self.id)
 
     def get_next_chapter(self):
-        return Chapter.objects.filter(
-            comic=self.comic,
-            chapter_num__gt=self.chapter_num,
-            active=True
-        ).order_by('chapter_num').first()
+        return self.chapter_index.next(self.id)
+
+    def build_page_manifest(self):
+        images = self.chapter_images.order_by('page_number').prefetch_related('derivatives')
+        return [image.manifest_entry() for image in images]
+
+    def refresh_page_manifest(self, invalidate=True):
+        self.page_manifest = self.build_page_manifest()
+        if not invalidate:
+            Chapter.objects.filter(pk=self.pk).update(page_manifest=self.page_manifest)
+            return self.page_manifest
+        self.updated_at = timezone.now()
+        Chapter.objects.filter(pk=self.pk).update(page_manifest=self.page_manifest, updated_at=self.updated_at)
+        bump(chapters_scope(self.comic.slug))
+        return self.page_manifest
+
+    def get_page_manifest(self):
+        if self.page_manifest is None:
+            # Filling in a missing manifest changes nothing already served.
+            return self.refresh_page_manifest(invalidate=False)
+        return self.page_manifest
 
 
 class ChapterImage(models.Model):
     image = CloudinaryField('image', folder='manhwa/chapters/')
     page_number = models.PositiveIntegerField(default=1)
     chapter = models.ForeignKey(Chapter, related_name="chapter_images", on_delete=models.CASCADE, null=True)
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    byte_size = models.PositiveIntegerField(null=True, blank=True, editable=False)
     
     class Meta:
         ordering = ['page_number']
@@ -91,6 +225,127 @@ class ChapterImage(models.Model):
     def __str__(self):
         return f"Page {self.page_number} of {self.chapter}"
 
+    def save(self, *args, **kwargs):
+        if hasattr(self.image, 'read'):
+            self.read_dimensions(self.image)
+        super().save(*args, **kwargs)
+
+    def read_dimensions(self, file):
+        """Record size and pixel dimensions of an image file before it is uploaded."""
+        self.byte_size = getattr(file, 'size', None)
+        try:
+            file.seek(0)
+            with PILImage.open(file) as img:
+                self.width, self.height = img.size
+        except (OSError, ValueError):
+            self.width = self.height = None
+        finally:
+            file.seek(0)
+
+    def manifest_entry(self):
+        return {
+            'page': self.page_number,
+            'url': self.image.url if self.image else '',
+            'width': self.width,
+            'height': self.height,
+            'bytes': self.byte_size,
+            'tiles': ImageDerivative.renditions(self.derivatives.all()),
+        }
+
+
+class ImageDerivative(models.Model):
+    """
+    A resized/re-encoded rendition of a page, cover or thumbnail. Very tall
+    pages are cut into horizontal tiles; ``tile`` is the tile's position.
+    """
+    class ROLE(models.TextChoices):
+        PAGE = 'page', 'Page'
+        COVER = 'cover', 'Cover'
+        THUMBNAIL = 'thumbnail', 'Thumbnail'
+
+    MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+    chapter_image = models.ForeignKey(ChapterImage, related_name='derivatives', on_delete=models.CASCADE, null=True, blank=True)
+    comic = models.ForeignKey(Comic, related_name='image_derivatives', on_delete=models.CASCADE, null=True, blank=True)
+    role = models.CharField(max_length=20, choices=ROLE.choices, default=ROLE.PAGE)
+    format = models.CharField(max_length=10)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    tile = models.PositiveSmallIntegerField(default=0)
+    file = models.CharField(max_length=255)
+    url = models.CharField(max_length=500)
+    byte_size = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['tile', 'format', 'width']
+
+    def __str__(self):
+        return f"{self.format} {self.width}w tile {self.tile} of {self.chapter_image or self.comic}"
+
+    @classmethod
+    def renditions(cls, derivatives):
+        """
+        Group derivatives into ``<picture>`` data: one entry per tile with a
+        srcset per format (best format first) and the widest WebP/JPEG as
+        the fallback ``src``.
+        """
+        formats = list(cls.MIME_TYPES)
+        tiles = {}
+        for derivative in derivatives:
+            tiles.setdefault(derivative.tile, []).append(derivative)
+        renditions = []
+        for tile in sorted(tiles):
+            items = sorted(tiles[tile], key=lambda d: (formats.index(d.format) if d.format in formats else len(formats), d.width))
+            sources = {}
+            for derivative in items:
+                sources.setdefault(derivative.format, []).append(f'{derivative.url} {derivative.width}w')
+            fallback = max(
+                (d for d in items if d.format != 'avif'), key=lambda d: d.width, default=items[-1]
+            )
+            renditions.append({
+                'src': fallback.url,
+                'width': fallback.width,
+                'height': fallback.height,
+                'sources': [
+                    {'type': cls.MIME_TYPES.get(fmt, f'image/{fmt}'), 'srcset': ', '.join(srcset)}
+                    for fmt, srcset in sources.items()
+                ],
+            })
+        return renditions
+
+
+class UploadJob(models.Model):
+    class STATUS(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        COMPLETED = 'completed', 'Completed'
+        FAILED = 'failed', 'Failed'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    chapter = models.ForeignKey(Chapter, related_name='upload_jobs', on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
+    status = models.CharField(max_length=20, choices=STATUS.choices, default=STATUS.PENDING)
+    source = models.CharField(max_length=255, blank=True, help_text="Uploaded PDF/ZIP/CBZ, if any")
+    total_pages = models.PositiveIntegerField(default=0)
+    processed_pages = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Upload {self.pk} ({self.status})"
+
+    def as_dict(self):
+        return {
+            'id': str(self.pk),
+            'status': self.status,
+            'source': self.source,
+            'total_pages': self.total_pages,
+            'processed_pages': self.processed_pages,
+            'error': self.error,
+        }
+
 
 class ChapterView(models.Model):
     created_date = models.DateTimeField(auto_now_add=True)
@@ -98,6 +353,19 @@ class ChapterView(models.Model):
     views = models.IntegerField(default=0)
     chapter = models.OneToOneField(Chapter, on_delete=models.CASCADE, null=True)
 
+
+class ComicViewDay(models.Model):
+    """Views a comic's chapters got on one day, which popularity decays by how long ago that was."""
+    comic = models.ForeignKey(Comic, related_name='+', on_delete=models.CASCADE)
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['comic', 'day'], name='comic_view_day_uniq'),
+        ]
+
+
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True, null=True)
@@ -105,17 +373,54 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+# Comment paths are the zero-padded ids of a comment's ancestors and its
+# own, so ordering by path lists a thread depth-first, oldest reply first.
+COMMENT_PATH_STEP = 10
+COMMENT_PATH_LENGTH = 255
+COMMENT_MAX_DEPTH = COMMENT_PATH_LENGTH // COMMENT_PATH_STEP - 1
+
+
 class Comment(models.Model):
     content = models.TextField()
     comic = models.ForeignKey(Comic, on_delete=models.CASCADE)
     creator = models.ForeignKey(User, on_delete=models.CASCADE)
     reply_to = models.ForeignKey("self", null=True, blank=True, related_name='replies', on_delete=models.CASCADE)
+    thread = models.ForeignKey("self", null=True, blank=True, related_name='+', on_delete=models.CASCADE, editable=False)
+    path = models.CharField(max_length=COMMENT_PATH_LENGTH, blank=True, default='', editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    reply_count = models.PositiveIntegerField(default=0, editable=False)
     created_date = models.DateTimeField(auto_now_add=True)
     updated_date = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['comic', 'reply_to', '-created_date', '-id'], name='comment_thread_page_idx'),
+            models.Index(fields=['comic', '-updated_date'], name='comment_comic_updated_idx'),
+            models.Index(fields=['thread', 'path'], name='comment_thread_path_idx'),
+        ]
+
     def __str__(self):
         return self.content
 
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.reply_to and self.reply_to.depth >= COMMENT_MAX_DEPTH:
+            # No room left in the path: answer alongside the comment instead.
+            self.reply_to = self.reply_to.reply_to
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if not self.path:
+                self.place()
+
+    def place(self):
+        """Set the thread, path and depth of a saved comment from its parent's."""
+        segment = f'{self.pk:0{COMMENT_PATH_STEP}d}'
+        parent = self.reply_to
+        if parent is None:
+            self.thread_id, self.path, self.depth = self.pk, segment, 0
+        else:
+            self.thread_id, self.path, self.depth = parent.thread_id, parent.path + segment, parent.depth + 1
+        Comment.objects.filter(pk=self.pk).update(thread_id=self.thread_id, path=self.path, depth=self.depth)
+
 
 class Rating(models.Model):
     rate = models.PositiveSmallIntegerField(default=0)
@@ -124,6 +429,14 @@ class Rating(models.Model):
     comic = models.ForeignKey(Comic, on_delete=models.CASCADE)
     creator = models.ForeignKey(User, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['comic', 'creator'], name='rating_comic_creator_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['comic', '-updated_date'], name='rating_comic_updated_idx'),
+        ]
+
 
 class Bookmark(models.Model):
     created_date = models.DateTimeField(auto_now_add=True)
@@ -131,6 +444,150 @@ class Bookmark(models.Model):
     comic = models.ForeignKey(Comic, on_delete=models.CASCADE)
     creator = models.ForeignKey(User, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['comic', 'creator'], name='bookmark_comic_creator_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['creator', '-created_date'], name='bookmark_creator_idx'),
+        ]
+
+
+class ReadingProgress(models.Model):
+    """Where a user last was in a comic; written in batches by reader.reading_progress."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='reading_progress', on_delete=models.CASCADE)
+    comic = models.ForeignKey(Comic, related_name='+', on_delete=models.CASCADE)
+    chapter = models.ForeignKey(Chapter, related_name='+', on_delete=models.CASCADE)
+    page = models.PositiveIntegerField(default=1)
+    # When the reader got there, not when the row was flushed.
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'comic'], name='reading_progress_user_comic_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-updated_at'], name='reading_progress_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.chapter} p.{self.page}"
+
+
+class FeedItem(models.Model):
+    """A new chapter of a bookmarked comic, written to each bookmarker's feed by reader.feed."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='feed_items', on_delete=models.CASCADE)
+    comic = models.ForeignKey(Comic, related_name='+', on_delete=models.CASCADE)
+    chapter = models.ForeignKey(Chapter, related_name='+', on_delete=models.CASCADE)
+    # The chapter's created_at, so the feed is ordered by release, not by fan-out progress.
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'chapter'], name='feed_item_user_chapter_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='feed_item_user_idx'),
+        ]
+
+
+class FeedCounter(models.Model):
+    """Feed items a user has not seen yet."""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, related_name='feed_counter', on_delete=models.CASCADE)
+    unread = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user} - {self.unread} unread"
+
+
+class ChapterEntitlement(models.Model):
+    """A user's right to read a paid chapter."""
+    class SOURCE(models.TextChoices):
+        PURCHASE = 'purchase', 'Purchase'
+        GRANT = 'grant', 'Grant'
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='chapter_entitlements', on_delete=models.CASCADE)
+    chapter = models.ForeignKey(Chapter, related_name='entitlements', on_delete=models.CASCADE)
+    # Copied from the chapter so a user's unlocked chapters of one comic
+    # come from a single index range scan.
+    comic = models.ForeignKey(Comic, related_name='+', on_delete=models.CASCADE)
+    source = models.CharField(max_length=20, choices=SOURCE.choices, default=SOURCE.PURCHASE)
+    price = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'chapter'], name='entitlement_user_chapter_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'comic'], name='entitlement_user_comic_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.chapter}"
+
+    def save(self, *args, **kwargs):
+        if not self.comic_id:
+            self.comic_id = self.chapter.comic_id
+        super().save(*args, **kwargs)
+
+
+class CoinWallet(models.Model):
+    """Current coin balance of a user; every change is a CoinTransaction."""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, related_name='coin_wallet', on_delete=models.CASCADE)
+    balance = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(condition=models.Q(balance__gte=0), name='coin_wallet_balance_non_negative'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.balance} coins"
+
+
+class CoinTransaction(models.Model):
+    """Append-only ledger entry: ``amount`` is positive for credits, negative for debits."""
+    class KIND(models.TextChoices):
+        COIN_PURCHASE = 'coin_purchase', 'Coin purchase'
+        CHAPTER_PURCHASE = 'chapter_purchase', 'Chapter purchase'
+        GRANT = 'grant', 'Grant'
+        REFUND = 'refund', 'Refund'
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='coin_transactions', on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=KIND.choices)
+    amount = models.IntegerField()
+    balance_after = models.IntegerField()
+    chapter = models.ForeignKey(Chapter, on_delete=models.SET_NULL, null=True, blank=True)
+    product = models.ForeignKey('Product', on_delete=models.SET_NULL, null=True, blank=True)
+    idempotency_key = models.CharField(max_length=100, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'idempotency_key'], name='coin_transaction_idempotency_uniq',
+                condition=models.Q(idempotency_key__isnull=False),
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='coin_transaction_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.amount:+d} ({self.kind})"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Coin transactions are append-only')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError('Coin transactions are append-only')
+
 
 class Product(models.Model):
     class TYPES(models.TextChoices):
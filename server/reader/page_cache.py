@@ -0,0 +1,152 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response
+from django.utils.connection import ConnectionProxy
+from django.utils.http import parse_http_date_safe
+
+PAGE_CACHE_TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 5)
+LISTING = 'listing'
+# Response headers worth replaying from a cached page.
+CACHED_HEADERS = ('Link', 'ETag', 'Last-Modified', 'Cache-Control')
+# Query parameters a cached page may vary on, unless the view lists its own.
+CACHED_PARAMS = ('page', 'cursor', 'sort', 'q')
+
+# Pages have a cache of their own, so a flood of them cannot evict the
+# version counters (and everything else) in the default one.
+page_cache = ConnectionProxy(caches, 'pages')
+
+
+def comic_scope(slug):
+    """Comic detail page: the comic, its chapters, comments and ratings."""
+    return f'comic:{slug}'
+
+
+def chapters_scope(slug):
+    """Reader pages of a comic: its chapters and their pages."""
+    return f'chapters:{slug}'
+
+
+def version_key(scope):
+    return f'pagecache:version:{scope}'
+
+
+def get_versions(scopes):
+    """
+    Current version of each scope. A missing counter (new, or evicted)
+    starts at the current time in milliseconds, so it can never come back
+    at a value an older cached page was stored under.
+    """
+    keys = [version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, int(time.time() * 1000), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump(*scopes):
+    """Invalidate every cached page depending on ``scopes``, now and again on commit."""
+    def run():
+        for scope in scopes:
+            key = version_key(scope)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, int(time.time() * 1000), None)
+
+    run()
+    transaction.on_commit(run)
+
+
+def is_cacheable(request):
+    return (
+        getattr(settings, 'PAGE_CACHE_ENABLED', True)
+        and request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and 'messages' not in request.COOKIES
+    )
+
+
+def page_key(request, scopes, params=CACHED_PARAMS):
+    """
+    Cache key of the page at the request's path and ``params``, or None if
+    the query string has any other parameter, or one twice: an arbitrary
+    query string must not be able to add entries.
+    """
+    query = request.GET
+    if any(name not in params or len(query.getlist(name)) > 1 for name in query):
+        return None
+    versions = ':'.join(str(version) for version in get_versions(scopes))
+    path = hashlib.md5(f'{request.path}?{urlencode(sorted(query.items()))}'.encode()).hexdigest()
+    return f'pagecache:page:{path}:{versions}'
+
+
+class AnonymousPageCacheMixin:
+    """
+    Serves anonymous GETs from a full-page cache. The key includes the
+    version counters of ``page_cache_scopes()``, which signals bump when
+    the underlying rows change, so entries are never served stale and are
+    simply left to expire. Signed-in users always get a fresh render with
+    their own bookmark, rating and coin state. Requests with query
+    parameters outside ``page_cache_params`` are rendered, not cached.
+    """
+    page_cache_timeout = PAGE_CACHE_TIMEOUT
+    page_cache_params = CACHED_PARAMS
+
+    def page_cache_scopes(self):
+        return [LISTING]
+
+    def page_cache_hit(self, meta):
+        """Per-request side effects a cached response would otherwise skip."""
+
+    def page_cache_meta(self):
+        return {}
+
+    def dispatch(self, request, *args, **kwargs):
+        if not is_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        key = page_key(request, self.page_cache_scopes(), self.page_cache_params)
+        if key is None:
+            return super().dispatch(request, *args, **kwargs)
+        entry = page_cache.get(key)
+        if entry is not None:
+            # Cached pages carry someone else's CSRF token; scripts read the
+            # cookie instead, so make sure this visitor has one.
+            get_token(request)
+            self.page_cache_hit(entry['meta'])
+            response = HttpResponse(entry['content'], content_type=entry['content_type'])
+            for header, value in entry['headers'].items():
+                response[header] = value
+            response['X-Page-Cache'] = 'hit'
+            return get_conditional_response(
+                request, etag=response.get('ETag'),
+                last_modified=parse_http_date_safe(response.get('Last-Modified')), response=response,
+            )
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code != 200 or response.streaming:
+            return response
+
+        def store(response):
+            page_cache.set(key, {
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'headers': {header: response[header] for header in CACHED_HEADERS if response.has_header(header)},
+                'meta': self.page_cache_meta(),
+            }, self.page_cache_timeout)
+            response['X-Page-Cache'] = 'miss'
+
+        if getattr(response, 'is_rendered', True):
+            store(response)
+        else:
+            response.add_post_render_callback(store)
+        return response
@@ -0,0 +1,152 @@
+import json
+
+from django.core import signing
+from django.db import connection
+from django.db.models import Q
+from django.http import Http404
+
+CURSOR_SALT = 'reader.pagination.cursor'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def approximate_count(queryset, cap=1000):
+    """
+    Cheap row count for "about N results" labels. On PostgreSQL this is the
+    planner's estimate; elsewhere rows are counted up to ``cap``. Returns
+    ``(count, is_exact)``.
+    """
+    if connection.vendor == 'postgresql':
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows']), False
+    count = queryset.order_by()[:cap + 1].count()
+    return min(count, cap), count <= cap
+
+
+class CursorPage:
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None, count=None, count_is_exact=True):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.count = count
+        self.count_is_exact = count_is_exact
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Keyset pagination over ``ordering``, which must end in a unique field
+    (normally ``id``) so positions are unambiguous. Pages are addressed by
+    opaque, signed cursors instead of OFFSET, and no COUNT(*) is run unless
+    ``count`` is ``'exact'`` or ``'approximate'``.
+    """
+
+    def __init__(self, queryset, per_page, ordering, count=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.count = count
+        self.model = queryset.model
+
+    def fields(self):
+        return [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    def encode_cursor(self, obj, direction):
+        values = [self.model._meta.get_field(name).value_to_string(obj) for name, _ in self.fields()]
+        return signing.dumps([direction, values], salt=CURSOR_SALT, compress=True)
+
+    def decode_cursor(self, cursor):
+        try:
+            direction, values = signing.loads(cursor, salt=CURSOR_SALT)
+            fields = self.fields()
+            if direction not in ('next', 'previous') or len(values) != len(fields):
+                raise InvalidCursor(cursor)
+            return direction, [
+                self.model._meta.get_field(name).to_python(value) for (name, _), value in zip(fields, values)
+            ]
+        except (signing.BadSignature, TypeError, ValueError) as e:
+            raise InvalidCursor(cursor) from e
+
+    def after(self, values, reverse=False):
+        """Q matching rows strictly after ``values`` in (optionally reversed) ordering."""
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.fields(), values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def page(self, cursor=None):
+        queryset = self.queryset
+        direction = 'next'
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+            queryset = queryset.filter(self.after(values, reverse=direction == 'previous'))
+
+        ordering = self.ordering
+        if direction == 'previous':
+            ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in ordering]
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == 'previous':
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or direction == 'previous':
+                next_cursor = self.encode_cursor(rows[-1], 'next')
+            if cursor and (has_more or direction == 'next'):
+                previous_cursor = self.encode_cursor(rows[0], 'previous')
+
+        count, count_is_exact = None, True
+        if self.count == 'exact':
+            count = self.queryset.count()
+        elif self.count == 'approximate':
+            count, count_is_exact = approximate_count(self.queryset)
+        return CursorPage(rows, self, next_cursor, previous_cursor, count, count_is_exact)
+
+
+class CursorPaginationMixin:
+    """
+    ListView mixin that swaps OFFSET pagination for keyset pagination on
+    ``cursor_ordering``. The page is read from ``?cursor=``.
+    """
+    cursor_ordering = ('-created_at', '-id')
+    cursor_kwarg = 'cursor'
+    cursor_count = None
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size, self.cursor_ordering, count=self.cursor_count)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404('Invalid cursor')
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+
+def paginate_by_cursor(request, queryset, per_page, ordering, cursor_kwarg='cursor', count=None):
+    """Paginate an arbitrary queryset from a request, e.g. a secondary list on a detail page."""
+    paginator = CursorPaginator(queryset, per_page, ordering, count=count)
+    try:
+        return paginator.page(request.GET.get(cursor_kwarg))
+    except InvalidCursor:
+        raise Http404('Invalid cursor')
@@ -0,0 +1,108 @@
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max, Q, Sum
+from django.utils import timezone
+
+from .models import Bookmark, ChapterView, Comic, ComicViewDay, Rating
+from .page_cache import LISTING, bump
+
+# Number of "average" votes every comic starts with, so a single 5-star
+# rating does not outrank hundreds of 4-star ones.
+RATING_PRIOR = getattr(settings, 'POPULARITY_RATING_PRIOR', 10)
+VIEW_HALF_LIFE_DAYS = getattr(settings, 'POPULARITY_VIEW_HALF_LIFE_DAYS', 14)
+# Older daily view counts weigh under 1/256 of today's and are deleted.
+VIEW_HISTORY_DAYS = getattr(settings, 'POPULARITY_VIEW_HISTORY_DAYS', VIEW_HALF_LIFE_DAYS * 8)
+RATING_WEIGHT = getattr(settings, 'POPULARITY_RATING_WEIGHT', 2.0)
+VIEW_WEIGHT = getattr(settings, 'POPULARITY_VIEW_WEIGHT', 1.0)
+BOOKMARK_WEIGHT = getattr(settings, 'POPULARITY_BOOKMARK_WEIGHT', 1.5)
+
+
+def global_mean_rating():
+    totals = Comic.objects.aggregate(count=Sum('rating_count'), total=Sum('rating_sum'))
+    if not totals['count']:
+        return 0
+    return totals['total'] / totals['count']
+
+
+def bayesian_rating(rating_sum, rating_count, mean):
+    return (RATING_PRIOR * mean + rating_sum) / (RATING_PRIOR + rating_count)
+
+
+def decayed_views(comic_ids, now):
+    """
+    Views per comic, each day's count halved for every VIEW_HALF_LIFE_DAYS
+    since that day, so an old chapter that takes off trends like a new one.
+    """
+    totals = defaultdict(float)
+    today = timezone.localdate(now)
+    rows = ComicViewDay.objects.filter(
+        comic_id__in=comic_ids, day__gt=today - timedelta(days=VIEW_HISTORY_DAYS), views__gt=0,
+    ).values_list('comic_id', 'day', 'views')
+    for comic_id, day, views in rows:
+        age_days = max((today - day).days, 0)
+        totals[comic_id] += views * 0.5 ** (age_days / VIEW_HALF_LIFE_DAYS)
+    return totals
+
+
+def popularity_score(rating, views, bookmarks):
+    return RATING_WEIGHT * rating + VIEW_WEIGHT * math.log1p(views) + BOOKMARK_WEIGHT * math.log1p(bookmarks)
+
+
+def refresh_scores(comic_ids, now=None, mean=None):
+    now = now or timezone.now()
+    if mean is None:
+        mean = global_mean_rating()
+    comics = list(Comic.objects.filter(id__in=comic_ids).only('id', 'rating_count', 'rating_sum', 'bookmark_count'))
+    comic_ids = [comic.id for comic in comics]
+    views = decayed_views(comic_ids, now)
+    for comic in comics:
+        comic.popularity_score = popularity_score(
+            bayesian_rating(comic.rating_sum, comic.rating_count, mean),
+            views.get(comic.id, 0),
+            comic.bookmark_count,
+        )
+        comic.popularity_updated_at = now
+    Comic.objects.bulk_update(comics, ['popularity_score', 'popularity_updated_at'])
+    return len(comics)
+
+
+def stale_comic_ids(since):
+    """
+    Comics that gained ratings, bookmarks or views since ``since``, or have
+    no current score (never scored, or a rating or bookmark was deleted).
+    """
+    if since is None:
+        return Comic.objects.values_list('id', flat=True)
+    return (
+        Comic.objects.filter(
+            Q(popularity_updated_at__isnull=True)
+            | Q(id__in=Rating.objects.filter(updated_date__gte=since).values('comic_id'))
+            | Q(id__in=Bookmark.objects.filter(created_date__gte=since).values('comic_id'))
+            | Q(id__in=ChapterView.objects.filter(updated_date__gte=since).values('chapter__comic_id'))
+        )
+        .values_list('id', flat=True)
+    )
+
+
+def refresh_popularity(full=False, batch_size=1000):
+    """
+    Recompute popularity scores. By default only comics with activity since
+    the previous run are refreshed; ``full`` rescores everything, which is
+    also what lets view decay catch up on idle comics, and prunes daily view
+    counts older than VIEW_HISTORY_DAYS.
+    """
+    now = timezone.now()
+    if full:
+        ComicViewDay.objects.filter(day__lte=timezone.localdate(now) - timedelta(days=VIEW_HISTORY_DAYS)).delete()
+    since = None if full else Comic.objects.aggregate(last=Max('popularity_updated_at'))['last']
+    mean = global_mean_rating()
+    comic_ids = list(stale_comic_ids(since).order_by('id'))
+    refreshed = 0
+    for start in range(0, len(comic_ids), batch_size):
+        refreshed += refresh_scores(comic_ids[start:start + batch_size], now=now, mean=mean)
+    if refreshed:
+        bump(LISTING)
+    return refreshed
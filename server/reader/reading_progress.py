@@ -0,0 +1,166 @@
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from .chapter_views import buffer_cache
+from .models import Chapter, ReadingProgress
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'reading_progress:pending'
+CONTINUE_READING_SIZE = getattr(settings, 'CONTINUE_READING_SIZE', 12)
+
+
+def pending_key(user_id):
+    return f'{KEY_PREFIX}:{user_id}'
+
+
+class ReadingProgressBuffer:
+    """
+    Coalesces reading progress beacons in the 'buffers' cache and upserts
+    them into ReadingProgress in batches.
+
+    Each user has one cache entry mapping chapter ids to the last
+    ``(page, timestamp)`` reported, so a reader scrolling through a chapter
+    overwrites one value instead of writing a row per page; the flush keeps
+    the newest chapter of each comic and writes it with one bulk upsert.
+    Like ChapterViewBuffer, each process flushes the users it recorded once
+    READING_PROGRESS_FLUSH_THRESHOLD beacons came in or
+    READING_PROGRESS_FLUSH_INTERVAL seconds passed.
+    """
+
+    def __init__(self, flush_interval=None, flush_threshold=None):
+        self.flush_interval = flush_interval if flush_interval is not None else getattr(
+            settings, 'READING_PROGRESS_FLUSH_INTERVAL', 30
+        )
+        self.flush_threshold = flush_threshold if flush_threshold is not None else getattr(
+            settings, 'READING_PROGRESS_FLUSH_THRESHOLD', 500
+        )
+        self._lock = threading.Lock()
+        self._dirty = set()
+        self._recorded = 0
+        self._last_flush = time.monotonic()
+
+    def record(self, user_id, chapter_id, page, at=None):
+        # Read-modify-write: two tabs of the same user racing can drop a
+        # beacon, which the next one from either tab makes up for.
+        key = pending_key(user_id)
+        pending = buffer_cache.get(key) or {}
+        pending[chapter_id] = (page, at if at is not None else time.time())
+        buffer_cache.set(key, pending, timeout=None)
+
+        with self._lock:
+            self._dirty.add(user_id)
+            self._recorded += 1
+            due = (
+                self._recorded >= self.flush_threshold
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def pending(self, user_id):
+        return buffer_cache.get(pending_key(user_id)) or {}
+
+    def flush(self, user_ids=None):
+        """
+        Upsert pending progress of ``user_ids`` (default: the users this
+        process recorded). Returns the number of rows written.
+        """
+        with self._lock:
+            if user_ids is None:
+                user_ids, self._dirty = self._dirty, set()
+                self._recorded = 0
+                self._last_flush = time.monotonic()
+            else:
+                user_ids = set(user_ids)
+                self._dirty -= user_ids
+
+        keys = {pending_key(user_id): user_id for user_id in user_ids}
+        claimed = {keys[key]: pending for key, pending in buffer_cache.get_many(list(keys)).items() if pending}
+        if not claimed:
+            return 0
+
+        try:
+            written = self._write(claimed)
+        except Exception:
+            logger.exception('Flushing reading progress of %d users failed', len(claimed))
+            with self._lock:
+                self._dirty.update(claimed)
+            return 0
+
+        # Keep entries a newer beacon replaced meanwhile; they are flushed next time.
+        current = buffer_cache.get_many([pending_key(user_id) for user_id in claimed])
+        buffer_cache.delete_many([key for key, pending in current.items() if pending == claimed[keys[key]]])
+        return written
+
+    def _write(self, claimed):
+        chapter_ids = {chapter_id for pending in claimed.values() for chapter_id in pending}
+        comic_ids = dict(Chapter.objects.filter(id__in=chapter_ids).values_list('id', 'comic_id'))
+        user_ids = set(get_user_model().objects.filter(id__in=claimed).values_list('id', flat=True))
+        latest = {}
+        for user_id, pending in claimed.items():
+            if user_id not in user_ids:
+                continue
+            for chapter_id, (page, at) in pending.items():
+                if chapter_id not in comic_ids:
+                    continue
+                key = (user_id, comic_ids[chapter_id])
+                if key not in latest or at > latest[key][2]:
+                    latest[key] = (chapter_id, page, at)
+
+        ReadingProgress.objects.bulk_create(
+            [
+                ReadingProgress(
+                    user_id=user_id, comic_id=comic_id, chapter_id=chapter_id, page=page,
+                    updated_at=datetime.fromtimestamp(at, tz=timezone.utc),
+                )
+                for (user_id, comic_id), (chapter_id, page, at) in latest.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['user', 'comic'],
+            update_fields=['chapter', 'page', 'updated_at'],
+            batch_size=500,
+        )
+        return len(latest)
+
+    def flush_all(self, batch_size=1000):
+        """Flush pending progress of every user, not just this process's."""
+        total = 0
+        user_ids = get_user_model().objects.order_by('id').values_list('id', flat=True)
+        batch = []
+        for user_id in user_ids.iterator(chunk_size=batch_size):
+            batch.append(user_id)
+            if len(batch) >= batch_size:
+                total += self.flush(batch)
+                batch = []
+        if batch:
+            total += self.flush(batch)
+        return total
+
+
+reading_progress = ReadingProgressBuffer()
+atexit.register(reading_progress.flush)
+
+
+def continue_reading(user, limit=CONTINUE_READING_SIZE):
+    """
+    The comics ``user`` read most recently, newest first, with the chapter
+    and page they stopped at: one range scan of reading_progress_user_idx
+    after writing out what this user still has pending.
+    """
+    reading_progress.flush([user.pk])
+    return (
+        ReadingProgress.objects.filter(user=user, comic__active=True, chapter__active=True)
+        .select_related('comic', 'chapter')
+        .only(
+            'page', 'updated_at', 'comic__title', 'comic__slug', 'comic__thumbnail',
+            'chapter__slug', 'chapter__chapter_num', 'chapter__title',
+        )
+        .order_by('-updated_at')[:limit]
+    )
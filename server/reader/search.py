@@ -0,0 +1,173 @@
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Comic
+
+FTS_TABLE = 'reader_comic_fts'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    return TOKEN_RE.findall(query.lower())
+
+
+class BaseSearchBackend:
+    """
+    Shared behaviour for the search backends. Subclasses implement
+    ``match`` (a ranked Comic queryset for a query) and, where the index is
+    not maintained by the database itself, ``index``/``remove``/``rebuild``.
+    """
+
+    def search(self, query, category=None, status=None):
+        queryset = self.match(query) if tokenize(query) else Comic.objects.none()
+        queryset = queryset.filter(active=True)
+        if category:
+            queryset = queryset.filter(categories=category)
+        if status:
+            queryset = queryset.filter(status=status)
+        return queryset
+
+    def autocomplete(self, prefix, limit=10):
+        prefix = prefix.strip()
+        if not prefix:
+            return []
+        return list(
+            self.complete(prefix)
+            .filter(active=True)
+            .values('title', 'slug')[:limit]
+        )
+
+    def complete(self, prefix):
+        return Comic.objects.filter(title__istartswith=prefix).order_by('title')
+
+    def match(self, query):
+        raise NotImplementedError
+
+    def index(self, comic):
+        pass
+
+    def remove(self, comic_id):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class BasicSearchBackend(BaseSearchBackend):
+    """Unindexed fallback for databases without a full-text engine."""
+
+    def match(self, query):
+        condition = Q()
+        for token in tokenize(query):
+            condition &= Q(title__icontains=token) | Q(author__icontains=token) | Q(description__icontains=token)
+        return Comic.objects.filter(condition).order_by('title')
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Uses the generated ``search_vector`` column (GIN indexed) for ranked
+    full-text matches and pg_trgm similarity on the title for typos.
+    """
+
+    def match(self, query):
+        return (
+            Comic.objects.filter(
+                RawSQL(
+                    "reader_comic.search_vector @@ websearch_to_tsquery('simple', %s) OR reader_comic.title %% %s",
+                    [query, query],
+                    output_field=BooleanField(),
+                )
+            )
+            .annotate(
+                search_rank=RawSQL(
+                    "ts_rank(reader_comic.search_vector, websearch_to_tsquery('simple', %s))"
+                    " + similarity(reader_comic.title, %s)",
+                    [query, query],
+                    output_field=FloatField(),
+                )
+            )
+            .order_by('-search_rank', '-id')
+        )
+
+    def complete(self, prefix):
+        pattern = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        return (
+            Comic.objects.filter(RawSQL('reader_comic.title ILIKE %s', [pattern], output_field=BooleanField()))
+            .annotate(
+                search_rank=RawSQL('similarity(reader_comic.title, %s)', [prefix], output_field=FloatField())
+            )
+            .order_by('-search_rank', 'title')
+        )
+
+
+class SqliteSearchBackend(BaseSearchBackend):
+    """
+    Keeps an FTS5 shadow table in step with Comic through signals and joins
+    it in to rank matches with bm25, weighting title over author over
+    description. Every term is matched as a prefix; there is no typo
+    tolerance.
+    """
+
+    def fts_query(self, query, column=None):
+        terms = ' '.join(f'"{token}"*' for token in tokenize(query))
+        return f'{column}: ({terms})' if column else terms
+
+    def matching(self, fts_query):
+        return Comic.objects.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = reader_comic.id', f'{FTS_TABLE} MATCH %s'],
+            params=[fts_query],
+            select={'search_rank': f'{FTS_TABLE}.rank'},
+        )
+
+    def match(self, query):
+        # rank is bm25 with the column weights set up in the migration;
+        # lower is better.
+        return self.matching(self.fts_query(query)).order_by('search_rank', '-id')
+
+    def complete(self, prefix):
+        return self.matching(self.fts_query(prefix, column='title')).filter(
+            title__istartswith=prefix
+        ).order_by('search_rank', 'title')
+
+    def index(self, comic):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [comic.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, author, description) VALUES (%s, %s, %s, %s)',
+                [comic.pk, comic.title, comic.author or '', comic.description or ''],
+            )
+
+    def remove(self, comic_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [comic_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, author, description) '
+                f"SELECT id, title, COALESCE(author, ''), description FROM reader_comic"
+            )
+
+
+BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SqliteSearchBackend,
+}
+
+
+def get_backend():
+    return BACKENDS.get(connection.vendor, BasicSearchBackend)()
+
+
+def search_comics(query, category=None, status=None):
+    return get_backend().search(query, category=category, status=status)
+
+
+def autocomplete(prefix, limit=10):
+    return get_backend().autocomplete(prefix, limit=limit)
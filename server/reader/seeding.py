@@ -0,0 +1,289 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.db.models import CharField, F, Q, Value
+from django.db.models.functions import Cast, LPad
+from django.utils import timezone
+
+from .counters import latest_chapter
+from .models import (
+    COMMENT_PATH_STEP, Bookmark, Category, Chapter, ChapterEntitlement, ChapterImage, ChapterView, CoinTransaction,
+    Comic, ComicViewDay, Comment, FeedItem, ImageDerivative, Rating, ReadingProgress, UploadJob,
+)
+from .page_cache import LISTING, bump
+from .popularity import refresh_popularity
+from .search import get_backend
+
+# The catalog seed_catalog is sized against at --scale 1.
+FULL_SIZE = {
+    'comics': 50000,
+    'chapters_per_comic': 40,
+    'pages_per_chapter': 25,
+    'users': 100000,
+    'ratings_per_user': 5,
+    'bookmarks_per_user': 8,
+    'comments_per_comic': 30,
+    'replies_per_comment': 1,
+    'categories': 40,
+}
+
+WORDS = (
+    'shadow monarch tower hunter dragon academy villainess return sword saint demon king '
+    'regressor system level dungeon blood moon empress duke knight omniscient reader '
+    'tomb raider martial god heavenly magic archmage necromancer healer apothecary'
+).split()
+
+
+def scaled(scale, **overrides):
+    """FULL_SIZE times ``scale`` (at least 1 of everything), with explicit overrides."""
+    sizes = {
+        name: max(1, round(count * scale)) if name in ('comics', 'users', 'categories') else count
+        for name, count in FULL_SIZE.items()
+    }
+    sizes.update({name: value for name, value in overrides.items() if value is not None})
+    return sizes
+
+
+def insert_pages(chapter_ids, pages_per_chapter, prefix):
+    """
+    Pages 1..pages_per_chapter of each chapter in one INSERT ... SELECT;
+    pages outnumber everything else, and building model instances for
+    them would dominate the run.
+    """
+    if not chapter_ids or not pages_per_chapter:
+        return 0
+    placeholders = ', '.join(['%s'] * len(chapter_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH RECURSIVE pages(number) AS (SELECT 1 UNION ALL SELECT number + 1 FROM pages WHERE number < %s)
+            INSERT INTO {ChapterImage._meta.db_table} (chapter_id, page_number, image, width, height, byte_size)
+            SELECT chapter.id, pages.number, %s || pages.number, 800, 1200, 180000
+            FROM {Chapter._meta.db_table} chapter CROSS JOIN pages
+            WHERE chapter.id IN ({placeholders})
+            """,
+            [pages_per_chapter, f'manhwa/chapters/{prefix}-page-', *chapter_ids],
+        )
+    return len(chapter_ids) * pages_per_chapter
+
+
+def delete_rows(queryset):
+    """DELETE the rows of ``queryset`` in one statement, skipping per-row signals and cascades."""
+    sql, params = queryset.values('pk').query.sql_with_params()
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE {queryset.model._meta.pk.column} IN ({sql})', params)
+        return cursor.rowcount
+
+
+def clear_catalog(prefix='seed'):
+    """
+    Delete a catalog made by seed_catalog, children first, in bulk: the
+    ORM would send a signal (and run queries) for every page and comment.
+    Counters of other comics are unaffected because seeded users only
+    touched seeded comics.
+    """
+    comics = Comic.objects.filter(slug__startswith=f'{prefix}-')
+    chapters = Chapter.objects.filter(comic__in=comics)
+    CoinTransaction.objects.filter(chapter__in=chapters).update(chapter=None)
+    deleted = sum(
+        delete_rows(queryset) for queryset in (
+            ImageDerivative.objects.filter(Q(chapter_image__chapter__in=chapters) | Q(comic__in=comics)),
+            ChapterImage.objects.filter(chapter__in=chapters),
+            ChapterView.objects.filter(chapter__in=chapters),
+            ComicViewDay.objects.filter(comic__in=comics),
+            ChapterEntitlement.objects.filter(chapter__in=chapters),
+            UploadJob.objects.filter(chapter__in=chapters),
+            Comment.objects.filter(comic__in=comics),
+            Rating.objects.filter(comic__in=comics),
+            Bookmark.objects.filter(comic__in=comics),
+            ReadingProgress.objects.filter(comic__in=comics),
+            FeedItem.objects.filter(comic__in=comics),
+            Comic.categories.through.objects.filter(comic__in=comics),
+            chapters,
+            comics,
+            Category.objects.filter(name__startswith=f'{prefix.title()} '),
+        )
+    )
+    get_user_model().objects.filter(username__startswith=f'{prefix}-user-').delete()
+    get_backend().rebuild()
+    bump(LISTING)
+    return deleted
+
+
+def seed_catalog(
+    comics, chapters_per_comic, pages_per_chapter, users, ratings_per_user, bookmarks_per_user,
+    comments_per_comic, replies_per_comment, categories, prefix='seed', password=None, paid_after=30,
+    seed=42, batch_size=5000, log=None,
+):
+    """
+    Insert a synthetic catalog in bulk: comics with categories,
+    chapters (chapters after ``paid_after`` cost coins), pages, chapter
+    views, users, ratings, bookmarks and threaded comments. Counters,
+    comment paths and views are computed up front instead of by signals,
+    so the result looks like a catalog built through the app. Users are
+    ``<prefix>-user-<n>`` with ``password`` (unusable when None).
+    Returns the number of rows created per model.
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    created = {}
+    started = time.perf_counter()
+
+    def done(label, count):
+        created[label] = count
+        log(f'{label}: {count} in {time.perf_counter() - started:.1f}s')
+
+    category_objects = Category.objects.bulk_create(
+        [Category(name=f'{prefix.title()} {WORDS[num % len(WORDS)].title()} {num}') for num in range(categories)],
+        batch_size=batch_size,
+    )
+    done('categories', len(category_objects))
+
+    User = get_user_model()
+    password_hash = make_password(password)
+    user_ids = [
+        user.pk for user in User.objects.bulk_create(
+            [User(username=f'{prefix}-user-{num}', password=password_hash) for num in range(users)],
+            batch_size=batch_size,
+        )
+    ]
+    done('users', len(user_ids))
+
+    # Zipf-like popularity: a few comics get most of the ratings and bookmarks.
+    weights = [1 / rank for rank in range(1, comics + 1)]
+    rng.shuffle(weights)
+    ratings = [(user_index, set(rng.choices(range(comics), weights, k=ratings_per_user))) for user_index in range(users)]
+    bookmarks = [(user_index, set(rng.choices(range(comics), weights, k=bookmarks_per_user))) for user_index in range(users)]
+    rating_totals = [[0, 0] for _ in range(comics)]
+    rates = {}
+    for user_index, comic_indexes in ratings:
+        for comic_index in comic_indexes:
+            rate = rng.randint(1, 5)
+            rates[user_index, comic_index] = rate
+            rating_totals[comic_index][0] += 1
+            rating_totals[comic_index][1] += rate
+    bookmark_counts = [0] * comics
+    for _, comic_indexes in bookmarks:
+        for comic_index in comic_indexes:
+            bookmark_counts[comic_index] += 1
+
+    def chapter_views(comic_index, chapter_num):
+        return int(weights[comic_index] * 20000 / chapter_num)
+
+    comic_objects = Comic.objects.bulk_create(
+        [
+            Comic(
+                title=' '.join(rng.choices(WORDS, k=3)).title(),
+                slug=f'{prefix}-{num}',
+                author=rng.choice(WORDS).title(),
+                description=' '.join(rng.choices(WORDS, k=40)),
+                rating_count=rating_totals[num][0],
+                rating_sum=rating_totals[num][1],
+                bookmark_count=bookmark_counts[num],
+                comment_count=comments_per_comic * (1 + replies_per_comment),
+                chapter_count=chapters_per_comic,
+                total_views=sum(chapter_views(num, chapter_num) for chapter_num in range(1, chapters_per_comic + 1)),
+            )
+            for num in range(comics)
+        ],
+        batch_size=batch_size,
+    )
+    comic_ids = [comic.pk for comic in comic_objects]
+    today = timezone.localdate()
+    ComicViewDay.objects.bulk_create(
+        [ComicViewDay(comic_id=comic.pk, day=today, views=comic.total_views) for comic in comic_objects if comic.total_views],
+        batch_size=batch_size,
+    )
+    Comic.categories.through.objects.bulk_create(
+        [
+            Comic.categories.through(comic_id=comic_id, category_id=category_objects[(num + offset) % categories].pk)
+            for num, comic_id in enumerate(comic_ids) for offset in {0, 7 % categories}
+        ],
+        batch_size=batch_size,
+    )
+    done('comics', len(comic_ids))
+
+    chapter_total = page_total = 0
+    chapter_batch = []
+
+    def flush_chapters():
+        nonlocal page_total
+        chapters = Chapter.objects.bulk_create(chapter_batch, batch_size=batch_size)
+        ChapterView.objects.bulk_create(
+            [ChapterView(chapter_id=chapter.pk, views=chapter.seed_views) for chapter in chapters if chapter.seed_views],
+            batch_size=batch_size,
+        )
+        page_total += insert_pages([chapter.pk for chapter in chapters], pages_per_chapter, prefix)
+        chapter_batch.clear()
+
+    for comic_index, comic_id in enumerate(comic_ids):
+        for chapter_num in range(1, chapters_per_comic + 1):
+            chapter = Chapter(
+                comic_id=comic_id, chapter_num=chapter_num, slug=f'chapter-{chapter_num}',
+                title=f'Chapter {chapter_num}', price=5 if chapter_num > paid_after else 0,
+            )
+            chapter.seed_views = chapter_views(comic_index, chapter_num)
+            chapter_batch.append(chapter)
+            chapter_total += 1
+        if len(chapter_batch) >= batch_size:
+            flush_chapters()
+    flush_chapters()
+    Comic.objects.filter(slug__startswith=f'{prefix}-').update(**latest_chapter())
+    done('chapters', chapter_total)
+    done('pages', page_total)
+
+    Rating.objects.bulk_create(
+        [
+            Rating(comic_id=comic_ids[comic_index], creator_id=user_ids[user_index], rate=rates[user_index, comic_index])
+            for user_index, comic_indexes in ratings for comic_index in comic_indexes
+        ],
+        batch_size=batch_size,
+    )
+    done('ratings', len(rates))
+    Bookmark.objects.bulk_create(
+        [
+            Bookmark(comic_id=comic_ids[comic_index], creator_id=user_ids[user_index])
+            for user_index, comic_indexes in bookmarks for comic_index in comic_indexes
+        ],
+        batch_size=batch_size,
+    )
+    done('bookmarks', sum(bookmark_counts))
+
+    comment_total = 0
+    comics_per_batch = max(batch_size // max(comments_per_comic, 1), 1)
+    for start in range(0, len(comic_ids), comics_per_batch):
+        batch_ids = comic_ids[start:start + comics_per_batch]
+        roots = Comment.objects.bulk_create([
+            Comment(
+                comic_id=comic_id, creator_id=rng.choice(user_ids), content=' '.join(rng.choices(WORDS, k=12)),
+                reply_count=replies_per_comment,
+            )
+            for comic_id in batch_ids for _ in range(comments_per_comic)
+        ])
+        # Top-level comments are their own thread; their path is their zero-padded id.
+        Comment.objects.filter(pk__in=[root.pk for root in roots]).update(
+            thread_id=F('id'),
+            path=LPad(Cast('id', output_field=CharField()), COMMENT_PATH_STEP, Value('0')),
+        )
+        replies = Comment.objects.bulk_create([
+            Comment(
+                comic_id=root.comic_id, creator_id=rng.choice(user_ids), content=' '.join(rng.choices(WORDS, k=8)),
+                reply_to_id=root.pk, thread_id=root.pk, depth=1,
+            )
+            for root in roots for _ in range(replies_per_comment)
+        ])
+        for reply in replies:
+            reply.path = f'{reply.reply_to_id:0{COMMENT_PATH_STEP}d}{reply.pk:0{COMMENT_PATH_STEP}d}'
+        Comment.objects.bulk_update(replies, ['path'], batch_size=1000)
+        comment_total += len(roots) + len(replies)
+    done('comments', comment_total)
+
+    get_backend().rebuild()
+    refresh_popularity(full=True)
+    bump(LISTING)
+    log(f'search index and popularity scores rebuilt in {time.perf_counter() - started:.1f}s')
+    return created
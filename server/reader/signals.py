@@ -0,0 +1,207 @@
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import entitlements, feed
+from .counters import adjust, chapter_count, latest_chapter
+from .models import Bookmark, Category, Chapter, ChapterEntitlement, ChapterImage, ChapterView, Comic, Comment, Rating
+from .page_cache import LISTING, bump, chapters_scope, comic_scope
+from .search import get_backend
+
+
+@receiver(post_save, sender=Comic)
+def index_comic(sender, instance, raw=False, **kwargs):
+    if not raw:
+        get_backend().index(instance)
+
+
+@receiver(post_delete, sender=Comic)
+def unindex_comic(sender, instance, **kwargs):
+    get_backend().remove(instance.pk)
+
+
+@receiver(post_delete, sender=Comic)
+def touch_latest_comic(sender, instance, **kwargs):
+    # Listing validators only look at the newest updated_at; a deleted
+    # comic leaves nothing behind, so move the newest remaining one on.
+    latest = Comic.objects.order_by('-updated_at').values_list('pk', flat=True)[:1]
+    Comic.objects.filter(pk__in=list(latest)).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Chapter)
+@receiver(post_delete, sender=Chapter)
+def touch_comic(sender, instance, raw=False, **kwargs):
+    # Moves the comic's chapter index cache key on; see chapter_index.cache_key.
+    # Chapters change rarely, so their counter and the latest chapter are simply recomputed.
+    if not raw and instance.comic_id:
+        Comic.objects.filter(pk=instance.comic_id).update(
+            updated_at=timezone.now(), chapter_count=chapter_count(), **latest_chapter()
+        )
+
+
+@receiver(pre_save, sender=Chapter)
+def remember_activity(sender, instance, raw=False, **kwargs):
+    instance.was_active = (
+        not raw and instance.pk is not None and Chapter.objects.filter(pk=instance.pk, active=True).exists()
+    )
+
+
+@receiver(post_save, sender=Chapter)
+def announce_chapter(sender, instance, raw=False, **kwargs):
+    # Chapters are announced once they can be read: here when one that has
+    # pages is activated, and by run_upload_job when an upload gives an
+    # active chapter its first pages. Uploads create chapters page-less.
+    if (
+        not raw and instance.active and instance.comic_id and not getattr(instance, 'was_active', False)
+        and instance.chapter_images.exists()
+    ):
+        feed.start_fan_out(instance)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        adjust(instance.comic_id, comment_count=1, engaged_at=timezone.now())
+        if instance.reply_to_id:
+            Comment.objects.filter(pk=instance.reply_to_id).update(reply_count=F('reply_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    # A deleted row leaves no newer timestamp behind for conditional GETs to see.
+    adjust(instance.comic_id, comment_count=-1, engaged_at=timezone.now())
+    if instance.reply_to_id:
+        Comment.objects.filter(pk=instance.reply_to_id).update(reply_count=Greatest(F('reply_count') - 1, Value(0)))
+
+
+@receiver(pre_save, sender=Rating)
+def remember_rate(sender, instance, raw=False, **kwargs):
+    instance.previous_rate = (
+        None if raw or instance.pk is None
+        else Rating.objects.filter(pk=instance.pk).values_list('rate', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Rating)
+def count_rating(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        adjust(instance.comic_id, rating_count=1, rating_sum=instance.rate, engaged_at=timezone.now())
+        return
+    previous = getattr(instance, 'previous_rate', None)
+    if previous is not None and previous != instance.rate:
+        adjust(instance.comic_id, rating_sum=instance.rate - previous, engaged_at=timezone.now())
+
+
+@receiver(post_delete, sender=Rating)
+def uncount_rating(sender, instance, **kwargs):
+    # Clearing popularity_updated_at has refresh_popularity rescore the comic.
+    adjust(
+        instance.comic_id, rating_count=-1, rating_sum=-instance.rate, engaged_at=timezone.now(),
+        popularity_updated_at=None,
+    )
+
+
+def count_bookmarks(comic_id, delta, **changes):
+    # Bookmark counts are on the comic page, which has no bookmark timestamps to validate against.
+    adjust(comic_id, bookmark_count=delta, engaged_at=timezone.now(), **changes)
+    slug = comic_slug(comic_id)
+    if slug:
+        bump(comic_scope(slug))
+
+
+@receiver(post_save, sender=Bookmark)
+def count_bookmark(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        count_bookmarks(instance.comic_id, 1)
+
+
+@receiver(post_delete, sender=Bookmark)
+def uncount_bookmark(sender, instance, **kwargs):
+    # Clearing popularity_updated_at has refresh_popularity rescore the comic.
+    count_bookmarks(instance.comic_id, -1, popularity_updated_at=None)
+
+
+@receiver(pre_delete, sender=ChapterView)
+def uncount_views(sender, instance, **kwargs):
+    # pre_delete: in a cascade the chapter row may already be gone by post_delete.
+    comic_id = Chapter.objects.filter(pk=instance.chapter_id).values_list('comic_id', flat=True).first()
+    if comic_id and instance.views:
+        adjust(comic_id, total_views=-instance.views)
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def touch_category_comics(sender, instance, raw=False, **kwargs):
+    # Comic cards show category names.
+    if not raw:
+        Comic.objects.filter(categories=instance).update(updated_at=timezone.now())
+
+
+@receiver(m2m_changed, sender=Comic.categories.through)
+def touch_recategorized_comics(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        comics = Comic.objects.filter(pk=instance.pk)
+    elif pk_set:
+        comics = Comic.objects.filter(pk__in=pk_set)
+    else:
+        comics = Comic.objects.filter(categories=instance)
+    comics.update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=ChapterEntitlement)
+@receiver(post_delete, sender=ChapterEntitlement)
+def invalidate_entitlements(sender, instance, **kwargs):
+    entitlements.invalidate(instance.user_id, instance.comic_id)
+
+
+def comic_slug(comic_id):
+    return Comic.objects.filter(pk=comic_id).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Comic)
+@receiver(post_delete, sender=Comic)
+def invalidate_comic_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump(comic_scope(instance.slug), chapters_scope(instance.slug), LISTING)
+
+
+@receiver(post_save, sender=Chapter)
+@receiver(post_delete, sender=Chapter)
+def invalidate_chapter_pages(sender, instance, raw=False, **kwargs):
+    slug = not raw and instance.comic_id and comic_slug(instance.comic_id)
+    if slug:
+        bump(comic_scope(slug), chapters_scope(slug))
+
+
+@receiver(post_save, sender=ChapterImage)
+@receiver(post_delete, sender=ChapterImage)
+def invalidate_reader_pages(sender, instance, raw=False, **kwargs):
+    if raw or not instance.chapter_id:
+        return
+    slug = Chapter.objects.filter(pk=instance.chapter_id).values_list('comic__slug', flat=True).first()
+    if slug:
+        bump(chapters_scope(slug))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def invalidate_comic_detail(sender, instance, raw=False, **kwargs):
+    slug = not raw and comic_slug(instance.comic_id)
+    if slug:
+        bump(comic_scope(slug), *([LISTING] if sender is Rating else []))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(m2m_changed, sender=Comic.categories.through)
+def invalidate_listings(sender, raw=False, action='post_save', **kwargs):
+    if not raw and action.startswith('post_'):
+        bump(LISTING)
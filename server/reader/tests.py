@@ -1,3 +1,1651 @@
-from django.test import TestCase
+import json
+import logging
+import os
+import re
+import runpy
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+import zipfile
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+import cloudinary
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image as PILImage
+
+from . import views
+from .chapter_index import get_chapter_index
+from .chapter_views import ChapterViewBuffer, buffer_cache, chapter_views, pending_key
+from .coins import AlreadyOwned, IdempotencyKeyReused, InsufficientCoins, credit, get_balance, purchase_chapter
+from .comments import build_tree, subtree_page, thread_replies
+from .counters import find_drift
+from .derivatives import DERIVATIVE_FORMATS, rebuild_comic_derivatives, render_derivatives
+from .entitlements import entitled_chapter_ids, grant_chapter, user_has_access
+from . import feed
+from .ingest import IngestError, copy_entry, extract_archive_pages, extract_pages
+from .library import library, serialize as serialize_entry
+from .metrics import RequestMetrics, percentile, request_metrics
+from .models import (
+    Bookmark, Category, Chapter, ChapterEntitlement, ChapterImage, ChapterView, CoinTransaction, CoinWallet, Comic,
+    ComicViewDay, Comment, COMMENT_MAX_DEPTH, FeedCounter, FeedItem, ImageDerivative, Rating, ReadingProgress, UploadJob,
+)
+from .page_cache import page_cache
+from .pagination import CursorPaginator, InvalidCursor, approximate_count
+from .popularity import bayesian_rating, decayed_views, refresh_popularity
+from .reading_progress import ReadingProgressBuffer, continue_reading, reading_progress
+from .search import search_comics
+from .seeding import clear_catalog, seed_catalog
+from .uploads import FileSystemPageStorage, process_upload_job
+
+# Keep the per-request JSON lines out of the test output.
+logging.getLogger('reader.requests').setLevel(logging.WARNING)
+
+# Image URLs are built locally, but cloudinary refuses to build them without a cloud name.
+if not cloudinary.config().cloud_name:
+    cloudinary.config(cloud_name='test')
+
+
+class ChapterViewBufferTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        buffer_cache.clear()
+        self.comic = Comic.objects.create(title='Solo Leveling')
+        self.chapter = Chapter.objects.create(comic=self.comic, chapter_num=1)
+
+    def test_views_are_buffered_until_flush(self):
+        buffer = ChapterViewBuffer(flush_interval=3600, flush_threshold=1000)
+        for _ in range(5):
+            buffer.record(self.chapter.id)
+
+        self.assertFalse(ChapterView.objects.filter(chapter=self.chapter).exists())
+        self.assertEqual(buffer.get_views(self.chapter.id), 5)
+
+        self.assertEqual(buffer.flush(), 5)
+        self.assertEqual(ChapterView.objects.get(chapter=self.chapter).views, 5)
+        self.assertEqual(buffer.pending(self.chapter.id), 0)
+
+    def test_threshold_triggers_flush(self):
+        buffer = ChapterViewBuffer(flush_interval=3600, flush_threshold=3)
+        for _ in range(3):
+            buffer.record(self.chapter.id)
+        self.assertEqual(ChapterView.objects.get(chapter=self.chapter).views, 3)
+
+    def test_flush_adds_to_existing_count(self):
+        ChapterView.objects.create(chapter=self.chapter, views=10)
+        buffer = ChapterViewBuffer(flush_interval=3600, flush_threshold=1000)
+        buffer.record(self.chapter.id, count=4)
+        buffer.flush()
+        self.assertEqual(ChapterView.objects.get(chapter=self.chapter).views, 14)
+
+    def test_flush_all_reaches_other_buffers(self):
+        ChapterViewBuffer(flush_interval=3600, flush_threshold=1000).record(self.chapter.id, count=2)
+        other = ChapterViewBuffer(flush_interval=3600, flush_threshold=1000)
+        self.assertEqual(other.flush_all(), 2)
+        self.assertEqual(other.flush_all(), 0)
+        self.assertEqual(ChapterView.objects.get(chapter=self.chapter).views, 2)
+
+    def test_pending_counts_survive_default_cache_culling(self):
+        buffer = ChapterViewBuffer(flush_interval=3600, flush_threshold=1000)
+        buffer.record(self.chapter.id, count=3)
+        cache.clear()
+        self.assertEqual(buffer.flush(), 3)
+
+    def test_counter_gone_before_claim_is_skipped(self):
+        buffer = ChapterViewBuffer(flush_interval=3600, flush_threshold=1000)
+        buffer.record(self.chapter.id, count=3)
+        buffer_cache.clear()
+        with mock.patch.object(buffer_cache, 'get_many', return_value={pending_key(self.chapter.id): 3}):
+            self.assertEqual(buffer.flush(), 0)
+        self.assertFalse(ChapterView.objects.filter(chapter=self.chapter).exists())
+
+    def test_view_update_endpoint_counts_pending_views(self):
+        user = User.objects.create_user('reader', password='pw')
+        self.client.force_login(user)
+        chapter_views.flush()
+        response = self.client.post(reverse('reader:chapter_view_update', args=[self.chapter.id]))
+        self.assertEqual(response.json(), {'status': 'viewed', 'views': 1})
+
+
+class ComicDetailQueryBudgetTests(TestCase):
+    def setUp(self):
+        self.comic = Comic.objects.create(title='Omniscient Reader')
+        self.user = User.objects.create_user('reader', password='pw')
+
+    def add_content(self, count):
+        start = self.comic.chapters.count() + 1
+        for num in range(start, start + count):
+            Chapter.objects.create(comic=self.comic, chapter_num=num)
+            comment = Comment.objects.create(comic=self.comic, creator=self.user, content='first')
+            reply = Comment.objects.create(comic=self.comic, creator=self.user, content='re', reply_to=comment)
+            Comment.objects.create(comic=self.comic, creator=self.user, content='re re', reply_to=reply)
+
+    def get_detail(self):
+        return self.client.get(reverse('reader:comic_detail', args=[self.comic.slug]))
+
+    def test_query_count_is_constant(self):
+        # One of these is the conditional GET validators query.
+        self.add_content(1)
+        with self.assertNumQueries(7):
+            self.get_detail()
+        self.add_content(10)
+        with self.assertNumQueries(7):
+            response = self.get_detail()
+        self.assertEqual(len(response.context['chapters']), 11)
+        self.assertEqual(len(response.context['comments']), 11)
+        self.assertEqual(len(response.context['comments'][0].children), 1)
+        self.assertEqual(len(response.context['comments'][0].children[0].children), 1)
+
+    def test_authenticated_query_count_is_constant(self):
+        self.client.force_login(self.user)
+        self.get_detail()  # caches the navbar coin balance
+        self.add_content(1)
+        with self.assertNumQueries(9):
+            self.get_detail()
+        self.add_content(10)
+        with self.assertNumQueries(9):
+            self.get_detail()
+
+    def test_rating_totals_are_kept_incrementally(self):
+        self.client.force_login(self.user)
+        url = reverse('reader:rate_comic', args=[self.comic.slug])
+        self.client.post(url, {'rating': 4})
+        response = self.client.post(url, {'rating': 2})
+        self.assertEqual(response.json()['average_rating'], 2)
+
+        other = User.objects.create_user('other', password='pw')
+        self.client.force_login(other)
+        response = self.client.post(url, {'rating': 5})
+        self.assertEqual(response.json()['average_rating'], 3.5)
+
+        self.comic.refresh_from_db()
+        self.assertEqual((self.comic.rating_count, self.comic.rating_sum), (2, 7))
+        detail = self.get_detail()
+        self.assertEqual(detail.context['user_rating'], 5)
+
+
+class CommentTreeTests(TestCase):
+    def setUp(self):
+        self.comic = Comic.objects.create(title='Tower of God')
+        self.user = User.objects.create_user('reader', password='pw')
+
+    def comment(self, reply_to=None):
+        return Comment.objects.create(comic=self.comic, creator=self.user, content='Bam', reply_to=reply_to)
+
+    def test_comments_are_placed_in_their_thread(self):
+        root = self.comment()
+        reply = self.comment(root)
+        nested = self.comment(reply)
+        nested.refresh_from_db()
+        self.assertEqual((nested.thread_id, nested.depth), (root.id, 2))
+        self.assertEqual(nested.path, f'{root.id:010d}{reply.id:010d}{nested.id:010d}')
+        root.refresh_from_db()
+        self.assertEqual(root.reply_count, 1)
+        reply.delete()
+        root.refresh_from_db()
+        self.assertEqual(root.reply_count, 0)
+
+    def test_replies_past_the_path_limit_are_attached_to_the_parent(self):
+        parent = self.comment()
+        for _ in range(COMMENT_MAX_DEPTH):
+            parent = self.comment(parent)
+        reply = self.comment(parent)
+        self.assertEqual((reply.reply_to_id, reply.depth), (parent.reply_to_id, COMMENT_MAX_DEPTH))
+
+    def test_tree_is_nested_and_cut_to_a_prefix(self):
+        root = self.comment()
+        first = self.comment(root)
+        deep = self.comment(first)
+        self.comment(deep)
+        second = self.comment(root)
+        root.refresh_from_db()
+        with self.assertNumQueries(1):
+            roots = build_tree([root], thread_replies([root.id], max_depth=2, per_thread=2))
+        self.assertEqual(roots[0].children, [first])
+        self.assertEqual(roots[0].children[0].children, [deep])
+        # The cut leaves the root's second reply and the only reply of ``deep`` for lazy loading.
+        self.assertEqual(roots[0].hidden_replies, 1)
+        self.assertEqual(roots[0].children[0].children[0].hidden_replies, 1)
+        self.assertNotIn(second, roots[0].children)
+
+    def test_replies_endpoint_pages_through_a_subtree(self):
+        root = self.comment()
+        reply = self.comment(root)
+        nested = self.comment(reply)
+        other = self.comment(root)
+        self.comment()
+        replies, after = subtree_page(root, limit=2)
+        self.assertEqual(replies, [reply, nested])
+        self.assertEqual(subtree_page(root, after=after, limit=2), ([other], None))
+
+        response = self.client.get(reverse('reader:comment_replies', args=[reply.pk]))
+        data = response.json()
+        self.assertEqual([item['id'] for item in data['replies']], [nested.id])
+        self.assertEqual((data['replies'][0]['parent'], data['replies'][0]['depth'], data['next']), (reply.id, 2, None))
+        response = self.client.get(reverse('reader:comment_replies', args=[reply.pk]), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+class CommentPathMigrationTests(TestCase):
+    def test_backfill_clamps_deep_threads_like_new_replies(self):
+        backfill_paths = import_module('reader.migrations.0014_comment_paths').backfill_paths
+        comic = Comic.objects.create(title='Tower of God')
+        user = User.objects.create_user('reader', password='pw')
+        # bulk_create skips Comment.save(), leaving the rows as they were before the migration.
+        chain = []
+        for _ in range(COMMENT_MAX_DEPTH + 6):
+            chain += Comment.objects.bulk_create([
+                Comment(comic=comic, creator=user, content='Bam', reply_to=chain[-1] if chain else None)
+            ])
+
+        backfill_paths(django_apps, None)
+
+        comments = {comment.pk: comment for comment in Comment.objects.all()}
+        deepest_parent = chain[COMMENT_MAX_DEPTH - 1]
+        for depth, original in enumerate(chain):
+            comment = comments[original.pk]
+            self.assertEqual(comment.depth, min(depth, COMMENT_MAX_DEPTH))
+            self.assertLessEqual(len(comment.path), 255)
+            self.assertTrue(comment.path.startswith(comments[comment.reply_to_id].path if comment.reply_to_id else ''))
+            if depth > COMMENT_MAX_DEPTH:
+                self.assertEqual(comment.reply_to_id, deepest_parent.pk)
+        self.assertEqual(comments[deepest_parent.pk].reply_count, 6)
+        self.assertEqual(comments[chain[-1].pk].reply_count, 0)
+
+
+class ServerInterfaceTests(SimpleTestCase):
+    def gunicorn_conf(self):
+        return runpy.run_path(os.path.join(settings.BASE_DIR, 'gunicorn.conf.py'))
+
+    def test_gunicorn_serves_the_interface_settings_chose(self):
+        self.assertEqual(self.gunicorn_conf()['interface'], settings.SERVER_INTERFACE)
+
+    @skipIf('SERVER_INTERFACE' in os.environ, 'SERVER_INTERFACE is set')
+    def test_default_is_wsgi_without_adapted_middleware(self):
+        self.assertEqual(self.gunicorn_conf()['worker_class'], 'sync')
+        # Django logs "... adapted for middleware ..." for every middleware it wraps for the handler's mode.
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            WSGIHandler()
+
+
+class AsyncEndpointTests(TestCase):
+    def setUp(self):
+        self.comic = Comic.objects.create(title='Solo Leveling')
+        self.chapter = Chapter.objects.create(comic=self.comic, chapter_num=1)
+        self.user = User.objects.create_user('reader', password='pw')
+
+    def test_json_endpoints_are_async(self):
+        for view in (
+            views.BookmarkToggleView, views.RateComicView, views.AddCommentView,
+            views.ReplyCommentView, views.ChapterViewUpdateView, views.ReadingProgressUpdateView,
+        ):
+            self.assertTrue(view.view_is_async, view.__name__)
+
+    async def test_anonymous_requests_are_sent_to_login(self):
+        response = await self.async_client.post(reverse('reader:bookmark_toggle', args=[self.comic.slug]))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse('login'), response['Location'])
+
+    async def test_bookmark_rate_and_comment(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(reverse('reader:bookmark_toggle', args=[self.comic.slug]))
+        self.assertEqual(response.json(), {'status': 'added'})
+        response = await self.async_client.post(reverse('reader:rate_comic', args=[self.comic.slug]), {'rating': 4})
+        self.assertEqual(response.json()['average_rating'], 4)
+        response = await self.async_client.post(reverse('reader:add_comment', args=[self.comic.slug]), {'content': 'Arise'})
+        comment_id = response.json()['comment_id']
+        response = await self.async_client.post(reverse('reader:reply_comment', args=[comment_id]), {'content': 'Igris'})
+        self.assertEqual(response.json()['status'], 'reply_added')
+        response = await self.async_client.post(reverse('reader:bookmark_toggle', args=[self.comic.slug]))
+        self.assertEqual(response.json(), {'status': 'removed'})
+        comic = await Comic.objects.aget(pk=self.comic.pk)
+        self.assertEqual((comic.bookmark_count, comic.rating_count, comic.comment_count), (0, 1, 2))
+
+    async def test_missing_objects_are_404(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(reverse('reader:chapter_view_update', args=[self.chapter.pk + 1]))
+        self.assertEqual(response.status_code, 404)
+
+
+
+class ReadingProgressTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        buffer_cache.clear()
+        self.user = User.objects.create_user('reader', password='pw')
+        self.comic = Comic.objects.create(title='Omniscient Reader')
+        self.chapters = [Chapter.objects.create(comic=self.comic, chapter_num=num) for num in (1, 2)]
+
+    def test_beacons_are_coalesced_into_one_upsert(self):
+        buffer = ReadingProgressBuffer(flush_interval=3600, flush_threshold=1000)
+        with self.assertNumQueries(0):
+            for page in range(1, 20):
+                buffer.record(self.user.pk, self.chapters[0].pk, page, at=page)
+            buffer.record(self.user.pk, self.chapters[1].pk, 3, at=100)
+        self.assertFalse(ReadingProgress.objects.exists())
+
+        self.assertEqual(buffer.flush(), 1)
+        progress = ReadingProgress.objects.get()
+        self.assertEqual((progress.chapter_id, progress.page), (self.chapters[1].pk, 3))
+        self.assertEqual(buffer.pending(self.user.pk), {})
+
+        buffer.record(self.user.pk, self.chapters[1].pk, 9, at=200)
+        buffer.record(self.user.pk, self.chapters[1].pk + 100, 1, at=300)
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(ReadingProgress.objects.get().page, 9)
+
+    def test_beacon_feeds_the_continue_reading_shelf(self):
+        url = reverse('reader:reading_progress', args=[self.chapters[1].pk])
+        self.assertEqual(self.client.post(url, {'page': 4}).status_code, 302)
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.post(url, {'page': 4}).json(), {'status': 'recorded'})
+        self.assertEqual(self.client.post(url, {'page': 'x'}).status_code, 400)
+        response = self.client.get(reverse('reader:profile'))
+        self.assertEqual([progress.page for progress in response.context['continue_reading']], [4])
+        self.assertContains(response, f'/chapter/{self.chapters[1].slug}/#page-4')
+        reading_progress.flush()
+
+    def test_beacon_needs_a_readable_chapter(self):
+        self.client.force_login(self.user)
+        draft = Chapter.objects.create(comic=self.comic, chapter_num=3, active=False)
+        paid = Chapter.objects.create(comic=self.comic, chapter_num=4, price=5)
+        for chapter, status in ((draft, 404), (paid, 403)):
+            with self.subTest(chapter=chapter.chapter_num):
+                response = self.client.post(reverse('reader:reading_progress', args=[chapter.pk]), {'page': 2})
+                self.assertEqual(response.status_code, status)
+        self.assertEqual(self.client.post(reverse('reader:reading_progress', args=[999]), {'page': 2}).status_code, 404)
+        self.assertEqual(reading_progress.pending(self.user.pk), {})
+
+    def test_shelf_is_one_query(self):
+        other = Comic.objects.create(title='Tower of God')
+        ReadingProgress.objects.create(user=self.user, comic=self.comic, chapter=self.chapters[0], page=2)
+        ReadingProgress.objects.create(
+            user=self.user, comic=other, chapter=Chapter.objects.create(comic=other, chapter_num=1),
+        )
+        with self.assertNumQueries(1):
+            shelf = list(continue_reading(self.user))
+            titles = [progress.comic.title for progress in shelf] + [shelf[0].chapter.chapter_num]
+        self.assertEqual(titles, ['Tower of God', 'Omniscient Reader', 1])
+
+
+
+class LibraryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reader', password='pw')
+        self.comics = []
+        for num, title in enumerate(('Tower of God', 'Eleceed', 'Noblesse')):
+            comic = Comic.objects.create(title=title)
+            for chapter_num in range(1, 4 + num):
+                Chapter.objects.create(comic=comic, chapter_num=chapter_num, price=5 if chapter_num > 3 else 0)
+            Bookmark.objects.create(comic=comic, creator=self.user)
+            self.comics.append(comic)
+
+    def read(self, comic, chapter_num, page=1):
+        ReadingProgress.objects.create(
+            user=self.user, comic=comic, chapter=comic.chapters.get(chapter_num=chapter_num), page=page,
+        )
+
+    def test_latest_chapter_pointer_follows_chapters(self):
+        comic = self.comics[0]
+        comic.refresh_from_db()
+        self.assertEqual(comic.latest_chapter.chapter_num, 3)
+        Chapter.objects.create(comic=comic, chapter_num=9, active=False)
+        comic.chapters.get(chapter_num=3).delete()
+        comic.refresh_from_db()
+        self.assertEqual(comic.latest_chapter.chapter_num, 2)
+        self.assertEqual(find_drift([comic.pk]), {})
+
+    def test_library_is_one_query(self):
+        self.read(self.comics[0], 1, page=7)
+        self.read(self.comics[2], 2)
+        grant_chapter(self.user, self.comics[2].chapters.get(chapter_num=5))
+        with self.assertNumQueries(1):
+            entries = {entry['comic']['title']: entry for entry in map(serialize_entry, library(self.user))}
+        self.assertEqual(
+            {title: (entry['unread'], entry['latest_chapter']['chapter_num'], entry['latest_chapter']['locked'])
+             for title, entry in entries.items()},
+            {'Tower of God': (2, 3, False), 'Eleceed': (4, 4, True), 'Noblesse': (3, 5, False)},
+        )
+        self.assertEqual(entries['Tower of God']['last_read']['page'], 7)
+        self.assertIsNone(entries['Eleceed']['last_read'])
+
+    def test_sort_modes(self):
+        self.read(self.comics[1], 1)
+        Comic.objects.filter(pk=self.comics[2].pk).update(latest_chapter_at=None)
+        self.client.force_login(self.user)
+        orders = {
+            sort: [entry['comic']['title'] for entry in self.client.get(reverse('reader:library'), {'sort': sort}).json()['comics']]
+            for sort in ('updated', 'read', 'title')
+        }
+        self.assertEqual(orders, {
+            'updated': ['Eleceed', 'Tower of God', 'Noblesse'],
+            'read': ['Eleceed', 'Tower of God', 'Noblesse'],
+            'title': ['Eleceed', 'Noblesse', 'Tower of God'],
+        })
+
+    def test_library_page_does_not_grow_with_bookmarks(self):
+        self.client.force_login(self.user)
+        url = reverse('reader:bookmarks')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as few:
+            self.assertContains(self.client.get(url), '4 new')
+        for num in range(10):
+            comic = Comic.objects.create(title=f'Extra {num}')
+            Chapter.objects.create(comic=comic, chapter_num=1)
+            Bookmark.objects.create(comic=comic, creator=self.user)
+        with self.assertNumQueries(len(few)):
+            self.client.get(url, {'sort': 'read'})
+
+
+
+class FeedTests(TestCase):
+    def setUp(self):
+        self.comic = Comic.objects.create(title='The Breaker')
+        self.users = [User.objects.create_user(f'fan-{num}', password='pw') for num in range(5)]
+        for user in self.users:
+            Bookmark.objects.create(comic=self.comic, creator=user)
+
+    def unread(self):
+        return sorted(FeedCounter.objects.values_list('unread', flat=True))
+
+    def test_fan_out_is_batched_and_idempotent(self):
+        chapter = Chapter.objects.create(comic=self.comic, chapter_num=1)
+        self.assertEqual(feed.fan_out(chapter.pk, batch_size=2), 5)
+        self.assertEqual(FeedItem.objects.filter(chapter=chapter).count(), 5)
+        self.assertEqual(feed.fan_out(chapter.pk, batch_size=2), 0)
+        self.assertEqual(self.unread(), [1] * 5)
+
+    @override_settings(UPLOAD_JOBS_INLINE=True)
+    def test_chapters_are_fanned_out_when_activated_with_pages(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            empty = Chapter.objects.create(comic=self.comic, chapter_num=1)
+            draft = Chapter.objects.create(comic=self.comic, chapter_num=2, active=False)
+            ChapterImage.objects.create(chapter=draft, image='manhwa/chapters/page', page_number=1)
+            draft.save()
+        self.assertFalse(FeedItem.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            draft.active = True
+            draft.save()
+            empty.save()
+        self.assertEqual(set(FeedItem.objects.values_list('chapter__chapter_num', flat=True)), {2})
+        with mock.patch.object(feed, 'start_fan_out') as start_fan_out:
+            draft.save()
+        start_fan_out.assert_not_called()
+        self.assertEqual(self.unread(), [1] * 5)
+
+    def test_feed_endpoint_pages_and_marks_seen(self):
+        chapters = [Chapter.objects.create(comic=self.comic, chapter_num=num) for num in range(1, 4)]
+        for chapter in chapters:
+            feed.fan_out(chapter.pk)
+        self.client.force_login(self.users[0])
+        url = reverse('reader:feed')
+        with mock.patch.object(feed, 'FEED_PAGE_SIZE', 2):
+            first = self.client.get(url).json()
+            second = self.client.get(url, {'cursor': first['next']}).json()
+        self.assertEqual(first['unread'], 3)
+        self.assertEqual(
+            [item['chapter']['chapter_num'] for item in first['items'] + second['items']], [3, 2, 1],
+        )
+        self.assertIsNone(second['next'])
+
+        self.assertEqual(self.client.post(reverse('reader:feed_seen')).json()['unread'], 0)
+        self.assertEqual(self.client.get(url).json()['unread'], 0)
+        self.assertEqual(self.unread(), [0, 3, 3, 3, 3])
+
+
+class ComicListingQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Action')
+        other = Category.objects.create(name='Fantasy')
+        for num in range(15):
+            comic = Comic.objects.create(title=f'Comic {num}', description='word ' * 100)
+            comic.categories.add(cls.category, other)
+        Comic.objects.update(thumbnail='manhwa/thumbnails/cover')
+
+    def assert_listing_queries(self, url, expected):
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_listing_pages_are_constant_queries(self):
+        for name in ('reader:comic_list', 'reader:latest_comics', 'reader:popular_comics'):
+            with self.subTest(name=name):
+                # validators, page, categories
+                response = self.assert_listing_queries(reverse(name), 3)
+                self.assertEqual(len(response.context['comics']), 12)
+                self.assertContains(response, 'Fantasy')
+
+    def test_category_page_is_constant_queries(self):
+        # validators, category, comics, categories
+        response = self.assert_listing_queries(reverse('reader:category_detail', args=[self.category.pk]), 4)
+        self.assertEqual(len(response.context['comics']), 15)
+
+    def test_for_listing_defers_description(self):
+        comic = Comic.objects.for_listing().first()
+        self.assertIn('description', comic.get_deferred_fields())
+        self.assertEqual(len(comic.summary), 300)
+        self.assertIn('manhwa/thumbnails/cover', comic.thumbnail_url)
+
+
+class PopularityTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(f'user{num}', password='pw') for num in range(3)]
+        self.hit = Comic.objects.create(title='Hit', rating_count=3, rating_sum=14)
+        self.one_vote = Comic.objects.create(title='One Vote', rating_count=1, rating_sum=5)
+        self.quiet = Comic.objects.create(title='Quiet')
+        chapter = Chapter.objects.create(comic=self.hit, chapter_num=1)
+        ChapterView.objects.create(chapter=chapter, views=500)
+        ComicViewDay.objects.create(comic=self.hit, day=timezone.localdate(), views=500)
+        for user in self.users:
+            Bookmark.objects.create(comic=self.hit, creator=user)
+
+    def test_smoothing_keeps_single_votes_from_dominating(self):
+        mean = 19 / 4
+        self.assertLess(bayesian_rating(5, 1, mean), bayesian_rating(14, 3, mean) + 1)
+        self.assertAlmostEqual(bayesian_rating(0, 0, mean), mean)
+
+    def test_popular_page_uses_stored_ranking(self):
+        self.assertEqual(refresh_popularity(), 3)
+        response = self.client.get(reverse('reader:popular_comics'))
+        titles = [comic.title for comic in response.context['comics']]
+        self.assertEqual(titles, ['Hit', 'One Vote', 'Quiet'])
+
+    def test_incremental_refresh_only_touches_active_comics(self):
+        refresh_popularity()
+        self.assertEqual(refresh_popularity(), 0)
+        Bookmark.objects.create(comic=self.quiet, creator=self.users[0])
+        self.assertEqual(refresh_popularity(), 1)
+        self.assertEqual(refresh_popularity(full=True), 3)
+
+    def test_flushed_views_and_deletes_mark_comics_stale(self):
+        chapter = Chapter.objects.create(comic=self.quiet, chapter_num=1)
+        refresh_popularity()
+        buffer = ChapterViewBuffer(flush_interval=3600, flush_threshold=1000)
+        buffer.record(chapter.id, count=7)
+        buffer.flush()
+        self.assertEqual(refresh_popularity(), 1)
+        Bookmark.objects.filter(comic=self.hit).first().delete()
+        self.assertEqual(refresh_popularity(), 1)
+        Rating.objects.create(comic=self.one_vote, creator=self.users[0], rate=5)
+        refresh_popularity()
+        Rating.objects.get(comic=self.one_vote).delete()
+        self.assertEqual(refresh_popularity(), 1)
+
+    def test_views_decay_by_when_they_happened(self):
+        old = Comic.objects.create(title='Old Hit')
+        chapter = Chapter.objects.create(comic=old, chapter_num=1)
+        Chapter.objects.filter(pk=chapter.pk).update(created_at=timezone.now() - timedelta(days=365))
+        buffer = ChapterViewBuffer(flush_interval=3600, flush_threshold=1000)
+        buffer.record(chapter.id, count=100)
+        buffer.flush()
+        today = timezone.localdate()
+        ComicViewDay.objects.create(comic=self.quiet, day=today - timedelta(days=14), views=100)
+        ComicViewDay.objects.create(comic=self.one_vote, day=today - timedelta(days=365), views=100)
+
+        views = decayed_views([old.id, self.quiet.id, self.one_vote.id], timezone.now())
+        self.assertAlmostEqual(views[old.id], 100)
+        self.assertAlmostEqual(views[self.quiet.id], 50)
+        self.assertNotIn(self.one_vote.id, views)
+        refresh_popularity(full=True)
+        self.assertFalse(ComicViewDay.objects.filter(comic=self.one_vote).exists())
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.action = Category.objects.create(name='Action')
+        self.leveling = Comic.objects.create(title='Solo Leveling', author='Chugong', description='A weak hunter.')
+        self.leveling.categories.add(self.action)
+        self.tower = Comic.objects.create(
+            title='Tower of God', description='Bam climbs the tower. Leveling up along the way.', status='completed'
+        )
+
+    def titles(self, queryset):
+        return [comic.title for comic in queryset]
+
+    def test_title_matches_rank_above_description_matches(self):
+        self.assertEqual(self.titles(search_comics('leveling')), ['Solo Leveling', 'Tower of God'])
+        self.assertEqual(self.titles(search_comics('chug')), ['Solo Leveling'])
+
+    def test_filters(self):
+        self.assertEqual(self.titles(search_comics('leveling', category=self.action.pk)), ['Solo Leveling'])
+        self.assertEqual(self.titles(search_comics('leveling', status='completed')), ['Tower of God'])
+        self.assertEqual(self.titles(search_comics('')), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.tower.title = 'Tower of Babel'
+        self.tower.save()
+        self.assertEqual(self.titles(search_comics('babel')), ['Tower of Babel'])
+        self.tower.delete()
+        self.assertEqual(self.titles(search_comics('tower')), [])
+
+    def test_autocomplete_endpoint(self):
+        response = self.client.get(reverse('reader:comic_autocomplete'), {'q': 'sol'})
+        self.assertEqual(response.json(), {'results': [{'title': 'Solo Leveling', 'slug': 'solo-leveling'}]})
+
+    def test_search_page(self):
+        response = self.client.get(reverse('reader:comic_search'), {'q': 'tower', 'category': 'x'})
+        self.assertEqual(self.titles(response.context['comics']), ['Tower of God'])
+        self.assertEqual(response.context['query'], 'tower')
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.comic = Comic.objects.create(title='Nano Machine')
+        for num in range(1, 26):
+            Chapter.objects.create(comic=cls.comic, chapter_num=num)
+
+    def paginator(self):
+        return CursorPaginator(Chapter.objects.filter(comic=self.comic), 10, ('chapter_num', 'id'), count='exact')
+
+    def test_walks_forward_and_back(self):
+        paginator = self.paginator()
+        first = paginator.page()
+        self.assertEqual([c.chapter_num for c in first], list(range(1, 11)))
+        self.assertFalse(first.has_previous())
+        self.assertEqual(first.count, 25)
+
+        second = paginator.page(first.next_cursor)
+        third = paginator.page(second.next_cursor)
+        self.assertEqual([c.chapter_num for c in third], list(range(21, 26)))
+        self.assertFalse(third.has_next())
+
+        back = paginator.page(third.previous_cursor)
+        self.assertEqual([c.chapter_num for c in back], list(range(11, 21)))
+        self.assertTrue(back.has_previous())
+        self.assertEqual([c.chapter_num for c in paginator.page(back.previous_cursor)], list(range(1, 11)))
+
+    def test_ties_on_leading_field_are_not_skipped(self):
+        Comic.objects.bulk_create([Comic(title=f'Tie {num}', slug=f'tie-{num}') for num in range(5)])
+        Comic.objects.update(created_at=self.comic.created_at)
+        paginator = CursorPaginator(Comic.objects.all(), 2, ('-created_at', '-id'))
+        seen, page = [], paginator.page()
+        while True:
+            seen += [comic.id for comic in page]
+            if not page.has_next():
+                break
+            page = paginator.page(page.next_cursor)
+        self.assertEqual(seen, sorted(Comic.objects.values_list('id', flat=True), reverse=True))
+
+    def test_tampered_cursor_is_rejected(self):
+        with self.assertRaises(InvalidCursor):
+            self.paginator().page('not-a-cursor')
+        response = self.client.get(reverse('reader:comic_list'), {'cursor': 'bogus'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_approximate_count_is_capped(self):
+        self.assertEqual(approximate_count(Chapter.objects.all(), cap=10), (10, False))
+        self.assertEqual(approximate_count(Chapter.objects.all(), cap=100), (25, True))
+
+
+class ChapterIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.comic = Comic.objects.create(title='Eleceed')
+        self.chapters = [Chapter.objects.create(comic=self.comic, chapter_num=num) for num in (1, 2, 5)]
+        Chapter.objects.create(comic=self.comic, chapter_num=3, active=False)
+
+    def index(self):
+        self.comic.refresh_from_db()
+        return get_chapter_index(self.comic)
+
+    def test_navigation(self):
+        index = self.index()
+        first, second, fifth = self.chapters
+        self.assertEqual([entry.chapter_num for entry in index], [1, 2, 5])
+        self.assertIsNone(index.previous(first.id))
+        self.assertEqual(index.next(second.id).slug, 'chapter-5')
+        self.assertEqual(index.previous(fifth.id).id, second.id)
+        self.assertIsNone(index.next(fifth.id))
+        self.assertEqual(index.find(5).id, fifth.id)
+        self.assertIsNone(index.find(3))
+
+    def test_index_is_cached_until_chapters_change(self):
+        self.index()
+        with self.assertNumQueries(1):
+            self.index()
+        Chapter.objects.create(comic=self.comic, chapter_num=6)
+        self.assertEqual(self.index().last().chapter_num, 6)
+
+    def test_chapters_are_numbered_in_sequence(self):
+        chapter = Chapter.objects.create(comic=self.comic)
+        self.assertEqual((chapter.chapter_num, chapter.slug), (6, 'chapter-6'))
+        other = Chapter.objects.create(comic=Comic.objects.create(title='Other'))
+        self.assertEqual(other.chapter_num, 1)
+
+    def test_chapter_page_navigation_and_jump(self):
+        url = reverse('reader:chapter_detail', args=[self.comic.slug, 'chapter-2'])
+        response = self.client.get(url)
+        self.assertContains(response, reverse('reader:chapter_detail', args=[self.comic.slug, 'chapter-1']))
+        self.assertContains(response, reverse('reader:chapter_detail', args=[self.comic.slug, 'chapter-5']))
+        self.assertNotContains(response, 'chapter-3')
+
+        jump = reverse('reader:jump_to_chapter', args=[self.comic.slug])
+        self.assertRedirects(self.client.get(jump, {'num': 5}), reverse('reader:chapter_detail', args=[self.comic.slug, 'chapter-5']))
+        self.assertEqual(self.client.get(jump, {'num': 3}).status_code, 404)
+
+
+def png_file(name='page.png', size=(8, 20)):
+    buffer = BytesIO()
+    PILImage.new('RGB', size, 'white').save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class PageManifestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.comic = Comic.objects.create(title='Lookism')
+        self.chapter = Chapter.objects.create(comic=self.comic, chapter_num=1)
+
+    def add_pages(self, chapter, count):
+        ChapterImage.objects.bulk_create([
+            ChapterImage(chapter=chapter, page_number=num, image=f'manhwa/chapters/p{num}', width=800, height=2000)
+            for num in range(1, count + 1)
+        ])
+        chapter.refresh_page_manifest()
+
+    def test_manifest_lists_pages_in_order(self):
+        self.add_pages(self.chapter, 3)
+        self.chapter.refresh_from_db()
+        self.assertEqual([page['page'] for page in self.chapter.page_manifest], [1, 2, 3])
+        self.assertIn('manhwa/chapters/p1', self.chapter.page_manifest[0]['url'])
+        self.assertEqual(self.chapter.page_manifest[0]['height'], 2000)
+
+    @override_settings(PAGE_CACHE_ENABLED=False)
+    def test_reader_page_does_no_per_image_queries(self):
+        small = Chapter.objects.create(comic=self.comic, chapter_num=2)
+        self.add_pages(small, 1)
+        self.add_pages(self.chapter, 40)
+        url = lambda chapter: reverse('reader:chapter_detail', args=[self.comic.slug, chapter.slug])
+        self.client.get(url(small))
+
+        with CaptureQueriesContext(connection) as small_queries:
+            self.client.get(url(small))
+        with CaptureQueriesContext(connection) as large_queries:
+            response = self.client.get(url(self.chapter))
+        self.assertEqual(len(large_queries), len(small_queries))
+        self.assertEqual(len(response.context['pages']), 40)
+
+    def test_manifest_endpoint_respects_paywall(self):
+        self.add_pages(self.chapter, 2)
+        response = self.client.get(reverse('reader:chapter_manifest', args=[self.chapter.pk]))
+        self.assertEqual(len(response.json()['pages']), 2)
+
+        Chapter.objects.filter(pk=self.chapter.pk).update(price=10)
+        response = self.client.get(reverse('reader:chapter_manifest', args=[self.chapter.pk]))
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('pages', response.json())
+
+    def test_prefetch_includes_next_chapter_head(self):
+        following = Chapter.objects.create(comic=self.comic, chapter_num=2)
+        self.add_pages(self.chapter, 2)
+        self.add_pages(following, 10)
+        data = self.client.get(reverse('reader:chapter_prefetch', args=[self.chapter.pk])).json()
+        self.assertEqual(len(data['pages']), 2)
+        self.assertEqual(data['next']['chapter'], following.pk)
+        self.assertEqual([page['page'] for page in data['next']['pages']], [1, 2, 3])
+
+        Chapter.objects.filter(pk=following.pk).update(price=10)
+        data = self.client.get(reverse('reader:chapter_prefetch', args=[self.chapter.pk])).json()
+        self.assertEqual((data['next']['status'], data['next']['pages']), ('locked', []))
+
+        last = self.client.get(reverse('reader:chapter_prefetch', args=[following.pk])).json()
+        self.assertIsNone(last['next'])
+
+    def test_reader_page_sends_preload_links(self):
+        following = Chapter.objects.create(comic=self.comic, chapter_num=2)
+        self.add_pages(self.chapter, 5)
+        response = self.client.get(reverse('reader:chapter_detail', args=[self.comic.slug, self.chapter.slug]))
+        links = response['Link'].split(', ')
+        self.assertEqual(len(links), 3)
+        self.assertIn('p1', links[0])
+        self.assertTrue(links[0].endswith('rel=preload; as=image'))
+        self.assertIn(f'{following.slug}/>; rel=prefetch', links[2])
+        self.assertContains(response, 'loading="eager" ', count=2)
+        self.assertContains(response, 'loading="lazy" decoding', count=3)
+
+    def test_dimensions_are_read_from_uploads(self):
+        image = ChapterImage(chapter=self.chapter)
+        upload = png_file(size=(8, 20))
+        image.read_dimensions(upload)
+        self.assertEqual((image.width, image.height, image.byte_size), (8, 20, upload.size))
+        self.assertEqual(upload.tell(), 0)
+
+
+class FailingPageStorage:
+    def save(self, path, name, folder=None):
+        raise OSError('storage is down')
+
+
+class FlakyPageStorage(FileSystemPageStorage):
+    """Stores every page but the third, and remembers deletes."""
+    deleted = []
+
+    def save(self, path, name, folder=None):
+        if os.path.basename(path).startswith('0003'):
+            raise OSError('storage is down')
+        return super().save(path, name, folder)
+
+    def delete(self, value):
+        FlakyPageStorage.deleted.append(value)
+        super().delete(value)
+
+
+class UploadTestCase(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        overrides = override_settings(
+            UPLOAD_JOBS_INLINE=True,
+            CHAPTER_PAGE_STORAGE='reader.uploads.FileSystemPageStorage',
+            MEDIA_ROOT=os.path.join(self.tmp, 'media'),
+            UPLOAD_SPOOL_DIR=os.path.join(self.tmp, 'spool'),
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = User.objects.create_user('uploader', password='pw')
+        self.client.force_login(self.user)
+        self.comic = Comic.objects.create(title='Windbreaker')
+        self.url = reverse('reader:upload_chapter_images', args=[self.comic.slug])
+
+
+class UploadPipelineTests(UploadTestCase):
+    def upload(self, files, **extra):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, {'chapter_num': 1, 'images': files}, **extra)
+
+    def test_pages_are_stored_in_order(self):
+        files = [png_file(f'{num:03d}.png', size=(10, 10 * num)) for num in range(1, 4)]
+        response = self.upload(files, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 202)
+
+        status = self.client.get(response.json()['status_url']).json()
+        self.assertEqual((status['status'], status['processed_pages'], status['total_pages']), ('completed', 3, 3))
+        self.assertIn('chapter_url', status)
+
+        chapter = Chapter.objects.get(comic=self.comic, chapter_num=1)
+        self.assertEqual([page['height'] for page in chapter.page_manifest], [10, 20, 30])
+        self.assertEqual(len(os.listdir(os.path.join(self.tmp, 'media', 'manhwa', 'chapters'))), 3)
+        self.assertEqual(os.listdir(os.path.join(self.tmp, 'spool')), [])
+
+    def test_first_pages_announce_the_chapter(self):
+        Bookmark.objects.create(comic=self.comic, creator=self.user)
+        self.upload([png_file('a.png')])
+        self.assertEqual(FeedItem.objects.filter(user=self.user).count(), 1)
+        FeedItem.objects.all().delete()
+        self.upload([png_file('b.png')])
+        self.assertFalse(FeedItem.objects.exists())
+
+    def test_reupload_replaces_pages(self):
+        self.upload([png_file('a.png'), png_file('b.png')])
+        response = self.upload([png_file('c.png')])
+        job = UploadJob.objects.latest('created_at')
+        self.assertRedirects(response, reverse('reader:upload_job_progress', args=[job.pk]))
+        self.assertEqual(ChapterImage.objects.filter(chapter__comic=self.comic).count(), 1)
+
+    @mock.patch('reader.uploads.UPLOAD_RETRY_DELAY', 0)
+    def test_failed_storage_leaves_chapter_untouched(self):
+        with override_settings(CHAPTER_PAGE_STORAGE='reader.tests.FailingPageStorage'), \
+                self.assertLogs('reader.uploads', level='WARNING') as logs:
+            self.upload([png_file()])
+        self.assertEqual(len(logs.records), 3)
+        job = UploadJob.objects.get()
+        self.assertEqual(job.status, UploadJob.STATUS.FAILED)
+        self.assertIn('storage is down', job.error)
+        self.assertFalse(ChapterImage.objects.exists())
+
+    @mock.patch('reader.uploads.UPLOAD_RETRY_DELAY', 0)
+    def test_failed_upload_deletes_the_pages_it_stored(self):
+        FlakyPageStorage.deleted = []
+        with override_settings(CHAPTER_PAGE_STORAGE='reader.tests.FlakyPageStorage'), \
+                self.assertLogs('reader.uploads', level='WARNING'):
+            self.upload([png_file('a.png'), png_file('b.png'), png_file('c.png')])
+        self.assertEqual(UploadJob.objects.get().status, UploadJob.STATUS.FAILED)
+        self.assertEqual(len([value for value in FlakyPageStorage.deleted if 'manhwa/chapters/' in value]), 2)
+        stored = [files for _, _, files in os.walk(os.path.join(self.tmp, 'media'))]
+        self.assertEqual(sum(stored, []), [])
+
+    def test_job_writes_move_updated_at(self):
+        chapter = Chapter.objects.create(comic=self.comic, chapter_num=1)
+        job = UploadJob.objects.create(chapter=chapter, user=self.user)
+        UploadJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        process_upload_job(job.pk, [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, UploadJob.STATUS.COMPLETED)
+        self.assertGreater(job.updated_at, timezone.now() - timedelta(minutes=1))
+
+
+class RecoverBackgroundWorkTests(UploadTestCase):
+    def setUp(self):
+        super().setUp()
+        self.chapter = Chapter.objects.create(comic=self.comic, chapter_num=1)
+        self.long_ago = timezone.now() - timedelta(hours=1)
+
+    def recover(self):
+        call_command('recover_background_work', '--timeout', 600, stdout=StringIO())
+
+    def test_stale_jobs_are_failed(self):
+        stale = UploadJob.objects.create(chapter=self.chapter, user=self.user, status=UploadJob.STATUS.RUNNING)
+        fresh = UploadJob.objects.create(chapter=self.chapter, user=self.user)
+        done = UploadJob.objects.create(chapter=self.chapter, user=self.user, status=UploadJob.STATUS.COMPLETED)
+        UploadJob.objects.filter(pk__in=[stale.pk, done.pk]).update(updated_at=self.long_ago)
+        self.recover()
+        statuses = dict(UploadJob.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[stale.pk], UploadJob.STATUS.FAILED)
+        self.assertEqual(statuses[fresh.pk], UploadJob.STATUS.PENDING)
+        self.assertEqual(statuses[done.pk], UploadJob.STATUS.COMPLETED)
+
+    def test_lost_fan_out_is_rerun(self):
+        Bookmark.objects.create(comic=self.comic, creator=self.user)
+        ChapterImage.objects.create(chapter=self.chapter, image='manhwa/chapters/page', page_number=1)
+        Chapter.objects.filter(pk=self.chapter.pk).update(updated_at=self.long_ago)
+        self.recover()
+        self.assertEqual(FeedItem.objects.filter(user=self.user, chapter=self.chapter).count(), 1)
+        self.chapter.refresh_from_db()
+        self.assertIsNotNone(self.chapter.announced_at)
+
+        FeedItem.objects.all().delete()
+        self.recover()
+        self.assertFalse(FeedItem.objects.exists())
+
+
+def cbz_file(path, names):
+    with zipfile.ZipFile(path, 'w') as archive:
+        for height, name in enumerate(names, start=1):
+            buffer = BytesIO()
+            PILImage.new('RGB', (10, height), 'white').save(buffer, format='PNG')
+            archive.writestr(name, buffer.getvalue())
+    return path
+
+
+class IngestTests(UploadTestCase):
+    def test_archive_pages_follow_natural_order(self):
+        source = cbz_file(
+            os.path.join(self.tmp, 'ch.cbz'),
+            ['p1.png', 'p2.png', 'p10.png', '__MACOSX/p3.png', 'notes.txt', 'sub/p3.png'],
+        )
+        paths = extract_archive_pages(source, os.path.join(self.tmp, 'out'))
+        self.assertEqual([os.path.basename(path) for path in paths], ['0001.png', '0002.png', '0003.png', '0004.png'])
+        self.assertEqual([PILImage.open(path).height for path in paths], [1, 2, 3, 6])
+
+    def test_rejects_bad_input(self):
+        with open(os.path.join(self.tmp, 'bad.zip'), 'wb') as f:
+            f.write(b'not a zip')
+        with self.assertRaises(IngestError):
+            extract_pages(f.name, os.path.join(self.tmp, 'out'))
+        with self.assertRaises(IngestError):
+            extract_pages(cbz_file(os.path.join(self.tmp, 'empty.zip'), ['readme.txt']), self.tmp)
+
+    @mock.patch('reader.ingest.COPY_CHUNK_BYTES', 100)
+    @mock.patch('reader.ingest.INGEST_MAX_PAGE_BYTES', 1000)
+    def test_pages_are_limited_by_the_bytes_they_inflate_to(self):
+        target = BytesIO()
+        with self.assertRaisesMessage(IngestError, 'p1.png is larger than 1000 bytes'):
+            copy_entry(BytesIO(b'x' * 1001), target, 'p1.png', 10000)
+        self.assertEqual(len(target.getvalue()), 1000)
+        with self.assertRaisesMessage(IngestError, 'The archive unpacks to more than'):
+            copy_entry(BytesIO(b'x' * 500), BytesIO(), 'p2.png', 400)
+
+    def test_archive_total_is_limited(self):
+        source = cbz_file(os.path.join(self.tmp, 'ch.cbz'), ['p1.png', 'p2.png', 'p3.png'])
+        with zipfile.ZipFile(source) as archive:
+            sizes = [info.file_size for info in archive.infolist()]
+        with mock.patch('reader.ingest.INGEST_MAX_ARCHIVE_BYTES', sum(sizes) - 1), \
+                self.assertRaisesMessage(IngestError, 'The archive unpacks to more than'):
+            extract_archive_pages(source, os.path.join(self.tmp, 'out'))
+
+    def test_upload_view_ingests_archive_in_background(self):
+        with open(cbz_file(os.path.join(self.tmp, 'ch.cbz'), ['b2.png', 'b1.png']), 'rb') as f:
+            archive = SimpleUploadedFile('ch.cbz', f.read(), content_type='application/zip')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, {'chapter_num': 3, 'archive': archive}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 202)
+        job = UploadJob.objects.get()
+        self.assertEqual((job.status, job.source, job.total_pages, job.processed_pages), ('completed', 'ch.cbz', 2, 2))
+        chapter = Chapter.objects.get(comic=self.comic, chapter_num=3)
+        self.assertEqual([page['height'] for page in chapter.page_manifest], [2, 1])
+        self.assertEqual(os.listdir(os.path.join(self.tmp, 'spool')), [])
+
+    def test_management_command(self):
+        source = cbz_file(os.path.join(self.tmp, 'ch.zip'), ['1.png', '2.png', '3.png'])
+        call_command('ingest_chapter', self.comic.slug, source, stdout=StringIO())
+        chapter = Chapter.objects.get(comic=self.comic)
+        self.assertEqual(chapter.chapter_images.count(), 3)
+
+    @skipUnless(shutil.which('pdftoppm'), 'poppler is not installed')
+    def test_pdf_is_rasterized_page_by_page(self):
+        source = os.path.join(self.tmp, 'ch.pdf')
+        pages = [PILImage.new('RGB', (100, 100 * num), 'white') for num in range(1, 4)]
+        pages[0].save(source, save_all=True, append_images=pages[1:], resolution=72)
+        paths = extract_pages(source, os.path.join(self.tmp, 'out'), workers=2)
+        self.assertEqual([os.path.basename(path) for path in paths], ['0001.jpg', '0002.jpg', '0003.jpg'])
+        heights = [PILImage.open(path).height for path in paths]
+        self.assertEqual(heights, sorted(heights))
+
+
+@mock.patch('reader.derivatives.DERIVATIVE_WIDTHS', (16, 32))
+@mock.patch('reader.derivatives.TILE_HEIGHT', 100)
+class DerivativeTests(UploadTestCase):
+    def test_tall_strips_are_tiled_at_every_width(self):
+        source = os.path.join(self.tmp, 'strip.png')
+        PILImage.new('RGB', (40, 250), 'white').save(source)
+        rendered = render_derivatives(source, os.path.join(self.tmp, 'out'), 'strip')
+        self.assertEqual(len(rendered), 3 * 2 * len(DERIVATIVE_FORMATS))
+        self.assertEqual(
+            sorted({(item['tile'], item['width'], item['height']) for item in rendered}),
+            [(0, 16, 40), (0, 32, 80), (1, 16, 40), (1, 32, 80), (2, 16, 20), (2, 32, 40)],
+        )
+
+    def test_narrow_images_are_not_upscaled(self):
+        source = os.path.join(self.tmp, 'small.png')
+        PILImage.new('RGB', (20, 20), 'white').save(source)
+        widths = {item['width'] for item in render_derivatives(source, os.path.join(self.tmp, 'out'), 'small')}
+        self.assertEqual(widths, {16, 20})
+
+    def test_uploaded_pages_get_srcset(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, {'chapter_num': 1, 'images': [png_file('a.png', size=(40, 150))]})
+        chapter = Chapter.objects.get(comic=self.comic)
+        self.assertEqual(ImageDerivative.objects.filter(chapter_image__chapter=chapter).count(), 2 * 2 * len(DERIVATIVE_FORMATS))
+        tiles = chapter.page_manifest[0]['tiles']
+        self.assertEqual(len(tiles), 2)
+        self.assertEqual(tiles[0]['sources'][-1]['type'], 'image/webp')
+        self.assertEqual(tiles[0]['width'], 32)
+
+        response = self.client.get(reverse('reader:chapter_detail', args=[self.comic.slug, chapter.slug]))
+        self.assertContains(response, '<picture>', count=2)
+        self.assertContains(response, 'srcset=')
+
+    def test_cover_renditions(self):
+        storage = FileSystemPageStorage()
+        cover = os.path.join(self.tmp, 'cover.png')
+        PILImage.new('RGB', (64, 96), 'white').save(cover)
+        self.comic.thumbnail = storage.save(cover, 'cover.png', folder='manhwa/thumbnails/')
+        self.comic.save()
+
+        rebuild_comic_derivatives(storage, Comic.objects.get(pk=self.comic.pk))
+        rendition = Comic.objects.get(pk=self.comic.pk).thumbnail_rendition
+        self.assertEqual((rendition['width'], rendition['height']), (32, 48))
+        response = self.client.get(reverse('reader:comic_list'))
+        self.assertContains(response, rendition['src'])
+
+
+class EntitlementTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reader', password='pw')
+        self.comic = Comic.objects.create(title='Nano Machine')
+        self.chapters = [Chapter.objects.create(comic=self.comic, chapter_num=num, price=5) for num in range(1, 4)]
+
+    def test_grant_unlocks_and_invalidates_cached_set(self):
+        chapter = self.chapters[0]
+        self.assertFalse(user_has_access(self.user, chapter))
+        entitlement, created = grant_chapter(self.user, chapter, price=5)
+        self.assertTrue(created)
+        self.assertTrue(user_has_access(self.user, chapter))
+        self.assertFalse(grant_chapter(self.user, chapter)[1])
+
+        entitlement.delete()
+        self.assertFalse(user_has_access(self.user, chapter))
+
+    def test_access_for_a_whole_comic_is_one_lookup(self):
+        grant_chapter(self.user, self.chapters[1])
+        with self.assertNumQueries(1):
+            self.assertEqual(entitled_chapter_ids(self.user, self.comic.pk), {self.chapters[1].pk})
+            self.assertEqual([user_has_access(self.user, chapter) for chapter in self.chapters], [False, True, False])
+
+    def test_chapter_list_shows_lock_state(self):
+        grant_chapter(self.user, self.chapters[0])
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('reader:comic_detail', args=[self.comic.slug]))
+        self.assertEqual(response.context['unlocked_chapter_ids'], {self.chapters[0].pk})
+        self.assertContains(response, 'Unlocked', count=1)
+        self.assertContains(response, '🔒 5 coins', count=2)
+
+    def test_reader_page_serves_unlocked_chapter(self):
+        chapter = self.chapters[2]
+        url = reverse('reader:chapter_detail', args=[self.comic.slug, chapter.slug])
+        self.client.force_login(self.user)
+        self.assertFalse(self.client.get(url).context['user_has_access'])
+        grant_chapter(self.user, chapter)
+        self.assertTrue(self.client.get(url).context['user_has_access'])
+
+
+class CoinLedgerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('spender', password='pw')
+        self.comic = Comic.objects.create(title='Solo Leveling')
+        self.chapter = Chapter.objects.create(comic=self.comic, chapter_num=1, price=30)
+
+    def test_purchase_debits_and_grants_atomically(self):
+        credit(self.user, 50)
+        self.assertEqual(get_balance(self.user), 50)
+        entry = purchase_chapter(self.user, self.chapter)
+        self.assertEqual((entry.amount, entry.balance_after), (-30, 20))
+        self.assertEqual(get_balance(self.user), 20)
+        self.assertTrue(ChapterEntitlement.objects.filter(user=self.user, chapter=self.chapter).exists())
+
+        with self.assertRaises(AlreadyOwned):
+            purchase_chapter(self.user, self.chapter)
+        self.assertEqual(CoinWallet.objects.get(user=self.user).balance, 20)
+
+    def test_insufficient_balance_changes_nothing(self):
+        credit(self.user, 10)
+        with self.assertRaises(InsufficientCoins):
+            purchase_chapter(self.user, self.chapter)
+        self.assertEqual(get_balance(self.user), 10)
+        self.assertFalse(ChapterEntitlement.objects.exists())
+        self.assertEqual(CoinTransaction.objects.count(), 1)
+
+    def test_idempotency_key_applies_once(self):
+        first, created = credit(self.user, 100, idempotency_key='abc')
+        again, created_again = credit(self.user, 100, idempotency_key='abc')
+        self.assertEqual((first.pk, created, created_again), (again.pk, True, False))
+        self.assertEqual(get_balance(self.user), 100)
+
+    def test_reused_idempotency_key_must_match(self):
+        credit(self.user, 100, idempotency_key='abc')
+        with self.assertRaises(IdempotencyKeyReused):
+            credit(self.user, 50, idempotency_key='abc')
+        with self.assertRaises(IdempotencyKeyReused):
+            purchase_chapter(self.user, self.chapter, idempotency_key='abc')
+        self.assertEqual(get_balance(self.user), 100)
+        self.assertFalse(ChapterEntitlement.objects.exists())
+
+    def test_ledger_is_append_only(self):
+        entry, _ = credit(self.user, 5)
+        with self.assertRaises(ValueError):
+            entry.save()
+        with self.assertRaises(ValueError):
+            entry.delete()
+
+    def test_buy_chapter_view_with_retried_request(self):
+        credit(self.user, 100)
+        self.client.force_login(self.user)
+        url = reverse('reader:buy_chapter', args=[self.chapter.pk])
+        response = self.client.post(url, HTTP_IDEMPOTENCY_KEY='k1').json()
+        self.assertEqual((response['success'], response['remaining_coins']), (True, 70))
+        response = self.client.post(url, HTTP_IDEMPOTENCY_KEY='k1').json()
+        self.assertEqual((response['success'], response['remaining_coins']), (True, 70))
+        self.assertFalse(self.client.post(url, HTTP_IDEMPOTENCY_KEY='k2').json()['success'])
+        other = Chapter.objects.create(comic=self.comic, chapter_num=2, price=30)
+        response = self.client.post(reverse('reader:buy_chapter', args=[other.pk]), HTTP_IDEMPOTENCY_KEY='k1')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(get_balance(self.user), 70)
+        page = self.client.get(reverse('reader:chapter_detail', args=[self.comic.slug, self.chapter.slug]))
+        self.assertTrue(page.context['user_has_access'])
+        self.assertContains(page, 'spender (70 coins)')
+
+
+@override_settings(UPLOAD_JOBS_INLINE=True)
+class CoinConcurrencyTests(TransactionTestCase):
+    """
+    Hammers one wallet from many threads. SQLite's in-memory test database
+    rejects overlapping writers with "table is locked"; those requests must
+    roll back cleanly and are retried. Either way the books must balance.
+    """
+
+    def test_concurrent_purchases_keep_exact_balances(self):
+        user = User.objects.create_user('hammer')
+        comic = Comic.objects.create(title='Omniscient Reader')
+        chapters = [Chapter.objects.create(comic=comic, chapter_num=num, price=3) for num in range(1, 21)]
+        credit(user, 30)
+        errors, lock = [], threading.Lock()
+
+        def retrying(call, *args, **kwargs):
+            # Clients retry failed requests; both calls are safe to repeat.
+            for _ in range(100):
+                try:
+                    return call(*args, **kwargs)
+                except OperationalError as e:
+                    error = e
+                    time.sleep(0.002)
+            with lock:
+                errors.append(error)
+
+        def worker(offset):
+            try:
+                for index in range(len(chapters)):
+                    chapter = chapters[(index + offset) % len(chapters)]
+                    try:
+                        retrying(purchase_chapter, user, chapter)
+                        retrying(credit, user, 1, idempotency_key=f'bonus-{index % 10}')
+                    except (AlreadyOwned, InsufficientCoins):
+                        pass
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(offset * 3,)) for offset in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if connection.vendor == 'postgresql':
+            self.assertEqual(errors, [])
+        owned = ChapterEntitlement.objects.filter(user=user).count()
+        bonuses = CoinTransaction.objects.filter(user=user, kind=CoinTransaction.KIND.GRANT, idempotency_key__isnull=False).count()
+        balance = CoinWallet.objects.get(user=user).balance
+        self.assertLessEqual(bonuses, 10)
+        self.assertEqual(balance, 30 + bonuses - 3 * owned)
+        self.assertGreaterEqual(balance, 0)
+        self.assertEqual(CoinTransaction.objects.filter(user=user, kind=CoinTransaction.KIND.CHAPTER_PURCHASE).count(), owned)
+        self.assertEqual(sum(CoinTransaction.objects.filter(user=user).values_list('amount', flat=True)), balance)
+
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        page_cache.clear()
+        self.user = User.objects.create_user('visitor', password='pw')
+        self.comic = Comic.objects.create(title='Omniscient Reader')
+        self.chapter = Chapter.objects.create(comic=self.comic, chapter_num=1)
+        self.detail_url = reverse('reader:comic_detail', args=[self.comic.slug])
+
+    def test_anonymous_pages_are_served_from_cache(self):
+        self.assertEqual(self.client.get(self.detail_url)['X-Page-Cache'], 'miss')
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertContains(response, 'Omniscient Reader')
+        self.assertIn('csrftoken', response.cookies)
+
+    def test_only_known_query_parameters_are_cached(self):
+        listing_url = reverse('reader:comic_list')
+        self.assertEqual(self.client.get(listing_url, {'cursor': ''})['X-Page-Cache'], 'miss')
+        self.assertEqual(self.client.get(listing_url, {'cursor': ''})['X-Page-Cache'], 'hit')
+        self.assertEqual(self.client.get(self.detail_url, {'comments_cursor': ''})['X-Page-Cache'], 'miss')
+        for query in ({'utm_source': 'x'}, {'cursor': ['', '']}, {'cursor': '', 'junk': '1'}):
+            self.assertNotIn('X-Page-Cache', self.client.get(listing_url, query))
+        self.assertNotIn('X-Page-Cache', self.client.get(self.detail_url, {'cursor': ''}))
+        self.assertEqual(len(page_cache._cache), 2)
+        self.assertEqual(self.client.get(f'{listing_url}?cursor=&sort=').status_code, 200)
+        self.assertEqual(self.client.get(f'{listing_url}?sort=&cursor=')['X-Page-Cache'], 'hit')
+
+    def test_changes_invalidate_dependent_pages(self):
+        listing_url = reverse('reader:comic_list')
+        self.client.get(self.detail_url)
+        self.client.get(listing_url)
+
+        Comment.objects.create(comic=self.comic, creator=self.user, content='Kim Dokja!')
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Kim Dokja!')
+        self.assertEqual(self.client.get(listing_url)['X-Page-Cache'], 'hit')
+
+        Chapter.objects.create(comic=self.comic, chapter_num=2)
+        self.assertEqual(self.client.get(self.detail_url)['X-Page-Cache'], 'miss')
+
+        self.comic.title = 'Omniscient Reader Viewpoint'
+        self.comic.save()
+        self.assertContains(self.client.get(listing_url), 'Omniscient Reader Viewpoint')
+
+    def test_signed_in_users_bypass_cache(self):
+        self.client.get(self.detail_url)
+        self.client.force_login(self.user)
+        response = self.client.get(self.detail_url)
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+    def test_cached_reader_page_still_counts_views(self):
+        url = reverse('reader:chapter_detail', args=[self.comic.slug, self.chapter.slug])
+        with mock.patch.object(chapter_views, 'record') as record:
+            self.assertEqual(self.client.get(url)['X-Page-Cache'], 'miss')
+            self.assertEqual(self.client.get(url)['X-Page-Cache'], 'hit')
+        self.assertEqual(record.call_count, 2)
+        record.assert_called_with(self.chapter.id)
+
+
+@override_settings(PAGE_CACHE_ENABLED=False)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('revisitor', password='pw')
+        self.comic = Comic.objects.create(title='Tower of God')
+        self.chapter = Chapter.objects.create(comic=self.comic, chapter_num=1)
+        self.detail_url = reverse('reader:comic_detail', args=[self.comic.slug])
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_page_is_not_rendered_again(self):
+        response = self.client.get(self.detail_url)
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        self.assertIn('Last-Modified', response)
+        self.assertIn('public', response['Cache-Control'])
+        with self.assertNumQueries(1):
+            not_modified = self.revalidate(self.detail_url, response)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        since = self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(since.status_code, 304)
+
+    def test_child_changes_change_the_etag(self):
+        response = self.client.get(self.detail_url)
+        comment = Comment.objects.create(comic=self.comic, creator=self.user, content='Bam!')
+        response = self.revalidate(self.detail_url, response)
+        self.assertContains(response, 'Bam!')
+        comment.delete()
+        self.assertEqual(self.revalidate(self.detail_url, response).status_code, 200)
+
+        listing_url = reverse('reader:comic_list')
+        response = self.client.get(listing_url)
+        self.comic.categories.add(Category.objects.create(name='Fantasy'))
+        self.assertContains(self.revalidate(listing_url, response), 'Fantasy')
+
+    def test_engagement_leaves_chapter_pages_alone(self):
+        chapter_url = reverse('reader:chapter_detail', args=[self.comic.slug, self.chapter.slug])
+        chapter_response = self.client.get(chapter_url)
+        detail_response = self.client.get(self.detail_url)
+        updated_at = Comic.objects.values_list('updated_at', flat=True).get(pk=self.comic.pk)
+
+        bookmark = Bookmark.objects.create(comic=self.comic, creator=self.user)
+        bookmark.delete()
+        Comment.objects.create(comic=self.comic, creator=self.user, content='Bam!').delete()
+        Rating.objects.create(comic=self.comic, creator=self.user, rate=5).delete()
+
+        self.assertEqual(Comic.objects.values_list('updated_at', flat=True).get(pk=self.comic.pk), updated_at)
+        self.assertEqual(self.revalidate(chapter_url, chapter_response).status_code, 304)
+        self.assertEqual(self.revalidate(self.detail_url, detail_response).status_code, 200)
+
+    def test_deleted_comic_changes_listing_etag(self):
+        Comic.objects.create(title='Noblesse')
+        listing_url = reverse('reader:comic_list')
+        response = self.client.get(listing_url)
+        self.comic.delete()
+        self.assertNotContains(self.revalidate(listing_url, response), 'Tower of God')
+
+    def test_per_user_pages_are_private(self):
+        self.client.force_login(self.user)
+        response = self.client.get(self.detail_url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('Last-Modified', response)
+        self.assertEqual(self.revalidate(self.detail_url, response).status_code, 304)
+        credit(self.user, 50)
+        self.assertEqual(self.revalidate(self.detail_url, response).status_code, 200)
+
+    def test_not_modified_reader_page_counts_view(self):
+        url = reverse('reader:chapter_detail', args=[self.comic.slug, self.chapter.slug])
+        response = self.client.get(url)
+        with mock.patch.object(chapter_views, 'record') as record:
+            self.assertEqual(self.revalidate(url, response).status_code, 304)
+        record.assert_called_once_with(self.chapter.id)
+
+    def test_json_endpoints(self):
+        url = reverse('reader:chapter_manifest', args=[self.chapter.pk])
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+        ChapterImage.objects.create(chapter=self.chapter, page_number=1, image='manhwa/chapters/p1')
+        self.chapter.refresh_page_manifest()
+        self.assertEqual(len(self.revalidate(url, response).json()['pages']), 1)
+
+        url = reverse('reader:comic_autocomplete') + '?q=tow'
+        response = self.client.get(url)
+        self.assertIn('max-age=60', response['Cache-Control'])
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+
+class PageCacheConditionalTests(TestCase):
+    def test_cached_page_answers_not_modified(self):
+        cache.clear()
+        comic = Comic.objects.create(title='The Breaker')
+        url = reverse('reader:comic_detail', args=[comic.slug])
+        response = self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'hit')
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+class ComicCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        buffer_cache.clear()
+        self.user = User.objects.create_user('counter', password='pw')
+        self.comic = Comic.objects.create(title='The God of High School')
+
+    def counters(self):
+        self.comic.refresh_from_db()
+        return (
+            self.comic.bookmark_count, self.comic.rating_count, self.comic.rating_sum,
+            self.comic.comment_count, self.comic.chapter_count, self.comic.total_views,
+        )
+
+    def test_write_paths_keep_counters(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('reader:bookmark_toggle', args=[self.comic.slug]))
+        self.client.post(reverse('reader:rate_comic', args=[self.comic.slug]), {'rating': 4})
+        self.client.post(reverse('reader:rate_comic', args=[self.comic.slug]), {'rating': 3})
+        self.client.post(reverse('reader:add_comment', args=[self.comic.slug]), {'content': 'Jin Mo-Ri!'})
+        comment = Comment.objects.get()
+        self.client.post(reverse('reader:reply_comment', args=[comment.pk]), {'content': 'Yes'})
+        chapter = Chapter.objects.create(comic=self.comic, chapter_num=1)
+        Chapter.objects.create(comic=self.comic, chapter_num=2, active=False)
+        buffer = ChapterViewBuffer(flush_interval=3600, flush_threshold=1000)
+        buffer.record(chapter.id, count=7)
+        buffer.flush()
+        self.assertEqual(self.counters(), (1, 1, 3, 2, 1, 7))
+
+        self.client.post(reverse('reader:bookmark_toggle', args=[self.comic.slug]))
+        comment.delete()
+        Rating.objects.all().delete()
+        self.assertEqual(self.counters(), (0, 0, 0, 0, 1, 7))
+        chapter.delete()
+        self.assertEqual(self.counters(), (0, 0, 0, 0, 0, 0))
+        self.assertEqual(find_drift([self.comic.pk]), {})
+
+    def test_ratings_are_counted_wherever_they_are_saved(self):
+        rating = Rating.objects.create(comic=self.comic, creator=self.user, rate=4)
+        rating.rate = 2
+        rating.save()
+        rating.save()
+        self.assertEqual(self.counters()[1:3], (1, 2))
+        self.assertIsNotNone(self.comic.engaged_at)
+
+    def test_one_rating_and_bookmark_per_user(self):
+        Rating.objects.create(comic=self.comic, creator=self.user, rate=4)
+        Bookmark.objects.create(comic=self.comic, creator=self.user)
+        for model, fields in ((Rating, {'rate': 1}), (Bookmark, {})):
+            with self.subTest(model=model.__name__), self.assertRaises(IntegrityError), transaction.atomic():
+                model.objects.create(comic=self.comic, creator=self.user, **fields)
+
+    def test_reconcile_reports_and_repairs_drift(self):
+        Bookmark.objects.create(comic=self.comic, creator=self.user)
+        Comic.objects.filter(pk=self.comic.pk).update(bookmark_count=5, comment_count=2)
+        out = StringIO()
+        call_command('reconcile_comic_counters', '--dry-run', stdout=out)
+        self.assertIn(f'Comic {self.comic.pk}: bookmark_count 5 -> 1, comment_count 2 -> 0', out.getvalue())
+        self.assertEqual(self.counters()[0], 5)
+
+        call_command('reconcile_comic_counters', stdout=StringIO())
+        self.assertEqual(self.counters(), (1, 0, 0, 0, 0, 0))
+        self.assertEqual(find_drift([self.comic.pk]), {})
+
+
+def full_scans(sql):
+    """Tables ``sql`` reads with a full table scan, according to the database's EXPLAIN."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}')
+        plan = '\n'.join(str(row[-1]) for row in cursor.fetchall())
+    # SQLite: "SCAN table" (but not "SCAN table USING INDEX ..."); PostgreSQL: "Seq Scan on table".
+    scanned = set(re.findall(r'\bSCAN (\w+)$', plan, re.M)) | set(re.findall(r'Seq Scan on (\w+)', plan))
+    # Scans of a subquery's own (already bounded) result are fine.
+    return scanned & set(connection.introspection.table_names())
+
+
+@override_settings(PAGE_CACHE_ENABLED=False)
+class QueryPlanTests(TestCase):
+    """
+    Every query behind the hot reader views must be answered from an index
+    on a dataset big enough for the planner to care.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create([User(username=f'plan-{num}', password='!') for num in range(300)])
+        cls.user = users[0]
+        comics = Comic.objects.bulk_create([
+            Comic(title=f'Plan {num}', slug=f'plan-{num}', rating_count=1, rating_sum=3) for num in range(600)
+        ])
+        cls.comic = comics[0]
+        categories = Category.objects.bulk_create([Category(name=f'Seeded {num}') for num in range(60)])
+        Comic.categories.through.objects.bulk_create([
+            Comic.categories.through(comic=comic, category=categories[(num + offset) % 60])
+            for num, comic in enumerate(comics) for offset in (0, 7)
+        ])
+        chapters = Chapter.objects.bulk_create(
+            [Chapter(comic=cls.comic, chapter_num=num, slug=f'chapter-{num}', price=num % 3) for num in range(1, 301)]
+            + [Chapter(comic=comic, chapter_num=1, slug='chapter-1') for comic in comics[1:]]
+        )
+        cls.chapter = chapters[149]
+        ChapterView.objects.bulk_create([ChapterView(chapter=chapter, views=3) for chapter in chapters])
+        ChapterImage.objects.bulk_create([
+            ChapterImage(chapter=chapter, page_number=page, image='manhwa/chapters/page')
+            for chapter in chapters[:300] for page in range(1, 6)
+        ])
+        comments = Comment.objects.bulk_create([
+            Comment(comic=comics[num % 20], creator=users[num % 300], content='seeded') for num in range(3000)
+        ])
+        replies = Comment.objects.bulk_create([
+            Comment(comic=comment.comic, creator=cls.user, content='reply', reply_to=comment) for comment in comments[:600]
+        ])
+        # bulk_create skips Comment.save(), which places comments in their thread.
+        for comment in comments + replies:
+            comment.place()
+        Rating.objects.bulk_create([
+            Rating(comic=comics[num % 50], creator=user, rate=3) for num, user in enumerate(users) for _ in range(1)
+        ] + [Rating(comic=comic, creator=users[1], rate=4) for comic in comics[50:]])
+        Bookmark.objects.bulk_create(
+            [Bookmark(comic=comics[num % 50], creator=user) for num, user in enumerate(users)]
+            + [Bookmark(comic=comic, creator=users[2]) for comic in comics[50:]]
+        )
+        ChapterEntitlement.objects.bulk_create([
+            ChapterEntitlement(user=user, chapter=cls.chapter, comic=cls.comic) for user in users
+        ])
+        ReadingProgress.objects.bulk_create([
+            ReadingProgress(user=user, comic=chapter.comic, chapter=chapter)
+            for num, user in enumerate(users) for chapter in chapters[300 + num:305 + num]
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        cache.clear()
+
+    def assert_indexed(self, url, method='get', data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data or {})
+        self.assertLess(response.status_code, 400, url)
+        for query in queries.captured_queries:
+            if query['sql'].startswith('SELECT'):
+                scans = full_scans(query['sql'])
+                self.assertFalse(scans, f'{method.upper()} {url} scans {sorted(scans)}:\n{query["sql"]}')
+
+    def test_public_views_use_indexes(self):
+        chapter_url = reverse('reader:chapter_detail', args=[self.comic.slug, self.chapter.slug])
+        for url in (
+            reverse('reader:comic_list'),
+            reverse('reader:latest_comics'),
+            reverse('reader:popular_comics'),
+            reverse('reader:comic_detail', args=[self.comic.slug]),
+            chapter_url,
+            reverse('reader:chapter_manifest', args=[self.chapter.pk]),
+            reverse('reader:chapter_prefetch', args=[self.chapter.pk]),
+        ):
+            with self.subTest(url=url):
+                self.assert_indexed(url)
+
+    def test_signed_in_views_use_indexes(self):
+        self.client.force_login(self.user)
+        self.assert_indexed(reverse('reader:comic_detail', args=[self.comic.slug]))
+        self.assert_indexed(reverse('reader:chapter_detail', args=[self.comic.slug, self.chapter.slug]))
+        self.assert_indexed(reverse('reader:bookmarks'))
+        self.assert_indexed(reverse('reader:profile'))
+        self.assert_indexed(reverse('reader:library'), data={'sort': 'read'})
+        self.assert_indexed(reverse('reader:bookmark_toggle', args=[self.comic.slug]), method='post')
+        self.assert_indexed(reverse('reader:rate_comic', args=[self.comic.slug]), method='post', data={'rating': 5})
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        request_metrics.flush()
+        cache.clear()
+        buffer_cache.clear()
+        self.comic = Comic.objects.create(title='Eleceed')
+
+    def test_request_is_timed_and_logged(self):
+        url = reverse('reader:comic_detail', args=[self.comic.slug])
+        with self.assertLogs('reader.requests', 'INFO') as logs, CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((line['view'], line['status'], line['cache']), ('reader:comic_detail', 200, 'miss'))
+        self.assertEqual(line['queries'], len(queries))
+        self.assertGreater(line['template_ms'], 0)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, app;dur=[\d.]+$')
+
+    def test_repeated_statements_are_reported(self):
+        metrics = RequestMetrics()
+        for num in range(1, 6):
+            metrics.add_query('SELECT * FROM t WHERE id IN (%s' + ', %s' * num + ')', 0.001)
+        metrics.add_query('SELECT 1', 0.001)
+        self.assertEqual(metrics.duplicate_queries, 4)
+        self.assertEqual(metrics.repeated(), {'SELECT * FROM t WHERE id IN (%s...)': 5})
+
+    def test_percentiles_come_from_buckets(self):
+        buckets = [0, 50, 45, 0, 0, 0, 0, 0, 0, 4, 0, 1]
+        self.assertEqual((percentile(buckets, 0.5), percentile(buckets, 0.95)), (10, 25))
+        self.assertEqual(percentile(buckets, 0.99), 5000)
+        self.assertIsNone(percentile(buckets, 1))
+
+    def test_histogram_endpoint_is_staff_only(self):
+        url = reverse('request_metrics')
+        self.client.force_login(User.objects.create_user('reader', password='pw'))
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(User.objects.create_user('admin', password='pw', is_staff=True))
+        for _ in range(3):
+            self.client.get(reverse('reader:comic_detail', args=[self.comic.slug]))
+        stats = self.client.get(url).json()['views']['reader:comic_detail']
+        self.assertEqual(stats['requests'], 3)
+        self.assertEqual(sum(stats['histogram'].values()), 3)
+        self.client.post(url)
+        self.assertNotIn('reader:comic_detail', self.client.get(url).json()['views'])
+
+
+class SeedCatalogTests(TestCase):
+    def test_seeded_catalog_is_consistent_and_clears(self):
+        created = seed_catalog(
+            comics=3, chapters_per_comic=4, pages_per_chapter=2, users=5, ratings_per_user=2,
+            bookmarks_per_user=2, comments_per_comic=2, replies_per_comment=1, categories=2, paid_after=3,
+        )
+        self.assertEqual((created['chapters'], created['pages'], created['comments']), (12, 24, 12))
+        comics = Comic.objects.filter(slug__startswith='seed-')
+        self.assertEqual(find_drift(list(comics.values_list('pk', flat=True))), {})
+        self.assertEqual(Chapter.objects.filter(comic__in=comics, price__gt=0).count(), 3)
+        self.assertFalse(Comment.objects.filter(path='').exists())
+        roots = Comment.objects.filter(reply_to=None)
+        self.assertEqual(len(thread_replies([root.pk for root in roots])), 6)
+
+        clear_catalog()
+        self.assertFalse(comics.exists())
+        self.assertFalse(ChapterImage.objects.exists())
+        self.assertFalse(User.objects.filter(username__startswith='seed-user-').exists())
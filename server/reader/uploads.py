@@ -0,0 +1,252 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from cloudinary.models import CloudinaryField
+
+from .derivatives import build_derivatives
+from .models import ChapterImage, ImageDerivative, UploadJob
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_WORKERS = getattr(settings, 'UPLOAD_WORKERS', 6)
+UPLOAD_RETRIES = getattr(settings, 'UPLOAD_RETRIES', 3)
+UPLOAD_RETRY_DELAY = getattr(settings, 'UPLOAD_RETRY_DELAY', 0.5)
+# A pending or running job not heard from for this long died with its process.
+UPLOAD_JOB_TIMEOUT = getattr(settings, 'UPLOAD_JOB_TIMEOUT', 30 * 60)
+DERIVATIVES_FOLDER = 'manhwa/derivatives/'
+
+
+class CloudinaryPageStorage:
+    """Uploads pages to Cloudinary and returns the CloudinaryField value for them."""
+    folder = 'manhwa/chapters/'
+
+    def save(self, path, name, folder=None):
+        import cloudinary.uploader
+
+        result = cloudinary.uploader.upload(path, folder=folder or self.folder, resource_type='image')
+        return (
+            f"{result['resource_type']}/{result['type']}/v{result['version']}/"
+            f"{result['public_id']}.{result['format']}"
+        )
+
+    def url(self, value):
+        return CloudinaryField().to_python(value).url
+
+    def delete(self, value):
+        import cloudinary.uploader
+
+        cloudinary.uploader.destroy(CloudinaryField().to_python(value).public_id, resource_type='image')
+
+    def open(self, resource):
+        return urlopen(resource.url, timeout=30)
+
+
+class FileSystemPageStorage:
+    """Local stand-in for CloudinaryPageStorage, used in development and tests."""
+    folder = 'manhwa/chapters/'
+
+    def __init__(self, location=None):
+        self.storage = FileSystemStorage(location=location)
+
+    def save(self, path, name, folder=None):
+        with open(path, 'rb') as source:
+            return self.storage.save(os.path.join(folder or self.folder, name), source)
+
+    def url(self, value):
+        return self.storage.url(value)
+
+    def delete(self, value):
+        self.storage.delete(value)
+
+    def open(self, resource):
+        return self.storage.open(f'{resource.public_id}.{resource.format}')
+
+
+def spool_dir(job):
+    root = getattr(settings, 'UPLOAD_SPOOL_DIR', None) or os.path.join(tempfile.gettempdir(), 'manhwa-uploads')
+    return os.path.join(root, str(job.pk))
+
+
+def get_page_storage():
+    return import_string(getattr(settings, 'CHAPTER_PAGE_STORAGE', 'reader.uploads.CloudinaryPageStorage'))()
+
+
+def spool(job, files):
+    """Copy uploaded files to the job's spool directory, in page order."""
+    directory = spool_dir(job)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for page_number, upload in enumerate(files, start=1):
+        extension = os.path.splitext(upload.name)[1].lower() or '.img'
+        path = os.path.join(directory, f'{page_number:04d}{extension}')
+        with open(path, 'wb') as target:
+            for chunk in upload.chunks():
+                target.write(chunk)
+        paths.append(path)
+    return paths
+
+
+def store_with_retry(storage, path, name, folder=None):
+    for attempt in range(UPLOAD_RETRIES):
+        try:
+            return storage.save(path, name, folder=folder)
+        except Exception:
+            if attempt + 1 == UPLOAD_RETRIES:
+                raise
+            logger.warning('Storing %s failed, retrying (attempt %d)', name, attempt + 1, exc_info=True)
+            time.sleep(UPLOAD_RETRY_DELAY * 2 ** attempt)
+
+
+def update_job(job_id, **fields):
+    """Write job fields with update(), which skips auto_now, so stamp updated_at too."""
+    return UploadJob.objects.filter(pk=job_id).update(updated_at=timezone.now(), **fields)
+
+
+def fail_stale_jobs(timeout=UPLOAD_JOB_TIMEOUT):
+    """
+    Fail pending and running jobs not updated for ``timeout`` seconds. Jobs
+    run in daemon threads, so a restart drops them without a trace; their
+    spooled files went with the old container. Returns the number failed.
+    """
+    return UploadJob.objects.filter(
+        status__in=[UploadJob.STATUS.PENDING, UploadJob.STATUS.RUNNING],
+        updated_at__lt=timezone.now() - timedelta(seconds=timeout),
+    ).update(
+        status=UploadJob.STATUS.FAILED, error='Interrupted by a server restart; upload the pages again.',
+        updated_at=timezone.now(),
+    )
+
+
+def upload_page(storage, chapter_id, page_number, path):
+    image = ChapterImage(chapter_id=chapter_id, page_number=page_number)
+    with open(path, 'rb') as file:
+        image.read_dimensions(file)
+    image.byte_size = os.path.getsize(path)
+    image.image = store_with_retry(storage, path, f'{chapter_id}-{os.path.basename(path)}')
+    image.pending_derivatives = build_derivatives(storage, path, f'{chapter_id}-{page_number:04d}')
+    return image
+
+
+def discard_pages(storage, images):
+    """Delete stored pages (and their derivatives) that will never be saved."""
+    values = [str(image.image) for image in images]
+    values += [derivative.file for image in images for derivative in getattr(image, 'pending_derivatives', [])]
+    for value in values:
+        try:
+            storage.delete(value)
+        except Exception:
+            logger.warning('Could not delete orphaned upload %s', value, exc_info=True)
+
+
+def save_pages(chapter, images):
+    """Replace a chapter's pages with ``images`` in one transaction."""
+    with transaction.atomic():
+        ChapterImage.objects.filter(chapter=chapter).delete()
+        ChapterImage.objects.bulk_create(images, batch_size=500)
+        derivatives = []
+        for image in images:
+            for derivative in getattr(image, 'pending_derivatives', []):
+                derivative.chapter_image = image
+                derivatives.append(derivative)
+        ImageDerivative.objects.bulk_create(derivatives, batch_size=500)
+    chapter.refresh_page_manifest()
+
+
+def upload_pages(job, storage, paths):
+    """
+    Push spooled pages to storage from a bounded thread pool. The workers
+    never touch the database; progress is written from this thread. If a
+    page fails, the pages already stored are deleted again.
+    """
+    pool = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS)
+    futures = {
+        pool.submit(upload_page, storage, job.chapter_id, page_number, path): page_number
+        for page_number, path in enumerate(paths, start=1)
+    }
+    images = {}
+    try:
+        for future in as_completed(futures):
+            images[futures[future]] = future.result()
+            update_job(job.pk, processed_pages=len(images))
+    except BaseException:
+        pool.shutdown(wait=True, cancel_futures=True)
+        stored = [
+            future.result() for future in futures
+            if futures[future] not in images and not future.cancelled() and future.exception() is None
+        ]
+        discard_pages(storage, list(images.values()) + stored)
+        raise
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+    return [images[page_number] for page_number in sorted(images)]
+
+
+def run_upload_job(job_id, prepare):
+    """
+    Run an upload job: ``prepare(job)`` returns the spooled page paths in
+    order (it may unpack an archive to get them), which are then stored
+    and swapped in as the chapter's pages. A chapter's first pages are
+    what announce it to the feeds of its comic's bookmarkers.
+    """
+    job = UploadJob.objects.select_related('chapter').get(pk=job_id)
+    update_job(job.pk, status=UploadJob.STATUS.RUNNING)
+    storage = get_page_storage()
+    try:
+        paths = prepare(job)
+        if len(paths) != job.total_pages:
+            update_job(job.pk, total_pages=len(paths))
+        images = upload_pages(job, storage, paths)
+        first_pages = not ChapterImage.objects.filter(chapter=job.chapter).exists()
+        save_pages(job.chapter, images)
+        update_job(job.pk, status=UploadJob.STATUS.COMPLETED)
+        if first_pages:
+            from .feed import start_fan_out
+            start_fan_out(job.chapter)
+    except Exception as e:
+        logger.exception('Upload job %s failed', job.pk)
+        update_job(job.pk, status=UploadJob.STATUS.FAILED, error=str(e)[:500])
+    finally:
+        shutil.rmtree(spool_dir(job), ignore_errors=True)
+
+
+def process_upload_job(job_id, paths):
+    run_upload_job(job_id, lambda job: paths)
+
+
+def run_in_background(target, *args):
+    """
+    Run ``target`` after the response is sent, in a daemon thread so the
+    gunicorn worker is free to take the next request. With
+    UPLOAD_JOBS_INLINE set (tests) it runs immediately instead.
+    """
+    if getattr(settings, 'UPLOAD_JOBS_INLINE', False):
+        target(*args)
+        return
+
+    def run():
+        close_old_connections()
+        try:
+            target(*args)
+        finally:
+            connection.close()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def start_upload(chapter, user, files):
+    job = UploadJob.objects.create(chapter=chapter, user=user, total_pages=len(files))
+    paths = spool(job, files)
+    transaction.on_commit(lambda: run_in_background(process_upload_job, job.pk, paths))
+    return job
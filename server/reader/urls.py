@@ -13,14 +13,19 @@ urlpatterns = [
     path('comic/<slug:slug>/', views.ComicDetailView.as_view(), name='comic_detail'),
     path('comic/<slug:comic_slug>/chapter/<slug:chapter_slug>/', 
          views.ChapterDetailView.as_view(), name='chapter_detail'),
+    path('comic/<slug:slug>/jump/', views.JumpToChapterView.as_view(), name='jump_to_chapter'),
     
     path('profile/', views.ProfileView.as_view(), name='profile'),
     path('bookmarks/', views.BookmarkListView.as_view(), name='bookmarks'),
+    path('api/library/', views.LibraryApiView.as_view(), name='library'),
+    path('api/feed/', views.FeedView.as_view(), name='feed'),
+    path('api/feed/seen/', views.FeedSeenView.as_view(), name='feed_seen'),
     
     path('comic/<slug:slug>/bookmark/', views.BookmarkToggleView.as_view(), name='bookmark_toggle'),
     path('comic/<slug:slug>/rate/', views.RateComicView.as_view(), name='rate_comic'),
     path('comic/<slug:slug>/comment/', views.AddCommentView.as_view(), name='add_comment'),
     path('comment/<int:pk>/reply/', views.ReplyCommentView.as_view(), name='reply_comment'),
+    path('api/comment/<int:pk>/replies/', views.CommentRepliesView.as_view(), name='comment_replies'),
     path('demo-add-coins/', views.BuyCoinsView.as_view(), name='demo_add_coins'),
     
     path('products/', views.ProductListView.as_view(), name='products'),
@@ -29,12 +34,18 @@ urlpatterns = [
     path('payment/success/', views.PaymentSuccessView.as_view(), name='payment_success'),
     path('payment/cancel/', views.PaymentCancelView.as_view(), name='payment_cancel'),
     path('comic/<slug:comic_slug>/upload-images/', views.UploadChapterImagesView.as_view(), name='upload_chapter_images'),
+    path('uploads/<uuid:pk>/', views.UploadJobProgressView.as_view(), name='upload_job_progress'),
+    path('api/uploads/<uuid:pk>/', views.UploadJobStatusView.as_view(), name='upload_job_status'),
 
     
     path('search/', views.ComicSearchView.as_view(), name='comic_search'),
+    path('search/autocomplete/', views.ComicAutocompleteView.as_view(), name='comic_autocomplete'),
     path('latest/', views.LatestComicsView.as_view(), name='latest_comics'),
     path('popular/', views.PopularComicsView.as_view(), name='popular_comics'),
     
    
     path('api/chapter/<int:pk>/view/', views.ChapterViewUpdateView.as_view(), name='chapter_view_update'),
+    path('api/chapter/<int:pk>/progress/', views.ReadingProgressUpdateView.as_view(), name='reading_progress'),
+    path('api/chapter/<int:pk>/manifest/', views.ChapterManifestView.as_view(), name='chapter_manifest'),
+    path('api/chapter/<int:pk>/prefetch/', views.ChapterPrefetchView.as_view(), name='chapter_prefetch'),
 ]
@@ -1,28 +1,96 @@
+from asgiref.sync import sync_to_async
 from django.contrib.auth.forms import UserCreationForm
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from  .forms import CustomUserCreationForm
 from django.views.generic import CreateView
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.contrib import messages
-from django.db.models import Avg, Q
-from .models import Comic, Chapter, Comment, Rating, Bookmark, Product, ChapterView, Category,Payment
+from django.db import transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Subquery
+from .models import Comic, Chapter, Comment, Rating, Bookmark, Product, Category, CoinTransaction, FeedCounter, UploadJob
+from . import feed, library, metrics
+from .async_views import AsyncLoginRequiredMixin, aget_object_or_404
+from .chapter_index import get_chapter_index
+from .chapter_views import chapter_views
+from .coins import AlreadyOwned, IdempotencyKeyReused, InsufficientCoins, credit, get_balance, purchase_chapter
+from .comments import load_threads, serialize, subtree_page
+from .conditional import ConditionalGetMixin, latest
+from .entitlements import entitled_chapter_ids, unlocked_chapter_ids, user_has_access
+from .ingest import IngestError, start_ingest
+from .page_cache import AnonymousPageCacheMixin, chapters_scope, comic_scope
+from .pagination import CursorPaginationMixin, paginate_by_cursor
+from .reading_progress import continue_reading, reading_progress
+from .search import autocomplete, search_comics
+from .uploads import start_upload
 from django.views.generic import ListView, DetailView, View
-from pdf2image import convert_from_path
-import tempfile
-import os
-from django.core.files.base import ContentFile
-from io import BytesIO
+from django.conf import settings
+import logging
 
-class ComicListView(ListView):
+logger = logging.getLogger(__name__)
+
+READER_PRELOAD_PAGES = getattr(settings, 'READER_PRELOAD_PAGES', 2)
+READER_PREFETCH_PAGES = getattr(settings, 'READER_PREFETCH_PAGES', 3)
+PAGE_SIZES = '(max-width: 800px) 100vw, 800px'
+
+
+def idempotency_key(request):
+    """Client-chosen key that makes retried purchase requests apply only once."""
+    return (request.headers.get('Idempotency-Key') or '').strip()[:100] or None
+
+
+def idempotency_conflict():
+    return JsonResponse({
+        'success': False,
+        'message': 'This Idempotency-Key was already used for a different request.'
+    }, status=409)
+
+
+def preload_link(page):
+    """``Link`` header value preloading a manifest page the way the reader's <picture> will pick it."""
+    tiles = page.get('tiles')
+    if not tiles:
+        return f'<{page["url"]}>; rel=preload; as=image'
+    tile = tiles[0]
+    source = tile['sources'][0]
+    return (
+        f'<{tile["src"]}>; rel=preload; as=image; type="{source["type"]}"; '
+        f'imagesrcset="{source["srcset"]}"; imagesizes="{PAGE_SIZES}"'
+    )
+
+
+def newest(queryset, field):
+    """Subquery for the newest ``field`` value in ``queryset``."""
+    return Subquery(queryset.order_by(f'-{field}').values(field)[:1])
+
+
+def comic_listing_state():
+    """
+    ``(last edit, last re-score)`` of all comics, both read from an index
+    rather than by aggregating the whole table. Deleting a comic touches
+    the last edited one, so deletions move this on too.
+    """
+    state = Comic.objects.order_by('-updated_at').annotate(
+        scored=newest(Comic.objects.filter(popularity_updated_at__isnull=False), 'popularity_updated_at'),
+    ).values_list('updated_at', 'scored').first()
+    return state or (None, None)
+
+
+class ComicListingConditionalMixin(ConditionalGetMixin):
+    """Validators for pages listing comics: changes when any comic is edited, added, removed or re-scored."""
+    def get_validators(self):
+        return latest(*comic_listing_state()), []
+
+class ComicListView(AnonymousPageCacheMixin, ComicListingConditionalMixin, CursorPaginationMixin, ListView):
     model = Comic
     template_name = 'reader/comic_list.html'
     context_object_name = 'comics'
     paginate_by = 12
     ordering = ['-created_at']  
+    cursor_ordering = ('-created_at', '-id')
     def get_queryset(self):
-        return Comic.objects.filter(active=True).order_by('-created_at')
+        return Comic.objects.for_listing()
 
 class SignUpView(CreateView):
     form_class = CustomUserCreationForm
@@ -33,51 +101,114 @@ class SignUpView(CreateView):
         messages.success(self.request, 'Account created successfully! Please login.')
         return super().form_valid(form)
 
-class ComicDetailView(DetailView):
+class ComicDetailView(AnonymousPageCacheMixin, ConditionalGetMixin, DetailView):
     model = Comic
     ordering = ['-created_at']
     template_name = 'reader/comic_detail.html'
     context_object_name = 'comic'
+    chapters_per_page = 100
+    comments_per_page = 20
+    page_cache_params = ('chapters_cursor', 'comments_cursor')
+
+    def page_cache_scopes(self):
+        return [comic_scope(self.kwargs['slug'])]
+
+    def get_validators(self):
+        # Chapter changes touch comic.updated_at; counter changes, deleted
+        # comments and ratings included, touch comic.engaged_at.
+        comic = self.annotate_user_state(Comic.objects.filter(slug=self.kwargs['slug'])).annotate(
+            commented=newest(Comment.objects.filter(comic=OuterRef('pk')), 'updated_date'),
+            rated=newest(Rating.objects.filter(comic=OuterRef('pk')), 'updated_date'),
+        ).only('id', 'updated_at', 'engaged_at').first()
+        if comic is None:
+            return None
+        parts = []
+        user = self.request.user
+        if user.is_authenticated:
+            parts = [comic.user_rate, comic.user_bookmarked, sorted(entitled_chapter_ids(user, comic.pk))]
+        return latest(comic.updated_at, comic.engaged_at, comic.commented, comic.rated), parts
+
+    def annotate_user_state(self, queryset):
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                user_rate=Subquery(
+                    Rating.objects.filter(comic=OuterRef('pk'), creator=user).values('rate')[:1]
+                ),
+                user_bookmarked=Exists(
+                    Bookmark.objects.filter(comic=OuterRef('pk'), creator=user)
+                ),
+            )
+        return queryset
+
+    def get_queryset(self):
+        return self.annotate_user_state(Comic.objects.prefetch_related('categories'))
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        comic = self.get_object()
+        comic = self.object
         
-        context['chapters'] = comic.chapters.filter(active=True).order_by('chapter_num')
+        context['chapter_page'] = paginate_by_cursor(
+            self.request, comic.chapters.filter(active=True), self.chapters_per_page,
+            ('chapter_num', 'id'), cursor_kwarg='chapters_cursor',
+        )
+        context['chapter_index'] = get_chapter_index(comic)
+        context['chapters'] = context['chapter_page'].object_list
+        context['unlocked_chapter_ids'] = unlocked_chapter_ids(
+            self.request.user, comic.pk, context['chapters']
+        )
         
-        context['comments'] = Comment.objects.filter(
-            comic=comic, 
-            reply_to=None
-        ).order_by('-created_date')
+        context['comment_page'] = paginate_by_cursor(
+            self.request, Comment.objects.filter(comic=comic, reply_to=None).select_related('creator'),
+            self.comments_per_page, ('-created_date', '-id'), cursor_kwarg='comments_cursor',
+        )
+        context['comments'] = load_threads(context['comment_page'].object_list)
         
-        context['average_rating'] = Rating.objects.filter(comic=comic).aggregate(
-            avg_rating=Avg('rate')
-        )['avg_rating']
+        context['average_rating'] = comic.average_rating
         
         if self.request.user.is_authenticated:
-            context['user_rating'] = Rating.objects.filter(
-                comic=comic, 
-                creator=self.request.user
-            ).first()
-            context['is_bookmarked'] = Bookmark.objects.filter(
-                comic=comic, 
-                creator=self.request.user
-            ).exists()
+            context['user_rating'] = comic.user_rate
+            context['is_bookmarked'] = comic.user_bookmarked
         
         return context
     
-class ChapterDetailView(DetailView):
+class ChapterDetailView(AnonymousPageCacheMixin, ConditionalGetMixin, DetailView):
     model = Chapter
     template_name = 'reader/chapter_detail.html'
     context_object_name = 'chapter'
     slug_field = 'slug'
     slug_url_kwarg = 'chapter_slug'
+
+    def page_cache_scopes(self):
+        return [chapters_scope(self.kwargs['comic_slug'])]
+
+    def page_cache_meta(self):
+        return {'chapter_id': self.object.id}
+
+    def page_cache_hit(self, meta):
+        chapter_views.record(meta['chapter_id'])
+
+    def get_validators(self):
+        # Chapter changes touch comic.updated_at, which covers the navigation.
+        chapter = Chapter.objects.filter(
+            comic__slug=self.kwargs['comic_slug'], slug=self.kwargs['chapter_slug'], active=True
+        ).annotate(comic_updated_at=F('comic__updated_at')).only('id', 'comic_id', 'updated_at').first()
+        if chapter is None:
+            return None
+        self.chapter_id = chapter.id
+        parts = []
+        if self.request.user.is_authenticated:
+            parts = [sorted(entitled_chapter_ids(self.request.user, chapter.comic_id))]
+        return latest(chapter.updated_at, chapter.comic_updated_at), parts
+
+    def not_modified(self):
+        chapter_views.record(self.chapter_id)
     
     def get_object(self):
         comic_slug = self.kwargs['comic_slug']
         chapter_slug = self.kwargs['chapter_slug']
         return get_object_or_404(
-            Chapter, 
+            Chapter.objects.select_related('comic'),
             comic__slug=comic_slug, 
             slug=chapter_slug,
             active=True
@@ -85,40 +216,111 @@ class ChapterDetailView(DetailView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        chapter = self.get_object()
-        
-        images_count = chapter.chapter_images.count()
-        print(f"DEBUG: Chapter {chapter.chapter_num} has {images_count} images")
-        
-        for img in chapter.chapter_images.all():
-            print(f"  - Page {img.page_number}: {img.image.url}")
+        chapter = self.object
         
         context['comic'] = chapter.comic
-        context['chapter_images'] = chapter.chapter_images.all()
-        
         context['user_has_access'] = self.check_user_access(chapter)
+        context['unlocked_chapter_ids'] = unlocked_chapter_ids(
+            self.request.user, chapter.comic_id, chapter.chapter_index.entries
+        )
+        context['pages'] = chapter.get_page_manifest() if context['user_has_access'] else []
+        context['eager_pages'] = READER_PRELOAD_PAGES
+        context['page_sizes'] = PAGE_SIZES
+        logger.debug('Rendering chapter %s with %d pages', chapter.pk, len(context['pages']))
         
-        try:
-            chapter_view, created = ChapterView.objects.get_or_create(chapter=chapter)
-            chapter_view.views += 1
-            chapter_view.save()
-        except Exception as e:
-            print(f"Error updating chapter view count: {e}")
+        chapter_views.record(chapter.id)
         
         return context
+
+    def render_to_response(self, context, **response_kwargs):
+        response = super().render_to_response(context, **response_kwargs)
+        # Lets the browser (and a CDN that turns Link headers into 103
+        # Early Hints) start on the first pages before the HTML is parsed.
+        links = [preload_link(page) for page in context['pages'][:READER_PRELOAD_PAGES]]
+        next_chapter = self.object.get_next_chapter()
+        if next_chapter:
+            links.append(f'<{reverse("reader:chapter_detail", args=[self.object.comic.slug, next_chapter.slug])}>; rel=prefetch')
+        if links:
+            response['Link'] = ', '.join(links)
+        return response
     
     def check_user_access(self, chapter):
-        if chapter.price == 0:
-            return True
-        
-        if not self.request.user.is_authenticated:
-            return False
-        
-        return Payment.objects.filter(
-            user=self.request.user,
-            chapter=chapter,
-            is_complete=True
-        ).exists()
+        return user_has_access(self.request.user, chapter)
+
+class ChapterManifestView(ConditionalGetMixin, View):
+    def get_validators(self):
+        chapter = Chapter.objects.filter(pk=self.kwargs['pk'], active=True).only(
+            'id', 'comic_id', 'price', 'updated_at'
+        ).first()
+        if chapter is None:
+            return None
+        return chapter.updated_at, [user_has_access(self.request.user, chapter)]
+
+    def get(self, request, pk):
+        chapter = get_object_or_404(Chapter, pk=pk, active=True)
+        if not user_has_access(request.user, chapter):
+            return JsonResponse({'status': 'locked', 'chapter': chapter.pk, 'price': chapter.price}, status=403)
+        return JsonResponse({
+            'status': 'ok',
+            'chapter': chapter.pk,
+            'chapter_num': chapter.chapter_num,
+            'pages': chapter.get_page_manifest(),
+        })
+
+class ChapterPrefetchView(ConditionalGetMixin, View):
+    """
+    Everything the reader needs to keep scrolling without a stall: the
+    current chapter's pages and the first READER_PREFETCH_PAGES pages (and
+    lock state) of the next chapter.
+    """
+    def get_validators(self):
+        chapter = Chapter.objects.filter(pk=self.kwargs['pk'], active=True).annotate(
+            comic_updated_at=F('comic__updated_at'),
+            chapters_updated_at=newest(Chapter.objects.filter(comic=OuterRef('comic')), 'updated_at'),
+        ).only('id', 'comic_id', 'price', 'updated_at').first()
+        if chapter is None:
+            return None
+        parts = [user_has_access(self.request.user, chapter)]
+        if self.request.user.is_authenticated:
+            parts.append(sorted(entitled_chapter_ids(self.request.user, chapter.comic_id)))
+        return latest(chapter.updated_at, chapter.comic_updated_at, chapter.chapters_updated_at), parts
+
+    def get(self, request, pk):
+        chapter = get_object_or_404(Chapter.objects.select_related('comic'), pk=pk, active=True)
+        has_access = user_has_access(request.user, chapter)
+        data = {
+            'chapter': chapter.pk,
+            'chapter_num': chapter.chapter_num,
+            'status': 'ok' if has_access else 'locked',
+            'pages': chapter.get_page_manifest() if has_access else [],
+            'next': None,
+        }
+        entry = chapter.get_next_chapter()
+        if entry:
+            next_chapter = Chapter.objects.only('id', 'price', 'page_manifest').get(pk=entry.id)
+            next_access = user_has_access(request.user, next_chapter)
+            data['next'] = {
+                'chapter': entry.id,
+                'chapter_num': entry.chapter_num,
+                'title': entry.title,
+                'url': reverse('reader:chapter_detail', args=[chapter.comic.slug, entry.slug]),
+                'status': 'ok' if next_access else 'locked',
+                'price': entry.price,
+                'pages': next_chapter.get_page_manifest()[:READER_PREFETCH_PAGES] if next_access else [],
+            }
+        return JsonResponse(data)
+
+class JumpToChapterView(View):
+    def get(self, request, slug):
+        comic = get_object_or_404(Comic, slug=slug, active=True)
+        try:
+            chapter_num = int(request.GET.get('num', ''))
+        except ValueError:
+            raise Http404('Invalid chapter number')
+        entry = get_chapter_index(comic).find(chapter_num)
+        if entry is None:
+            raise Http404('No such chapter')
+        return redirect('reader:chapter_detail', comic_slug=comic.slug, chapter_slug=entry.slug)
 
 class BuyChapterView(LoginRequiredMixin, View):
     def get(self, request, chapter_id):
@@ -132,110 +334,196 @@ class BuyChapterView(LoginRequiredMixin, View):
         chapter = get_object_or_404(Chapter, id=chapter_id)
         user = request.user
         
-        if Payment.objects.filter(user=user, chapter=chapter, is_complete=True).exists():
+        try:
+            entry = purchase_chapter(user, chapter, idempotency_key=idempotency_key(request))
+        except AlreadyOwned:
             return JsonResponse({
                 'success': False, 
                 'message': 'You already have access to this chapter.'
             })
-        
-        if user.coins < chapter.price:
+        except InsufficientCoins:
             return JsonResponse({
                 'success': False,
-                'message': f'Insufficient coins. You need {chapter.price} coins but only have {user.coins}.'
+                'message': f'Insufficient coins. You need {chapter.price} coins but only have {get_balance(user)}.'
             })
-        
-        user.coins -= chapter.price
-        user.save()
-        
-        Payment.objects.create(
-            user=user,
-            chapter=chapter,
-            category=Product.TYPES.CHAPTER,
-            amount=chapter.price,
-            is_complete=True
-        )
+        except IdempotencyKeyReused:
+            return idempotency_conflict()
         
         return JsonResponse({
             'success': True,
             'message': 'Chapter unlocked successfully!',
-            'remaining_coins': user.coins
+            'remaining_coins': entry.balance_after
         })
 
-class CategoryListView(ListView):
+class CategoryListView(AnonymousPageCacheMixin, ConditionalGetMixin, ListView):
     model = Category
     template_name = 'reader/category_list.html'
     context_object_name = 'categories'
 
-class CategoryDetailView(DetailView):
+    def get_validators(self):
+        categories = list(
+            Category.objects.annotate(updated=Max('comics__updated_at'), comic_count=Count('comics'))
+            .order_by('pk').values_list('pk', 'name', 'updated', 'comic_count')
+        )
+        return latest(*(category[2] for category in categories)), categories
+
+class CategoryDetailView(AnonymousPageCacheMixin, ConditionalGetMixin, DetailView):
     model = Category
     template_name = 'reader/category_detail.html'
     context_object_name = 'category'
 
+    def get_validators(self):
+        category = (
+            Category.objects.filter(pk=self.kwargs['pk'])
+            .annotate(updated=Max('comics__updated_at'), engaged=Max('comics__engaged_at'), comic_count=Count('comics'))
+            .values_list('name', 'description', 'updated', 'engaged', 'comic_count').first()
+        )
+        if category is None:
+            return None
+        # The cards here show rating counts.
+        return latest(category[2], category[3]), category
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        category = self.get_object()
-        context['comics'] = Comic.objects.filter(categories=category, active=True)
+        context['comics'] = Comic.objects.for_listing().filter(categories=self.object).order_by('-created_at')
         return context
 
-class BookmarkToggleView(LoginRequiredMixin, View):
-    def post(self, request, slug):
-        comic = get_object_or_404(Comic, slug=slug)
-        bookmark, created = Bookmark.objects.get_or_create(comic=comic, creator=request.user)
+# The small JSON endpoints below are async: under ASGI (see gunicorn.conf.py)
+# a worker keeps serving other requests while they wait on the database.
+
+class BookmarkToggleView(AsyncLoginRequiredMixin, View):
+    async def post(self, request, slug):
+        comic = await aget_object_or_404(Comic.objects.only('id'), slug=slug)
+        bookmark, created = await Bookmark.objects.aget_or_create(comic=comic, creator=request.user)
         if not created:
-            bookmark.delete()
+            await bookmark.adelete()
             return JsonResponse({'status': 'removed'})
         return JsonResponse({'status': 'added'})
 
-class RateComicView(LoginRequiredMixin, View):
-    def post(self, request, slug):
-        comic = get_object_or_404(Comic, slug=slug)
+def rate_comic(comic, user, rate):
+    """Create or change the user's rating (signals count it); returns the new average."""
+    with transaction.atomic():
+        rating, created = Rating.objects.select_for_update().get_or_create(
+            comic=comic, 
+            creator=user,
+            defaults={'rate': rate}
+        )
+        if not created and rating.rate != rate:
+            rating.rate = rate
+            rating.save()
+    comic.refresh_from_db(fields=['rating_count', 'rating_sum'])
+    return comic.average_rating
+
+class RateComicView(AsyncLoginRequiredMixin, View):
+    async def post(self, request, slug):
+        comic = await aget_object_or_404(Comic.objects.only('id', 'rating_count', 'rating_sum'), slug=slug)
         rating_value = request.POST.get('rating')
         if rating_value:
-            rating, created = Rating.objects.get_or_create(
-                comic=comic, 
-                creator=request.user,
-                defaults={'rate': int(rating_value)}
-            )
-            if not created:
-                rating.rate = int(rating_value)
-                rating.save()
-            avg_rating = comic.rating_set.aggregate(Avg('rate'))['rate__avg']
-            return JsonResponse({'status': 'rated', 'average_rating': avg_rating})
+            average_rating = await sync_to_async(rate_comic)(comic, request.user, int(rating_value))
+            return JsonResponse({'status': 'rated', 'average_rating': average_rating})
         return JsonResponse({'status': 'error', 'message': 'Invalid rating'})
 
-class AddCommentView(LoginRequiredMixin, View):
-    def post(self, request, slug):
-        comic = get_object_or_404(Comic, slug=slug)
+class AddCommentView(AsyncLoginRequiredMixin, View):
+    async def post(self, request, slug):
+        comic = await aget_object_or_404(Comic.objects.only('id'), slug=slug)
         content = request.POST.get('content')
         if content:
-            comment = Comment.objects.create(content=content, comic=comic, creator=request.user)
+            comment = await Comment.objects.acreate(content=content, comic=comic, creator=request.user)
             return JsonResponse({'status': 'comment_added', 'comment_id': comment.id})
         return JsonResponse({'status': 'error', 'message': 'Invalid comment'})
 
-class ReplyCommentView(LoginRequiredMixin, View):
-    def post(self, request, pk):
-        comment = get_object_or_404(Comment, pk=pk)
+class ReplyCommentView(AsyncLoginRequiredMixin, View):
+    async def post(self, request, pk):
+        comment = await aget_object_or_404(Comment, pk=pk)
         content = request.POST.get('content')
         if content:
-            reply = Comment.objects.create(content=content, comic=comment.comic, creator=request.user, reply_to=comment)
+            reply = await Comment.objects.acreate(
+                content=content, comic_id=comment.comic_id, creator=request.user, reply_to=comment
+            )
             return JsonResponse({'status': 'reply_added', 'reply_id': reply.id})
         return JsonResponse({'status': 'error', 'message': 'Invalid reply'})
 
+class CommentRepliesView(ConditionalGetMixin, View):
+    """
+    Lazily expands a thread past what the comic page renders inline: the
+    comment's descendants in path order, a page at a time. ``next`` is the
+    ``after`` value for the following page.
+    """
+    def get_validators(self):
+        comment = Comment.objects.filter(pk=self.kwargs['pk']).annotate(
+            comic_engaged_at=F('comic__engaged_at'),
+            replied=newest(Comment.objects.filter(thread=OuterRef('thread')), 'updated_date'),
+        ).only('id', 'updated_date').first()
+        if comment is None:
+            return None
+        return latest(comment.updated_date, comment.comic_engaged_at, comment.replied), []
+
+    def is_public(self):
+        return True
+
+    def get(self, request, pk):
+        comment = get_object_or_404(Comment, pk=pk)
+        after = request.GET.get('after', '')
+        replies, next_after = subtree_page(comment, after=after if after.isdigit() else None)
+        return JsonResponse({
+            'comment': comment.pk,
+            'depth': comment.depth,
+            'replies': [serialize(reply) for reply in replies],
+            'next': next_after,
+        })
+
 class ProfileView(LoginRequiredMixin, ListView):
     model = Bookmark
     template_name = 'reader/profile.html'
     context_object_name = 'bookmarks'
 
     def get_queryset(self):
-        return self.model.objects.filter(creator=self.request.user)
+        return self.model.objects.filter(creator=self.request.user).select_related('comic').order_by('-created_date')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['continue_reading'] = continue_reading(self.request.user)
+        return context
 
 class BookmarkListView(LoginRequiredMixin, ListView):
+    """The user's library: bookmarked comics with their latest and unread chapters."""
     model = Bookmark
     template_name = 'reader/bookmark_list.html'
     context_object_name = 'bookmarks'
 
+    def get_sort(self):
+        return library.sort_or_default(self.request.GET.get('sort'))
+
     def get_queryset(self):
-        return self.model.objects.filter(creator=self.request.user)
+        return library.library(self.request.user, self.get_sort())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['sort'] = self.get_sort()
+        return context
+
+class LibraryApiView(LoginRequiredMixin, View):
+    def get(self, request):
+        sort = library.sort_or_default(request.GET.get('sort'))
+        return JsonResponse({
+            'sort': sort,
+            'comics': [library.serialize(entry) for entry in library.library(request.user, sort)],
+        })
+
+class FeedView(LoginRequiredMixin, View):
+    """New chapters of the user's bookmarked comics, newest first, paginated by ``?cursor=``."""
+    def get(self, request):
+        page = paginate_by_cursor(request, feed.feed_items(request.user), feed.FEED_PAGE_SIZE, ('-created_at', '-id'))
+        return JsonResponse({
+            'unread': feed.unread_count(request.user),
+            'items': [feed.serialize(item) for item in page],
+            'next': page.next_cursor,
+        })
+
+class FeedSeenView(AsyncLoginRequiredMixin, View):
+    async def post(self, request):
+        await FeedCounter.objects.filter(user=request.user).aupdate(unread=0)
+        return JsonResponse({'status': 'seen', 'unread': 0})
 
 class ProductListView(ListView):
     model = Product
@@ -257,19 +545,23 @@ class BuyCoinsView(LoginRequiredMixin, View):
         
         try:
             product = Product.objects.get(id=product_id, active=True)
-            request.user.coins += 100
-            request.user.save()
+            entry, created = credit(
+                request.user, 100, CoinTransaction.KIND.COIN_PURCHASE,
+                idempotency_key=idempotency_key(request), product=product,
+            )
             
             return JsonResponse({
                 'success': True,
-                'message': f'Added 100 coins to your account!',
-                'new_balance': request.user.coins
+                'message': f'Added {entry.amount} coins to your account!',
+                'new_balance': entry.balance_after
             })
         except Product.DoesNotExist:
             return JsonResponse({
                 'success': False,
                 'message': 'Product not found'
             })
+        except IdempotencyKeyReused:
+            return idempotency_conflict()
 
 class PaymentSuccessView(View):
     def get(self, request):
@@ -281,37 +573,95 @@ class PaymentCancelView(View):
 
 class ComicSearchView(ListView):
     model = Comic
-    template_name = 'comics/search_results.html'
+    template_name = 'reader/search_results.html'
     context_object_name = 'comics'
     paginate_by = 12
 
-class LatestComicsView(ListView):
+    def get_queryset(self):
+        category = self.request.GET.get('category', '')
+        return search_comics(
+            self.request.GET.get('q', ''),
+            category=int(category) if category.isdigit() else None,
+            status=self.request.GET.get('status') or None,
+        ).for_listing()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '')
+        context['filter_query'] = self.request.GET.copy()
+        context['filter_query'].pop('page', None)
+        return context
+
+class ComicAutocompleteView(ConditionalGetMixin, View):
+    public_max_age = 60
+
+    def get_validators(self):
+        return comic_listing_state()[0], []
+
+    def is_public(self):
+        return True
+
+    def get(self, request):
+        return JsonResponse({'results': autocomplete(request.GET.get('q', ''))})
+
+class LatestComicsView(AnonymousPageCacheMixin, ComicListingConditionalMixin, CursorPaginationMixin, ListView):
     model = Comic
     template_name = 'reader/latest_comics.html'
     context_object_name = 'comics'
     paginate_by = 12
+    cursor_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
-        return Comic.objects.filter(active=True).order_by('-created_at')
+        return Comic.objects.for_listing()
 
-class PopularComicsView(ListView):
+class PopularComicsView(AnonymousPageCacheMixin, ComicListingConditionalMixin, CursorPaginationMixin, ListView):
     model = Comic
     template_name = 'reader/popular_comics.html'
     context_object_name = 'comics'
     paginate_by = 12
+    cursor_ordering = ('-popularity_score', '-id')
 
     def get_queryset(self):
-        return Comic.objects.filter(active=True).annotate(
-            avg_rating=Avg('rating__rate')
-        ).order_by('-avg_rating')
-
-class ChapterViewUpdateView(LoginRequiredMixin, View):
-    def post(self, request, pk):
-        chapter = get_object_or_404(Chapter, pk=pk)
-        chapter_view, created = ChapterView.objects.get_or_create(chapter=chapter)
-        chapter_view.views += 1
-        chapter_view.save()
-        return JsonResponse({'status': 'viewed', 'views': chapter_view.views})
+        return Comic.objects.for_listing()
+
+class RequestMetricsView(View):
+    """
+    Per-view request percentiles and query/template/cache averages from
+    RequestMetricsMiddleware, across all workers. Staff only (mounted with
+    admin_view); POST clears the counters.
+    """
+    def get(self, request):
+        metrics.request_metrics.flush()
+        return JsonResponse({'views': metrics.summary(metrics.view_names())})
+
+    def post(self, request):
+        metrics.request_metrics.flush()
+        metrics.reset(metrics.view_names())
+        return JsonResponse({'status': 'reset'})
+
+class ChapterViewUpdateView(AsyncLoginRequiredMixin, View):
+    async def post(self, request, pk):
+        chapter = await aget_object_or_404(Chapter.objects.only('id'), pk=pk)
+        views = await sync_to_async(self.record)(chapter.id)
+        return JsonResponse({'status': 'viewed', 'views': views})
+
+    @staticmethod
+    def record(chapter_id):
+        chapter_views.record(chapter_id)
+        return chapter_views.get_views(chapter_id)
+
+class ReadingProgressUpdateView(AsyncLoginRequiredMixin, View):
+    """Beacon from the reader; buffered in the cache, so it costs no database write."""
+    async def post(self, request, pk):
+        try:
+            page = max(int(request.POST.get('page', 1)), 1)
+        except ValueError:
+            return JsonResponse({'status': 'error', 'message': 'Invalid page'}, status=400)
+        chapter = await aget_object_or_404(Chapter.objects.only('id', 'comic_id', 'price'), pk=pk, active=True)
+        if not await sync_to_async(user_has_access)(request.user, chapter):
+            return JsonResponse({'status': 'locked', 'chapter': chapter.pk, 'price': chapter.price}, status=403)
+        await sync_to_async(reading_progress.record)(request.user.pk, chapter.pk, page)
+        return JsonResponse({'status': 'recorded'})
 
 class UploadChapterImagesView(LoginRequiredMixin, View):
     def get(self, request, comic_slug):
@@ -319,16 +669,15 @@ class UploadChapterImagesView(LoginRequiredMixin, View):
         return render(request, 'reader/upload_chapter_images.html', {'comic': comic})
     
     def post(self, request, comic_slug):
-        from reader.models import ChapterImage
-        
         comic = get_object_or_404(Comic, slug=comic_slug)
         
         chapter_num = request.POST.get('chapter_num')
         chapter_title = request.POST.get('chapter_title', '')
         images = request.FILES.getlist('images')
+        archive = request.FILES.get('archive')
         
-        if not images:
-            messages.error(request, 'Please upload at least one image')
+        if not images and not archive:
+            messages.error(request, 'Please upload at least one image or a PDF/ZIP/CBZ file')
             return redirect('reader:upload_chapter_images', comic_slug=comic_slug)
         
         chapter, created = Chapter.objects.get_or_create(
@@ -337,15 +686,36 @@ class UploadChapterImagesView(LoginRequiredMixin, View):
             defaults={'title': chapter_title}
         )
         
-        if not created:
-            chapter.chapter_images.all().delete()
+        if archive:
+            try:
+                job = start_ingest(chapter, request.user, archive)
+            except IngestError as e:
+                messages.error(request, str(e))
+                return redirect('reader:upload_chapter_images', comic_slug=comic_slug)
+        else:
+            job = start_upload(chapter, request.user, images)
         
-        for page_num, image_file in enumerate(images, start=1):
-            ChapterImage.objects.create(
-                chapter=chapter,
-                page_number=page_num,
-                image=image_file
+        if request.headers.get('Accept') == 'application/json':
+            return JsonResponse({
+                'job': job.as_dict(),
+                'status_url': reverse('reader:upload_job_status', args=[job.pk]),
+            }, status=202)
+        return redirect('reader:upload_job_progress', pk=job.pk)
+
+class UploadJobProgressView(LoginRequiredMixin, DetailView):
+    model = UploadJob
+    template_name = 'reader/upload_progress.html'
+    context_object_name = 'job'
+
+    def get_queryset(self):
+        return UploadJob.objects.filter(user=self.request.user).select_related('chapter__comic')
+
+class UploadJobStatusView(LoginRequiredMixin, View):
+    def get(self, request, pk):
+        job = get_object_or_404(UploadJob, pk=pk, user=request.user)
+        data = job.as_dict()
+        if job.status == UploadJob.STATUS.COMPLETED:
+            data['chapter_url'] = reverse(
+                'reader:chapter_detail', args=[job.chapter.comic.slug, job.chapter.slug]
             )
-        
-        messages.success(request, f'Successfully uploaded {len(images)} pages!')
-        return redirect('reader:chapter_detail', comic_slug=comic.slug, chapter_slug=chapter.slug)
\ No newline at end of file
+        return JsonResponse(data)
\ No newline at end of file